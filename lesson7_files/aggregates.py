@@ -0,0 +1,767 @@
+"""
+Mergeable partial aggregates for e-commerce data analysis.
+"""
+
+import copy
+import math
+import pandas as pd
+import numpy as np
+from abc import ABC, abstractmethod
+from functools import partial, reduce
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Default register index bits of ``DistinctCountSketch``: exact counts up
+# to 2**14 / 8 = 2048 values, then 2**14 one-byte registers with a relative
+# standard error of 1.04 / sqrt(2**14) = 0.81%
+DISTINCT_PRECISION = 14
+
+# Default relative accuracy of ``QuantileSketch``
+QUANTILE_ACCURACY = 0.01
+
+# Histogram edges of the order-level report metrics; a value falls in the
+# first bin whose upper edge is >= the value, as in ``bucketize``
+REVIEW_SCORE_EDGES = [1, 2, 3, 4, 5]
+DELIVERY_DAY_EDGES = [3, 7]
+
+# Columns of the sales rows read by ``ReportState.update``
+REPORT_COLUMNS = ['order_id', 'price', 'purchase_month', 'customer_state', 'product_category_name',
+                  'review_score', 'delivery_days']
+
+
+class AggregateState(ABC):
+    """
+    Partial aggregate of a set of values that can be combined with others.
+    
+    ``update`` folds values into the state, ``merge`` returns the state of
+    the values of both states, and ``result`` reads the aggregate. Merging
+    is associative and commutative, so states computed per partition (file
+    chunk, month, worker) can be combined in any grouping and order.
+    """
+    
+    @abstractmethod
+    def update(self, values) -> 'AggregateState':
+        """
+        Fold values into the state.
+        
+        Args:
+            values: Array-like of values; missing values are skipped
+        
+        Returns:
+            AggregateState: This state
+        """
+    
+    @abstractmethod
+    def merge(self, other: 'AggregateState') -> 'AggregateState':
+        """
+        Combine with the state of other values.
+        
+        Args:
+            other (AggregateState): State of the same kind and settings
+        
+        Returns:
+            AggregateState: New state of the values of both states
+        """
+    
+    @abstractmethod
+    def result(self) -> Any:
+        """Get the aggregate of the values folded in so far."""
+    
+    def copy(self) -> 'AggregateState':
+        """Get an independent copy of the state."""
+        return copy.deepcopy(self)
+    
+    @classmethod
+    def update_groups(cls, states: List['AggregateState'], codes: np.ndarray, values: pd.Series) -> None:
+        """
+        Fold values into the states of their groups, for ``GroupedState``.
+        
+        This updates each group with its rows; states that can fold every
+        group in one vectorized pass override it.
+        
+        Args:
+            states (List[AggregateState]): State of each group code
+            codes (np.ndarray): Group code of each value, -1 to skip it
+            values (pd.Series): Value of each code, by position
+        """
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(states) + 1))
+        for code, state in enumerate(states):
+            state.update(values.iloc[order[bounds[code]:bounds[code + 1]]])
+
+
+class CountState(AggregateState):
+    """Number of values."""
+    
+    def __init__(self, skipna: bool = True):
+        """
+        Initialize an empty count.
+        
+        Args:
+            skipna (bool): Count only non-missing values, as ``Series.count``
+        """
+        self.skipna = skipna
+        self.count = 0
+    
+    def update(self, values) -> 'CountState':
+        """Count the values."""
+        values = pd.Series(values, copy=False)
+        self.count += int(values.count() if self.skipna else len(values))
+        return self
+    
+    @classmethod
+    def update_groups(cls, states: List['CountState'], codes: np.ndarray, values: pd.Series) -> None:
+        """Count the values of every group with one ``np.bincount``."""
+        for skipna in {state.skipna for state in states}:
+            valid = (codes >= 0) & (values.notna().to_numpy() if skipna else True)
+            counts = np.bincount(codes[valid], minlength=len(states))
+            for state, count in zip(states, counts.tolist()):
+                if state.skipna == skipna:
+                    state.count += count
+    
+    def merge(self, other: 'CountState') -> 'CountState':
+        """Add the count of other values."""
+        merged = self.copy()
+        merged.count += other.count
+        return merged
+    
+    def result(self) -> int:
+        """Get the count."""
+        return self.count
+
+
+class SumState(AggregateState):
+    """Sum of the non-missing values."""
+    
+    def __init__(self):
+        """Initialize an empty sum."""
+        self.total = 0.0
+    
+    def update(self, values) -> 'SumState':
+        """Add the non-missing values."""
+        self.total += float(np.sum(_float_values(values)))
+        return self
+    
+    @classmethod
+    def update_groups(cls, states: List['SumState'], codes: np.ndarray, values: pd.Series) -> None:
+        """Add the values of every group with one ``np.bincount``."""
+        totals, _ = _group_sums(codes, values, len(states))
+        for state, total in zip(states, totals.tolist()):
+            state.total += total
+    
+    def merge(self, other: 'SumState') -> 'SumState':
+        """Add the sum of other values."""
+        merged = self.copy()
+        merged.total += other.total
+        return merged
+    
+    def result(self) -> float:
+        """Get the sum, 0 when no values were folded in like ``Series.sum``."""
+        return self.total
+
+
+class MeanState(AggregateState):
+    """Sum and count of the non-missing values, for their mean."""
+    
+    def __init__(self):
+        """Initialize an empty mean."""
+        self.total = 0.0
+        self.count = 0
+    
+    def update(self, values) -> 'MeanState':
+        """Add the non-missing values and their count."""
+        values = _float_values(values)
+        self.total += float(np.sum(values))
+        self.count += len(values)
+        return self
+    
+    @classmethod
+    def update_groups(cls, states: List['MeanState'], codes: np.ndarray, values: pd.Series) -> None:
+        """Add the values of every group and their count with ``np.bincount``."""
+        totals, counts = _group_sums(codes, values, len(states))
+        for state, total, count in zip(states, totals.tolist(), counts.tolist()):
+            state.total += total
+            state.count += count
+    
+    def merge(self, other: 'MeanState') -> 'MeanState':
+        """Add the sum and count of other values."""
+        merged = self.copy()
+        merged.total += other.total
+        merged.count += other.count
+        return merged
+    
+    def result(self) -> float:
+        """Get the mean, NaN when no values were folded in like ``Series.mean``."""
+        return self.total / self.count if self.count else np.nan
+
+
+class MinMaxState(AggregateState):
+    """Smallest and largest non-missing value."""
+    
+    def __init__(self):
+        """Initialize an empty range."""
+        self.minimum = np.nan
+        self.maximum = np.nan
+    
+    def update(self, values) -> 'MinMaxState':
+        """Widen the range to the non-missing values."""
+        values = _float_values(values)
+        if len(values):
+            self.minimum = float(np.fmin(self.minimum, values.min()))
+            self.maximum = float(np.fmax(self.maximum, values.max()))
+        return self
+    
+    def merge(self, other: 'MinMaxState') -> 'MinMaxState':
+        """Get the range of the values of both states."""
+        merged = self.copy()
+        merged.minimum = float(np.fmin(self.minimum, other.minimum))
+        merged.maximum = float(np.fmax(self.maximum, other.maximum))
+        return merged
+    
+    def result(self) -> Tuple[float, float]:
+        """Get (min, max), NaN when no values were folded in."""
+        return self.minimum, self.maximum
+
+
+class DistinctCountSketch(AggregateState):
+    """
+    HyperLogLog sketch of the number of distinct non-missing values.
+    
+    Values are hashed with ``pd.util.hash_array``, which is stable across
+    processes. Until there are more distinct hashes than fit in the space of
+    the registers (``2 ** precision / 8``), the sketch keeps the hashes
+    themselves and counts exactly. From then on each of the
+    ``2 ** precision`` registers keeps the longest run of leading zero bits
+    among the hashes routed to it, merging takes the register-wise maximum,
+    and the count is estimated with Ertl's improved estimator ("New
+    cardinality estimation algorithms for HyperLogLog sketches", 2017),
+    whose relative standard error is ``1.04 / sqrt(2 ** precision)``.
+    Equal values must have the same dtype in every partition to hash alike
+    (e.g. not int ids in one chunk and float ids in another). Values hashed
+    once for several sketches can be added to sketches made with
+    ``hashed=True``, which count like sketches of the values themselves.
+    """
+    
+    def __init__(self, precision: int = DISTINCT_PRECISION, hashed: bool = False):
+        """
+        Initialize an empty sketch.
+        
+        Args:
+            precision (int): Number of register index bits, 4 to 18
+            hashed (bool): Whether values are ``pd.util.hash_array`` hashes
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError(f"Unsupported precision: {precision}")
+        self.precision = precision
+        self.hashed = hashed
+        self.hashes = np.array([], dtype=np.uint64)
+        self.registers = None
+    
+    @property
+    def exact(self) -> bool:
+        """Whether the sketch still keeps every distinct hash."""
+        return self.registers is None
+    
+    def update(self, values) -> 'DistinctCountSketch':
+        """Add the hash of every non-missing value."""
+        values = pd.Series(values, copy=False).dropna()
+        if len(values):
+            self._add_hashes(self._hashes(values.to_numpy()))
+        return self
+    
+    @classmethod
+    def update_groups(cls, states: List['DistinctCountSketch'], codes: np.ndarray, values: pd.Series) -> None:
+        """Hash the values once, then add the distinct hashes of each group."""
+        valid = (codes >= 0) & values.notna().to_numpy()
+        hashes = states[0]._hashes(values[valid].to_numpy())
+        codes = codes[valid]
+        
+        # Group the hashes; duplicates are dropped as they are added
+        order = np.argsort(codes, kind='stable')
+        hashes = hashes[order]
+        bounds = np.searchsorted(codes[order], np.arange(len(states) + 1))
+        for code, state in enumerate(states):
+            state._add_hashes(hashes[bounds[code]:bounds[code + 1]])
+    
+    def merge(self, other: 'DistinctCountSketch') -> 'DistinctCountSketch':
+        """Unite the hashes, or take the register-wise maximum, of both sketches."""
+        if other.precision != self.precision:
+            raise ValueError("Only sketches with the same precision can be merged")
+        merged = self.copy()
+        if other.exact:
+            merged._add_hashes(other.hashes)
+        else:
+            merged._add_hashes(np.array([], dtype=np.uint64), dense=True)
+            np.maximum(merged.registers, other.registers, out=merged.registers)
+        return merged
+    
+    def result(self) -> float:
+        """Get the (estimated) number of distinct values."""
+        if self.exact:
+            return float(len(self.hashes))
+        
+        m, q = len(self.registers), 64 - self.precision
+        counts = np.bincount(self.registers, minlength=q + 2).astype(float)
+        z = m * _hll_tau(1 - counts[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + counts[k])
+        z += m * _hll_sigma(counts[0] / m)
+        return m * m / (2 * math.log(2) * z)
+    
+    def _hashes(self, values: np.ndarray) -> np.ndarray:
+        """Hash values, unless they are hashes already."""
+        return values.astype(np.uint64, copy=False) if self.hashed else _hash_values(values)
+    
+    def _add_hashes(self, hashes: np.ndarray, dense: bool = False) -> None:
+        """Keep new hashes, switching to registers once they outgrow them (or when ``dense``)."""
+        if self.exact:
+            self.hashes = _sorted_unique(np.concatenate((self.hashes, hashes)))
+            if not dense and len(self.hashes) <= 2 ** self.precision // 8:
+                return
+            hashes, self.hashes = self.hashes, None
+            self.registers = np.zeros(2 ** self.precision, dtype=np.uint8)
+        
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Rank of the first set bit among the remaining bits, counted from the top
+        rest = hashes & np.uint64(2 ** (64 - self.precision) - 1)
+        ranks = (64 - self.precision) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, buckets, ranks.astype(np.uint8))
+
+
+class QuantileSketch(AggregateState):
+    """
+    DDSketch of the distribution of the non-missing values, for quantiles.
+    
+    Values are counted in logarithmic buckets whose bounds grow by the
+    factor ``(1 + relative_accuracy) / (1 - relative_accuracy)``, separately
+    for positive and negative values, with exact zeros counted apart.
+    Merging adds the bucket counts. ``quantile`` interpolates between the
+    two closest ranks like ``Series.quantile``; every value it reads is
+    within ``relative_accuracy`` of the exact value at its rank, so a
+    quantile of values of one sign is too.
+    """
+    
+    def __init__(self, relative_accuracy: float = QUANTILE_ACCURACY):
+        """
+        Initialize an empty sketch.
+        
+        Args:
+            relative_accuracy (float): Relative error bound of every
+                value read from the sketch, between 0 and 1
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"Unsupported relative accuracy: {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive = pd.Series(dtype=np.int64)
+        self.negative = pd.Series(dtype=np.int64)
+        self.zeros = 0
+    
+    @property
+    def count(self) -> int:
+        """Number of values folded in."""
+        return int(self.positive.sum() + self.negative.sum()) + self.zeros
+    
+    def update(self, values) -> 'QuantileSketch':
+        """Count the non-missing values in their buckets."""
+        values = _float_values(values)
+        self.zeros += int((values == 0).sum())
+        self.positive = _add_counts(self.positive, self._keys(values[values > 0]))
+        self.negative = _add_counts(self.negative, self._keys(-values[values < 0]))
+        return self
+    
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Add the bucket counts of both sketches."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        merged = self.copy()
+        merged.zeros += other.zeros
+        merged.positive = _add_counts(merged.positive, other.positive)
+        merged.negative = _add_counts(merged.negative, other.negative)
+        return merged
+    
+    def quantile(self, q: float) -> float:
+        """
+        Get an approximate quantile.
+        
+        Args:
+            q (float): Quantile between 0 and 1, e.g. 0.5 for the median
+        
+        Returns:
+            float: The quantile, NaN when no values were folded in
+        """
+        count = self.count
+        if count == 0:
+            return np.nan
+        
+        # Bucket representatives in ascending value order, with their counts
+        negative = self.negative.sort_index(ascending=False)
+        positive = self.positive.sort_index()
+        values = np.concatenate([-self._values(negative.index.to_numpy()), [0.0],
+                                 self._values(positive.index.to_numpy())])
+        counts = np.concatenate([negative.to_numpy(), [self.zeros], positive.to_numpy()])
+        cumulative = np.cumsum(counts)
+        
+        rank = q * (count - 1)
+        lower = values[np.searchsorted(cumulative, math.floor(rank), side='right')]
+        upper = values[np.searchsorted(cumulative, math.ceil(rank), side='right')]
+        return lower + (upper - lower) * (rank - math.floor(rank))
+    
+    def result(self) -> float:
+        """Get the approximate median."""
+        return self.quantile(0.5)
+    
+    def _keys(self, values: np.ndarray) -> pd.Series:
+        """Count positive values per logarithmic bucket key."""
+        keys, counts = np.unique(np.ceil(np.log(values) / math.log(self.gamma)).astype(np.int64),
+                                 return_counts=True)
+        return pd.Series(counts.astype(np.int64), index=keys)
+    
+    def _values(self, keys: np.ndarray) -> np.ndarray:
+        """Representative value of buckets, within the relative accuracy of their values."""
+        return 2 * self.gamma ** keys.astype(float) / (self.gamma + 1)
+
+
+class HistogramState(AggregateState):
+    """
+    Counts of the values per bin of fixed edges, and of the missing values.
+    
+    Bin i holds the values in (edges[i - 1], edges[i]]: a value falls in
+    the first bin whose upper edge is >= the value, and the last bin holds
+    the values above every edge.
+    """
+    
+    def __init__(self, edges: List[float]):
+        """
+        Initialize an empty histogram.
+        
+        Args:
+            edges (List[float]): Ascending bin edges
+        """
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.missing = 0
+    
+    @property
+    def total(self) -> int:
+        """Number of values folded in, missing values included."""
+        return int(self.counts.sum()) + self.missing
+    
+    def update(self, values) -> 'HistogramState':
+        """Count the values in their bins."""
+        values = pd.Series(values, copy=False).astype(float).to_numpy()
+        missing = np.isnan(values)
+        self.missing += int(missing.sum())
+        bins = np.searchsorted(self.edges, values[~missing], side='left')
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        return self
+    
+    def merge(self, other: 'HistogramState') -> 'HistogramState':
+        """Add the bin counts of both histograms."""
+        if not np.array_equal(other.edges, self.edges):
+            raise ValueError("Only histograms with the same edges can be merged")
+        merged = self.copy()
+        merged.counts = merged.counts + other.counts
+        merged.missing += other.missing
+        return merged
+    
+    def result(self) -> np.ndarray:
+        """Get the count of each bin."""
+        return self.counts.copy()
+
+
+class GroupedState(AggregateState):
+    """
+    One state per group key, e.g. per month or per state.
+    
+    Rows with a missing key are skipped, as in ``groupby``. Merging merges
+    the states of keys present in both and keeps the others. Categorical
+    keys keep their dtype and category order while every partition has
+    the same categories.
+    """
+    
+    def __init__(self, factory: Callable[[], AggregateState]):
+        """
+        Initialize without groups.
+        
+        Args:
+            factory (Callable[[], AggregateState]): Creates the empty state
+                of a new group, e.g. ``SumState``
+        """
+        self.factory = factory
+        self.groups = {}
+        self.key_dtype = None
+    
+    def update(self, keys, values=None) -> 'GroupedState':
+        """
+        Fold values into the state of their keys.
+        
+        Args:
+            keys: Array-like group key of each value
+            values: Array-like values (default: the keys themselves)
+        
+        Returns:
+            GroupedState: This state
+        """
+        keys = pd.Series(keys, copy=False)
+        values = pd.Series(keys if values is None else values, copy=False)
+        self.key_dtype = _common_dtype(self.key_dtype, keys.dtype) if self.groups else keys.dtype
+        codes, uniques = pd.factorize(keys)
+        
+        states = []
+        for key in uniques:
+            if key not in self.groups:
+                self.groups[key] = self.factory()
+            states.append(self.groups[key])
+        if states:
+            # One pass over the rows of every group (see ``AggregateState.update_groups``)
+            type(states[0]).update_groups(states, codes, values)
+        return self
+    
+    def merge(self, other: 'GroupedState') -> 'GroupedState':
+        """Merge the states of every group of both states."""
+        merged = GroupedState(self.factory)
+        merged.groups = {key: state.copy() for key, state in self.groups.items()}
+        merged.key_dtype = _common_dtype(self.key_dtype, other.key_dtype) if self.groups else other.key_dtype
+        for key, state in other.groups.items():
+            merged.groups[key] = merged.groups[key].merge(state) if key in merged.groups else state.copy()
+        return merged
+    
+    def keys(self) -> pd.Index:
+        """Get the group keys, sorted like the groups of ``groupby``."""
+        if isinstance(self.key_dtype, pd.CategoricalDtype):
+            keys = [key for key in self.key_dtype.categories if key in self.groups]
+            return pd.CategoricalIndex(keys, dtype=self.key_dtype)
+        return pd.Index(sorted(self.groups))
+    
+    def result(self) -> pd.Series:
+        """Get the result of every group, indexed by the sorted keys."""
+        keys = self.keys()
+        return pd.Series([self.groups[key].result() for key in keys], index=keys, dtype=object)
+
+
+class ReportState(AggregateState):
+    """
+    Mergeable state of the comprehensive report of the sales rows of a period.
+    
+    Item measures (revenue, items, prices) are summed per month, state and
+    category; distinct orders are counted with ``DistinctCountSketch`` per
+    group; order-level review scores and delivery days are kept as means,
+    histograms over ``REVIEW_SCORE_EDGES`` and ``DELIVERY_DAY_EDGES``, and
+    a ``QuantileSketch`` for the median delivery time. A report built from
+    merged states (see ``business_metrics.StateReportEngine``) matches the
+    one of ``BusinessMetricsCalculator`` over all rows:
+    
+    - revenue, items, prices, review and delivery means and percentages are
+      exact up to floating point rounding;
+    - order counts, and the average order values divided by them, are
+      exact up to 2048 orders per group at the default precision, and
+      within the relative standard error of the distinct count sketch
+      (0.81%) above;
+    - the median delivery time is within ``QUANTILE_ACCURACY`` (1%).
+    
+    Order-level metrics are taken from the first row of each order of the
+    rows folded in, so partitions must not split orders (months, years and
+    workers over whole orders do not), or ``update`` must be given the
+    first rows of the orders across partitions (see
+    ``streaming.stream_report_states``).
+    """
+    
+    def __init__(self, precision: int = DISTINCT_PRECISION, relative_accuracy: float = QUANTILE_ACCURACY):
+        """
+        Initialize the state of no rows.
+        
+        Args:
+            precision (int): Precision of the distinct order count sketches
+            relative_accuracy (float): Relative accuracy of the delivery time sketch
+        """
+        # Order ids are hashed once per update for all the order count sketches
+        distinct = partial(DistinctCountSketch, precision, hashed=True)
+        self.revenue = SumState()
+        self.items = CountState(skipna=False)
+        self.orders = distinct()
+        self.monthly_revenue = GroupedState(SumState)
+        self.monthly_orders = GroupedState(distinct)
+        self.state_revenue = GroupedState(SumState)
+        self.state_orders = GroupedState(distinct)
+        self.category_prices = GroupedState(MeanState)
+        self.category_orders = GroupedState(distinct)
+        self.review_scores = MeanState()
+        self.review_histogram = HistogramState(REVIEW_SCORE_EDGES)
+        self.delivery_days = MeanState()
+        self.delivery_histogram = HistogramState(DELIVERY_DAY_EDGES)
+        self.delivery_quantiles = QuantileSketch(relative_accuracy)
+        self.columns = set()
+    
+    @classmethod
+    def from_sales(cls, sales_data: pd.DataFrame, **kwargs) -> 'ReportState':
+        """
+        Build the state of some sales rows.
+        
+        Args:
+            sales_data (pd.DataFrame): Sales rows of one partition
+            **kwargs: Sketch settings passed to ``ReportState``
+        
+        Returns:
+            ReportState: State of the rows
+        """
+        return cls(**kwargs).update(sales_data)
+    
+    def update(self, sales_data: pd.DataFrame, first_order_rows: Optional[np.ndarray] = None,
+               order_hashes: Optional[np.ndarray] = None) -> 'ReportState':
+        """
+        Fold sales rows into the state.
+        
+        Args:
+            sales_data (pd.DataFrame): Sales rows with 'order_id', 'price'
+                and 'purchase_month', and optionally 'customer_state',
+                'product_category_name', 'review_score' and 'delivery_days'
+            first_order_rows (np.ndarray, optional): Boolean mask of the rows
+                carrying the order-level attributes of their order (default:
+                the first row of each order in ``sales_data``)
+            order_hashes (np.ndarray, optional): ``pd.util.hash_array``
+                hashes of the order ids, e.g. looked up from hashes of the
+                orders table (default: hashed from 'order_id')
+        
+        Returns:
+            ReportState: This state
+        """
+        self.columns.update(sales_data.columns)
+        order_ids, prices = sales_data['order_id'], sales_data['price']
+        if order_hashes is None:
+            order_hashes = pd.arrays.IntegerArray(_hash_values(order_ids.to_numpy()), order_ids.isna().to_numpy())
+        order_hashes = pd.Series(order_hashes, copy=False)
+        if first_order_rows is None:
+            first_order_rows = ~pd.Series(pd.factorize(order_ids)[0]).duplicated().to_numpy()
+        order_data, order_hashes_first = sales_data[first_order_rows], order_hashes[first_order_rows]
+        
+        self.revenue.update(prices)
+        self.items.update(prices)
+        self.monthly_revenue.update(sales_data['purchase_month'], prices)
+        if 'customer_state' in sales_data.columns:
+            self.state_revenue.update(sales_data['customer_state'], prices)
+        if 'product_category_name' in sales_data.columns:
+            self.category_prices.update(sales_data['product_category_name'], prices)
+            self.category_orders.update(sales_data['product_category_name'], order_hashes)
+        
+        # Months and states are order-level, so the first rows hold every order of each
+        self.orders.update(order_hashes_first)
+        self.monthly_orders.update(order_data['purchase_month'], order_hashes_first)
+        if 'customer_state' in order_data.columns:
+            self.state_orders.update(order_data['customer_state'], order_hashes_first)
+        if 'review_score' in order_data.columns:
+            self.review_scores.update(order_data['review_score'])
+            self.review_histogram.update(order_data['review_score'])
+        if 'delivery_days' in order_data.columns:
+            self.delivery_days.update(order_data['delivery_days'])
+            self.delivery_histogram.update(order_data['delivery_days'].dropna())
+            self.delivery_quantiles.update(order_data['delivery_days'])
+        return self
+    
+    def merge(self, other: 'ReportState') -> 'ReportState':
+        """Merge every component state."""
+        merged = ReportState.__new__(ReportState)
+        for name, state in vars(self).items():
+            if isinstance(state, AggregateState):
+                setattr(merged, name, state.merge(getattr(other, name)))
+        merged.columns = self.columns | other.columns
+        return merged
+    
+    def result(self) -> Dict[str, Any]:
+        """Get the result of every component state by name."""
+        return {name: state.result() for name, state in vars(self).items() if isinstance(state, AggregateState)}
+
+
+def merge_states(states: Iterable[AggregateState]) -> AggregateState:
+    """
+    Merge the states of several partitions.
+    
+    Args:
+        states (Iterable[AggregateState]): States of the same kind and settings
+    
+    Returns:
+        AggregateState: State of the values of every partition
+    """
+    states = list(states)
+    if not states:
+        raise ValueError("At least one state is required")
+    return reduce(lambda left, right: left.merge(right), states)
+
+
+def _common_dtype(dtype, other):
+    """Key dtype of merged groups: categorical only when both have the same categories."""
+    return dtype if dtype == other else None
+
+
+def _float_values(values) -> np.ndarray:
+    """Non-missing values as float64, nullable values included."""
+    values = pd.Series(values, copy=False).astype(float).to_numpy()
+    return values[~np.isnan(values)]
+
+
+def _group_sums(codes: np.ndarray, values: pd.Series, groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum and count of the non-missing values of each group code."""
+    values = values.astype(float).to_numpy()
+    valid = (codes >= 0) & ~np.isnan(values)
+    totals = np.bincount(codes[valid], weights=values[valid], minlength=groups)
+    return totals, np.bincount(codes[valid], minlength=groups)
+
+
+def _hash_values(values: np.ndarray) -> np.ndarray:
+    """Hash values with ``pd.util.hash_array``, without first factorizing the (mostly distinct) values."""
+    return pd.util.hash_array(values, categorize=False)
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    """Sorted distinct values; cheaper than ``np.unique`` on the small arrays of a group."""
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+def _add_counts(counts: pd.Series, other: pd.Series) -> pd.Series:
+    """Add counts indexed by bucket key."""
+    if not len(other):
+        return counts
+    if not len(counts):
+        return other.astype(np.int64)
+    keys, positions = np.unique(np.concatenate((counts.index.to_numpy(), other.index.to_numpy())),
+                                return_inverse=True)
+    totals = np.zeros(len(keys), dtype=np.int64)
+    np.add.at(totals, positions, np.concatenate((counts.to_numpy(), other.to_numpy())))
+    return pd.Series(totals, index=keys)
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Bit length of unsigned 64-bit integers (0 for 0), computed exactly on 32-bit halves."""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+def _hll_sigma(x: float) -> float:
+    """Series sigma(x) of Ertl's estimator, for the share of empty registers."""
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _hll_tau(x: float) -> float:
+    """Series tau(x) of Ertl's estimator, for the share of saturated registers."""
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
@@ -0,0 +1,125 @@
+"""
+Arrow execution of sales pipeline joins and group-bys for e-commerce data analysis.
+"""
+
+import os
+import pandas as pd
+from typing import List, Optional
+
+# Optional pyarrow import (required for the arrow engine)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Engines executing the joins and group-bys of the sales pipeline
+ENGINES = ('pandas', 'arrow')
+
+# Environment variable selecting the engine when none is passed
+ENGINE_ENV_VAR = 'ECOMMERCE_ENGINE'
+
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """
+    Resolve the execution engine of the sales pipeline.
+    
+    Args:
+        engine (str, optional): 'pandas' or 'arrow'; defaults to the
+            ECOMMERCE_ENGINE environment variable, then 'pandas'
+    
+    Returns:
+        str: The engine to use ('pandas' when pyarrow is not installed)
+    """
+    engine = engine or os.environ.get(ENGINE_ENV_VAR) or 'pandas'
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine: {engine}")
+    if engine == 'arrow' and not HAS_PYARROW:
+        print("Warning: pyarrow is not installed, using the pandas engine")
+        return 'pandas'
+    return engine
+
+
+def lookup_join(left: pd.DataFrame, right: pd.DataFrame, on: str) -> pd.DataFrame:
+    """
+    Left-join a table with at most one row per key through an Arrow hash lookup.
+    
+    The position of each left key among the right keys is found with
+    ``pyarrow.compute.index_in`` and the right columns are gathered with
+    ``take``, so neither table is sorted or hashed row by row in Python and
+    the left columns are never converted. Key types or columns Arrow cannot
+    handle fall back to the pandas merge.
+    
+    Args:
+        left (pd.DataFrame): Table whose rows are kept one-to-one
+        right (pd.DataFrame): Lookup table with unique ``on`` values
+        on (str): Join key column
+    
+    Returns:
+        pd.DataFrame: ``left.merge(right, on=on, how='left')``
+    """
+    payload = [col for col in right.columns if col != on]
+    if any(col in left.columns for col in payload):
+        return left.merge(right, on=on, how='left')
+    
+    try:
+        keys = _decoded(pa.array(left[on], from_pandas=True))
+        value_set = _decoded(pa.array(right[on], from_pandas=True))
+        if value_set.type != keys.type:
+            value_set = value_set.cast(keys.type)
+        positions = pc.index_in(keys, value_set=value_set)
+        taken = pa.Table.from_pandas(right[payload], preserve_index=False).take(positions).to_pandas()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        return left.merge(right, on=on, how='left')
+    
+    # Nullable extension columns come back as numpy dtypes
+    for col, dtype in right[payload].dtypes.items():
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype) and taken[col].dtype != dtype:
+            taken[col] = taken[col].astype(dtype)
+    
+    return pd.concat([left.reset_index(drop=True), taken], axis=1)
+
+
+def group_sum(rows: pd.DataFrame, dimensions: List[str], distinct: Optional[str] = None) -> pd.DataFrame:
+    """
+    Sum every non-dimension column per observed combination of dimensions on all cores.
+    
+    Arrow's group-by runs multi-threaded; the result equals
+    ``sales_cube.sum_cells``: missing dimension values form cells of their
+    own and the cells are sorted by their dimensions.
+    
+    Args:
+        rows (pd.DataFrame): Rows or cells with dimension and measure columns
+        dimensions (List[str]): Dimension columns
+        distinct (str, optional): Measure column whose distinct non-missing
+            values are counted per cell instead of summed
+    
+    Returns:
+        pd.DataFrame: Summed measures indexed by the sorted dimensions
+    """
+    measures = [col for col in rows.columns if col not in dimensions]
+    aggregations = [(col, 'count_distinct', pc.CountOptions(mode='only_valid')) if col == distinct
+                    else (col, 'sum', pc.ScalarAggregateOptions(min_count=0)) for col in measures]
+    
+    table = pa.Table.from_pandas(rows, preserve_index=False)
+    grouped = table.group_by(dimensions, use_threads=True).aggregate(aggregations).to_pandas()
+    
+    cells = grouped[dimensions].copy()
+    for col, function, _ in aggregations:
+        cells[col] = grouped[f'{col}_{function}'].to_numpy()
+    
+    # Dictionary keys come back with the categories of their chunk
+    for col in dimensions:
+        if isinstance(rows[col].dtype, pd.CategoricalDtype):
+            cells[col] = cells[col].astype(rows[col].dtype)
+    
+    cells = cells.sort_values(dimensions, na_position='last', kind='mergesort')
+    return cells.set_index(dimensions)
+
+
+def _decoded(array: 'pa.Array') -> 'pa.Array':
+    """Decode a dictionary array to its values, for hash lookups."""
+    if pa.types.is_dictionary(array.type):
+        return array.dictionary_decode()
+    return array
@@ -0,0 +1,124 @@
+"""
+Parallel batch generation of business reports for e-commerce data analysis.
+"""
+
+import multiprocessing
+import sys
+import threading
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from business_metrics import BusinessMetricsCalculator
+
+# Calculator and segment positions of the running batch; forked workers
+# inherit them, spawned workers receive them through their initializer
+_BATCH_STATE = {}
+
+# Held while a forked pool runs, so concurrent batches do not share _BATCH_STATE
+_BATCH_LOCK = threading.Lock()
+
+
+def generate_report_batch(sales_data: pd.DataFrame, years: List[int],
+                          segment_col: Optional[str] = None,
+                          segments: Optional[List] = None,
+                          include_overall: bool = True,
+                          compare_previous: bool = True,
+                          max_workers: int = 1,
+                          engine: Optional[str] = None,
+                          start_method: Optional[str] = None) -> Dict[Tuple[int, Any], Dict[str, any]]:
+    """
+    Generate comprehensive reports for every year and segment on a process pool.
+    
+    The sales table is sorted and indexed once, and the rows of every
+    segment are located with one groupby, before the workers start. Forked
+    workers share the table copy-on-write, and each task only carries a
+    segment value and its years; forked batches in one process run one at
+    a time. Spawned workers receive the table once through their
+    initializer instead. A task reports every year of one segment, or one
+    year of the whole table; the largest segments are scheduled first.
+    
+    Args:
+        sales_data (pd.DataFrame): Sales rows, e.g. from ``create_sales_dataset``
+        years (List[int]): Years to report
+        segment_col (str, optional): Column whose values get reports of
+            their own, e.g. 'customer_state'
+        segments (List, optional): Segment values to report (default:
+            every value present)
+        include_overall (bool): Also report the whole table
+        compare_previous (bool): Compare each year with the year before
+        max_workers (int): Number of worker processes (1 runs in-process)
+        engine (str, optional): Engine of the calculators, 'pandas' or 'arrow'
+        start_method (str, optional): Worker start method, 'fork' or 'spawn'
+            (default: 'fork' on Linux, 'spawn' elsewhere). Prefer 'spawn'
+            in processes that already run threads, e.g. under Streamlit,
+            since a forked child can inherit a held lock
+    
+    Returns:
+        Dict[Tuple[int, Any], Dict[str, any]]: Report of
+        ``generate_comprehensive_report`` per (year, segment), with segment
+        None for the whole table
+    """
+    calculator = BusinessMetricsCalculator(sales_data, engine=engine)
+    
+    positions = {}
+    if segment_col is not None:
+        groups = calculator.sales_data.groupby(segment_col, sort=True, observed=True).indices
+        segments = list(groups) if segments is None else list(segments)
+        positions = {segment: groups.get(segment, np.array([], dtype=np.int64)) for segment in segments}
+    
+    overall_years = list(years) if include_overall else []
+    keys = [(year, None) for year in overall_years] + [(year, segment) for segment in positions for year in years]
+    largest_first = sorted(positions, key=lambda segment: -len(positions[segment]))
+    tasks = [(None, [year]) for year in overall_years] + [(segment, list(years)) for segment in largest_first]
+    state = {'calculator': calculator, 'positions': positions, 'compare_previous': compare_previous}
+    
+    if max_workers <= 1 or len(tasks) <= 1:
+        results = [_segment_reports(state, segment, task_years) for segment, task_years in tasks]
+    else:
+        if start_method is None:
+            start_method = 'fork' if sys.platform.startswith('linux') else 'spawn'
+        context = multiprocessing.get_context(start_method)
+        pool_args = {'max_workers': min(max_workers, len(tasks)), 'mp_context': context}
+        
+        if start_method == 'fork':
+            with _BATCH_LOCK:
+                _BATCH_STATE.update(state)
+                try:
+                    with ProcessPoolExecutor(**pool_args) as pool:
+                        results = list(pool.map(_report_task, *zip(*tasks)))
+                finally:
+                    _BATCH_STATE.clear()
+        else:
+            with ProcessPoolExecutor(initializer=_init_report_worker, initargs=(state,), **pool_args) as pool:
+                results = list(pool.map(_report_task, *zip(*tasks)))
+    
+    reports = {}
+    for (segment, task_years), task_reports in zip(tasks, results):
+        for year, report in zip(task_years, task_reports):
+            reports[(year, segment)] = report
+    return {key: reports[key] for key in keys}
+
+
+def _init_report_worker(state: Dict) -> None:
+    """Install the batch state in a spawned worker (forked workers inherit it)."""
+    _BATCH_STATE.update(state)
+
+
+def _report_task(segment: Any, years: List[int]) -> List[Dict[str, any]]:
+    """Generate the reports of one task in a worker from its batch state."""
+    return _segment_reports(_BATCH_STATE, segment, years)
+
+
+def _segment_reports(state: Dict, segment: Any, years: List[int]) -> List[Dict[str, any]]:
+    """Generate the reports of one segment (None for the whole table) for some years."""
+    calculator = state['calculator']
+    if segment is not None:
+        # Positions index the sorted table, so the segment stays sorted
+        rows = calculator.sales_data.take(state['positions'][segment])
+        calculator = BusinessMetricsCalculator(rows, engine=calculator.engine)
+    
+    compare_previous = state['compare_previous']
+    return [calculator.generate_comprehensive_report(year, year - 1 if compare_previous else None)
+            for year in years]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: average order value by dimension, groupby.apply vs two-level aggregation
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from business_metrics import aggregate_order_values
+
+
+def make_sales_data(n_rows: int, n_orders: int, seed: int = 0) -> pd.DataFrame:
+    """Create synthetic item-level sales rows with order-level month, state and city"""
+    rng = np.random.default_rng(seed)
+    states = np.array([f'S{i:02d}' for i in range(50)])
+    cities = np.array([f'C{i:04d}' for i in range(3000)])
+    
+    order_month = rng.integers(1, 13, n_orders)
+    order_state = states[rng.integers(0, len(states), n_orders)]
+    order_city = cities[rng.integers(0, len(cities), n_orders)]
+    order_of_row = np.sort(rng.integers(0, n_orders, n_rows))
+    
+    return pd.DataFrame({
+        'order_id': pd.Series(order_of_row).map('ord_{:08d}'.format),
+        'order_code': order_of_row.astype(np.int32),
+        'price': rng.uniform(5, 500, n_rows).round(2),
+        'purchase_month': order_month[order_of_row],
+        'customer_state': order_state[order_of_row],
+        'customer_city': order_city[order_of_row]
+    })
+
+
+def apply_aov(data: pd.DataFrame, dim: str, order_col: str) -> pd.Series:
+    """Previous implementation: one Python callback per group"""
+    return data.groupby(dim).apply(lambda x: x.groupby(order_col)['price'].sum().mean())
+
+
+def vectorized_aov(data: pd.DataFrame, dim: str, order_col: str) -> pd.Series:
+    """Two-level vectorized aggregation"""
+    return aggregate_order_values(data, by=[dim], order_col=order_col)['avg_order_value']
+
+
+def best_of(func, repeats: int = 3) -> float:
+    """Best wall-clock time of several runs"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print("=" * 60)
+    print("AVERAGE ORDER VALUE BENCHMARK")
+    print("=" * 60)
+    
+    for n_rows in [100_000, 1_000_000, 2_000_000]:
+        data = make_sales_data(n_rows, n_orders=n_rows // 2)
+        print(f"\n{n_rows:,} rows, {data['order_id'].nunique():,} orders")
+        
+        # String ids as read from CSV, and int32 codes as produced by encode_ids=True
+        for order_col in ['order_id', 'order_code']:
+            for dim in ['purchase_month', 'customer_state', 'customer_city']:
+                expected = apply_aov(data, dim, order_col)
+                result = vectorized_aov(data, dim, order_col)
+                np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-9)
+                
+                apply_time = best_of(lambda: apply_aov(data, dim, order_col))
+                vectorized_time = best_of(lambda: vectorized_aov(data, dim, order_col))
+                print(f"  {order_col:<10} by {dim:<15} apply: {apply_time:7.3f}s  "
+                      f"vectorized: {vectorized_time:7.3f}s  speedup: {apply_time / vectorized_time:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
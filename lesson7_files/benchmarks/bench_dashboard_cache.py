@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dashboard rerun cost, pickled data cache vs shared resource cache
+"""
+import contextlib
+import io
+import os
+import pickle
+import sys
+import time
+
+# Add parent directory to path for imports
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BASE_DIR)
+
+from data_loader import load_and_process_data
+
+
+def best_of(func, repeats: int = 5) -> float:
+    """Best wall-clock time of several runs"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def selection_metrics(loader, year: int, month):
+    """Aggregates computed per selection, as in dashboard.load_selection_metrics"""
+    cube = loader.get_cube(year_filter=year, month_filter=month, status_filter='delivered')
+    return {
+        'current_totals': cube.totals(),
+        'current_monthly': cube.rollup(['purchase_month']).set_index('purchase_month')['revenue'],
+        'category_revenue': cube.rollup(['product_category_name']).set_index('product_category_name')['revenue'],
+        'state_revenue': cube.rollup(['customer_state']).set_index('customer_state')['revenue']
+    }
+
+
+def measure_cache_hits(data_path: str):
+    """Time what one rerun pays to get its data back from each cache style"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader, processed_data = load_and_process_data(data_path, encode_ids=True)
+    loader.get_cube()
+    
+    # st.cache_data stores pickled bytes and unpickles them on every hit
+    loader_bytes = pickle.dumps((loader, processed_data))
+    data_hit = best_of(lambda: pickle.loads(loader_bytes))
+    
+    # st.cache_resource returns the stored object itself
+    shared = {'data': (loader, processed_data)}
+    resource_hit = best_of(lambda: shared['data'])
+    
+    year = loader.get_available_years()[-1]
+    compute = best_of(lambda: selection_metrics(loader, year, None))
+    selection_bytes = pickle.dumps(selection_metrics(loader, year, None))
+    selection_hit = best_of(lambda: pickle.loads(selection_bytes))
+    
+    print(f"\nLoader + processed data: {len(loader_bytes) / 1024**2:.1f} MB pickled")
+    print(f"  st.cache_data hit (unpickle):     {data_hit * 1000:8.2f} ms")
+    print(f"  st.cache_resource hit:            {resource_hit * 1000:8.4f} ms")
+    print(f"\nPer-selection aggregates: {len(selection_bytes) / 1024:.1f} KB pickled")
+    print(f"  computed from the cube:           {compute * 1000:8.2f} ms")
+    print(f"  st.cache_data hit (unpickle):     {selection_hit * 1000:8.2f} ms")
+
+
+def measure_reruns(repeats: int = 10):
+    """Median end-to-end rerun latency of the dashboard script"""
+    from streamlit.testing.v1 import AppTest
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = AppTest.from_file(os.path.join(BASE_DIR, 'dashboard.py'), default_timeout=120).run()
+    
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    
+    print(f"\nDashboard rerun (same selection): median {sorted(timings)[repeats // 2] * 1000:.1f} ms")
+
+
+def main():
+    print("=" * 60)
+    print("DASHBOARD CACHE BENCHMARK")
+    print("=" * 60)
+    
+    # The dashboard resolves its data paths relative to its own directory
+    os.chdir(BASE_DIR)
+    measure_cache_hits('ecommerce_data/')
+    measure_reruns()
+
+
+if __name__ == "__main__":
+    main()
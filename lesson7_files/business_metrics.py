@@ -10,6 +10,11 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import matplotlib.pyplot as plt
 
+from data_loader import PeriodPartitionIndex, sort_by_period, PAYMENT_COLUMNS
+from sales_cube import SalesCube, sum_cells
+from aggregates import ReportState
+from arrow_engine import resolve_engine
+
 # Optional seaborn import
 try:
     import seaborn as sns
@@ -23,15 +28,39 @@ class BusinessMetricsCalculator:
     A class for calculating various business metrics from e-commerce data.
     """
     
-    def __init__(self, sales_data: pd.DataFrame):
+    def __init__(self, sales_data: Optional[pd.DataFrame] = None,
+                 cube: Optional[SalesCube] = None,
+                 engine: Optional[str] = None,
+                 states: Optional[Dict[int, ReportState]] = None):
         """
         Initialize the metrics calculator.
         
         Args:
-            sales_data (pd.DataFrame): Processed sales dataset
+            sales_data (pd.DataFrame, optional): Processed sales dataset
+            cube (SalesCube, optional): Precomputed sales cube; when given,
+                every metric is answered from its cells instead of the rows
+            engine (str, optional): Engine of the order-level group-bys,
+                'pandas' or 'arrow'; defaults to the ECOMMERCE_ENGINE
+                environment variable, then 'pandas'
+            states (Dict[int, ReportState], optional): Merged partial
+                aggregates per year; when given (and no cube), every metric
+                is answered from them (see ``StateReportEngine``)
         """
-        self.sales_data = sales_data.copy()
+        if sales_data is None and cube is None and states is None:
+            raise ValueError("Either sales_data, cube or states is required")
+        
+        self.engine = resolve_engine(engine)
+        self.cube = cube
+        self.states = states
+        self.sales_data = sales_data
+        if sales_data is None:
+            return
+        
         self._validate_data()
+        
+        # Sorted copy so each year is one contiguous, index-addressable block
+        self.sales_data = sort_by_period(sales_data)
+        self.period_index = PeriodPartitionIndex.from_frame(self.sales_data)
     
     def _validate_data(self):
         """Validate that required columns exist in the data."""
@@ -40,6 +69,18 @@ class BusinessMetricsCalculator:
         if missing_cols:
             raise ValueError(f"Missing required columns: {missing_cols}")
     
+    def _year_data(self, year: int) -> pd.DataFrame:
+        """Slice the rows of a year through the period index."""
+        return self.period_index.slice(self.sales_data, year)
+    
+    def _engine(self, year: int):
+        """Create a report engine over a year, from the cube or the states when available."""
+        if self.cube is not None:
+            return CubeReportEngine(self.cube.slice(purchase_year=year))
+        if self.states is not None:
+            return StateReportEngine(self.states.get(year) or ReportState())
+        return ReportEngine(self._year_data(year), self.engine)
+    
     def calculate_revenue_metrics(self, current_year: int, 
                                 previous_year: Optional[int] = None) -> Dict[str, float]:
         """
@@ -52,31 +93,8 @@ class BusinessMetricsCalculator:
         Returns:
             Dict[str, float]: Revenue metrics
         """
-        current_data = self.sales_data[self.sales_data['purchase_year'] == current_year]
-        
-        metrics = {
-            'total_revenue': current_data['price'].sum(),
-            'total_orders': current_data['order_id'].nunique(),
-            'average_order_value': current_data.groupby('order_id')['price'].sum().mean(),
-            'total_items_sold': len(current_data)
-        }
-        
-        if previous_year:
-            previous_data = self.sales_data[self.sales_data['purchase_year'] == previous_year]
-            prev_revenue = previous_data['price'].sum()
-            prev_orders = previous_data['order_id'].nunique()
-            prev_aov = previous_data.groupby('order_id')['price'].sum().mean()
-            
-            metrics.update({
-                'revenue_growth_rate': ((metrics['total_revenue'] - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0,
-                'order_growth_rate': ((metrics['total_orders'] - prev_orders) / prev_orders * 100) if prev_orders > 0 else 0,
-                'aov_growth_rate': ((metrics['average_order_value'] - prev_aov) / prev_aov * 100) if prev_aov > 0 else 0,
-                'previous_year_revenue': prev_revenue,
-                'previous_year_orders': prev_orders,
-                'previous_year_aov': prev_aov
-            })
-        
-        return metrics
+        previous = self._engine(previous_year) if previous_year else None
+        return self._engine(current_year).revenue_metrics(previous)
     
     def calculate_monthly_trends(self, year: int) -> pd.DataFrame:
         """
@@ -88,103 +106,286 @@ class BusinessMetricsCalculator:
         Returns:
             pd.DataFrame: Monthly trends data
         """
-        year_data = self.sales_data[self.sales_data['purchase_year'] == year]
+        return self._engine(year).monthly_trends()
+    
+    def analyze_product_performance(self, year: int, top_n: int = 10) -> Dict[str, pd.DataFrame]:
+        """
+        Analyze product category performance.
         
-        monthly_metrics = year_data.groupby('purchase_month').agg({
-            'price': 'sum',
-            'order_id': 'nunique'
-        }).reset_index()
+        Args:
+            year (int): Year to analyze
+            top_n (int): Number of top categories to return
+        
+        Returns:
+            Dict[str, pd.DataFrame]: Product performance metrics
+        """
+        return self._engine(year).product_performance(top_n)
+    
+    def analyze_geographic_performance(self, year: int) -> pd.DataFrame:
+        """
+        Analyze sales performance by geographic region.
         
-        monthly_metrics.columns = ['month', 'revenue', 'orders']
-        monthly_metrics['avg_order_value'] = year_data.groupby('purchase_month').apply(
-            lambda x: x.groupby('order_id')['price'].sum().mean()
-        ).values
+        Args:
+            year (int): Year to analyze
         
-        # Calculate growth rates
-        monthly_metrics['revenue_growth'] = monthly_metrics['revenue'].pct_change() * 100
-        monthly_metrics['order_growth'] = monthly_metrics['orders'].pct_change() * 100
-        monthly_metrics['aov_growth'] = monthly_metrics['avg_order_value'].pct_change() * 100
+        Returns:
+            pd.DataFrame: Geographic performance metrics
+        """
+        return self._engine(year).geographic_performance()
+    
+    def analyze_customer_satisfaction(self, year: int) -> Dict[str, float]:
+        """
+        Calculate customer satisfaction metrics.
         
-        return monthly_metrics
+        Args:
+            year (int): Year to analyze
+        
+        Returns:
+            Dict[str, float]: Customer satisfaction metrics
+        """
+        return self._engine(year).customer_satisfaction()
     
-    def analyze_product_performance(self, year: int, top_n: int = 10) -> Dict[str, pd.DataFrame]:
+    def analyze_delivery_performance(self, year: int) -> Dict[str, float]:
         """
-        Analyze product category performance.
+        Calculate delivery performance metrics.
         
         Args:
             year (int): Year to analyze
+        
+        Returns:
+            Dict[str, float]: Delivery performance metrics
+        """
+        return self._engine(year).delivery_performance()
+    
+    def calculate_payment_metrics(self, year: int) -> Dict[str, any]:
+        """
+        Calculate payment mix and installment metrics.
+        
+        Requires the per-order payment summary in the sales data, i.e. a
+        dataset created with ``create_sales_dataset(include_payments=True)``.
+        
+        Args:
+            year (int): Year to analyze
+        
+        Returns:
+            Dict[str, any]: Payment metrics and the payment mix by type
+        """
+        return self._engine(year).payment_metrics()
+    
+    def generate_comprehensive_report(self, current_year: int, 
+                                    previous_year: Optional[int] = None) -> Dict[str, any]:
+        """
+        Generate a comprehensive business metrics report.
+        
+        The year is sliced once and every section is computed by a single
+        ``ReportEngine`` sharing one order-level aggregate.
+        
+        Args:
+            current_year (int): Year to analyze
+            previous_year (int, optional): Comparison year
+        
+        Returns:
+            Dict[str, any]: Comprehensive metrics report
+        """
+        engine = self._engine(current_year)
+        previous = self._engine(previous_year) if previous_year else None
+        
+        report = {
+            'analysis_period': current_year,
+            'comparison_period': previous_year,
+            'revenue_metrics': engine.revenue_metrics(previous),
+            'monthly_trends': engine.monthly_trends(),
+            'product_performance': engine.product_performance(),
+            'geographic_performance': engine.geographic_performance(),
+            'customer_satisfaction': engine.customer_satisfaction(),
+            'delivery_performance': engine.delivery_performance()
+        }
+        
+        return report
+
+
+class ReportEngine:
+    """
+    Computes every report section from one pre-sliced period of sales data.
+    
+    Order ids are factorized to integer codes once, and two order-level
+    frames are built lazily from them and shared by all sections: order
+    values at the (order, month, state) grain, which serve order counts and
+    average order values for any of those dimensions, and the first row of
+    each order, which serves the order-level satisfaction and delivery
+    metrics.
+    """
+    
+    def __init__(self, period_data: pd.DataFrame, engine: str = 'pandas'):
+        """
+        Initialize the engine.
+        
+        Args:
+            period_data (pd.DataFrame): Sales rows of the analyzed period
+            engine (str): 'pandas', or 'arrow' to total the orders with
+                Arrow's multi-threaded group-by
+        """
+        self.period_data = period_data
+        self.engine = engine
+        self._order_codes = None
+        self._order_values = None
+        self._first_order_rows = None
+    
+    @property
+    def order_codes(self) -> np.ndarray:
+        """Integer code of each row's order id (-1 for missing ids)."""
+        if self._order_codes is None:
+            self._order_codes = pd.factorize(self.period_data['order_id'])[0]
+        return self._order_codes
+    
+    @property
+    def order_count(self) -> int:
+        """Number of distinct orders in the period."""
+        return int(self.order_codes.max()) + 1 if len(self.order_codes) else 0
+    
+    @property
+    def order_values(self) -> pd.DataFrame:
+        """Order revenue ('order_value') per order code, month and state."""
+        if self._order_values is None:
+            frame = pd.DataFrame({'order_code': self.order_codes,
+                                  'price': self.period_data['price'].to_numpy()})
+            for col in ('purchase_month', 'customer_state'):
+                if col in self.period_data.columns:
+                    frame[col] = self.period_data[col].to_numpy()
+            
+            keys = [col for col in frame.columns if col != 'price']
+            if self.engine == 'arrow':
+                order_values = sum_cells(frame, keys, engine='arrow')['price']
+            else:
+                order_values = frame.groupby(keys, sort=False, dropna=False, observed=True)['price'].sum()
+            order_values = order_values.reset_index(name='order_value')
+            self._order_values = order_values[order_values['order_code'] >= 0]
+        return self._order_values
+    
+    @property
+    def first_order_rows(self) -> pd.DataFrame:
+        """First sales row of each order, for order-level attributes."""
+        if self._first_order_rows is None:
+            first_rows = ~pd.Series(self.order_codes).duplicated().to_numpy()
+            self._first_order_rows = self.period_data[first_rows]
+        return self._first_order_rows
+    
+    def _orders_by(self, dim: str) -> pd.DataFrame:
+        """Order count and average order value per value of a dimension."""
+        return aggregate_order_values(self.order_values, by=[dim],
+                                      value_col='order_value', order_col='order_code')
+    
+    def _average_order_value(self) -> float:
+        """Average revenue per order over the whole period."""
+        return average_order_value(self.order_values, value_col='order_value', order_col='order_code')
+    
+    def period_totals(self) -> Dict[str, float]:
+        """
+        Calculate the revenue totals of the period.
+        
+        Returns:
+            Dict[str, float]: Revenue, orders, average order value and items sold
+        """
+        return {
+            'total_revenue': self.period_data['price'].sum(),
+            'total_orders': self.order_count,
+            'average_order_value': self._average_order_value(),
+            'total_items_sold': len(self.period_data)
+        }
+    
+    def revenue_metrics(self, previous: Optional['ReportEngine'] = None) -> Dict[str, float]:
+        """
+        Calculate revenue-related metrics.
+        
+        Args:
+            previous (ReportEngine, optional): Engine over the comparison period
+        
+        Returns:
+            Dict[str, float]: Revenue metrics
+        """
+        return _revenue_metrics(self, previous)
+    
+    def monthly_trends(self) -> pd.DataFrame:
+        """
+        Calculate month-over-month trends.
+        
+        Returns:
+            pd.DataFrame: Monthly trends data
+        """
+        revenue = self.period_data.groupby('purchase_month')['price'].sum()
+        orders = self._orders_by('purchase_month').reindex(revenue.index)
+        
+        monthly_metrics = pd.DataFrame({
+            'month': revenue.index,
+            'revenue': revenue.to_numpy(),
+            'orders': orders['orders'].fillna(0).astype('int64').to_numpy(),
+            'avg_order_value': orders['avg_order_value'].to_numpy()
+        })
+        
+        return _add_growth_rates(monthly_metrics)
+    
+    def product_performance(self, top_n: int = 10) -> Dict[str, pd.DataFrame]:
+        """
+        Analyze product category performance.
+        
+        Args:
             top_n (int): Number of top categories to return
         
         Returns:
             Dict[str, pd.DataFrame]: Product performance metrics
         """
-        year_data = self.sales_data[self.sales_data['purchase_year'] == year]
+        year_data = self.period_data
         
         if 'product_category_name' not in year_data.columns:
             return {'error': 'Product category data not available'}
         
-        category_metrics = year_data.groupby('product_category_name').agg({
+        # Distinct orders counted on the integer codes (NaN for missing ids)
+        order_codes = np.where(self.order_codes >= 0, self.order_codes, np.nan)
+        category_metrics = year_data[['product_category_name', 'price']].assign(order_id=order_codes).groupby(
+            'product_category_name', observed=True).agg({
             'price': ['sum', 'mean', 'count'],
             'order_id': 'nunique'
         }).round(2)
         
         category_metrics.columns = ['total_revenue', 'avg_item_price', 'items_sold', 'unique_orders']
-        category_metrics = category_metrics.reset_index()
-        category_metrics['revenue_share'] = (category_metrics['total_revenue'] / 
-                                           category_metrics['total_revenue'].sum() * 100).round(2)
-        
-        top_categories = category_metrics.nlargest(top_n, 'total_revenue')
         
-        return {
-            'all_categories': category_metrics.sort_values('total_revenue', ascending=False),
-            'top_categories': top_categories
-        }
+        return _category_report(category_metrics.reset_index(), top_n)
     
-    def analyze_geographic_performance(self, year: int) -> pd.DataFrame:
+    def geographic_performance(self) -> pd.DataFrame:
         """
         Analyze sales performance by geographic region.
         
-        Args:
-            year (int): Year to analyze
-        
         Returns:
             pd.DataFrame: Geographic performance metrics
         """
-        year_data = self.sales_data[self.sales_data['purchase_year'] == year]
-        
-        if 'customer_state' not in year_data.columns:
+        if 'customer_state' not in self.period_data.columns:
             return pd.DataFrame({'error': ['Geographic data not available']})
         
-        state_metrics = year_data.groupby('customer_state').agg({
-            'price': 'sum',
-            'order_id': 'nunique'
-        }).reset_index()
+        revenue = self.period_data.groupby('customer_state', observed=True)['price'].sum()
+        orders = self._orders_by('customer_state').reindex(revenue.index)
         
-        state_metrics.columns = ['state', 'revenue', 'orders']
-        state_metrics['avg_order_value'] = year_data.groupby('customer_state').apply(
-            lambda x: x.groupby('order_id')['price'].sum().mean()
-        ).values
+        state_metrics = pd.DataFrame({
+            'state': revenue.index,
+            'revenue': revenue.to_numpy(),
+            'orders': orders['orders'].fillna(0).astype('int64').to_numpy(),
+            'avg_order_value': orders['avg_order_value'].to_numpy()
+        })
         
         state_metrics = state_metrics.sort_values('revenue', ascending=False)
         return state_metrics
     
-    def analyze_customer_satisfaction(self, year: int) -> Dict[str, float]:
+    def customer_satisfaction(self) -> Dict[str, float]:
         """
         Calculate customer satisfaction metrics.
         
-        Args:
-            year (int): Year to analyze
-        
         Returns:
             Dict[str, float]: Customer satisfaction metrics
         """
-        year_data = self.sales_data[self.sales_data['purchase_year'] == year]
-        
-        if 'review_score' not in year_data.columns:
+        if 'review_score' not in self.period_data.columns:
             return {'error': 'Review data not available'}
         
-        # Remove duplicates for order-level analysis
-        order_data = year_data.drop_duplicates('order_id')
+        # Order-level analysis on the first row of each order
+        order_data = self.first_order_rows
         
         metrics = {
             'avg_review_score': order_data['review_score'].mean(),
@@ -196,24 +397,18 @@ class BusinessMetricsCalculator:
         
         return metrics
     
-    def analyze_delivery_performance(self, year: int) -> Dict[str, float]:
+    def delivery_performance(self) -> Dict[str, float]:
         """
         Calculate delivery performance metrics.
         
-        Args:
-            year (int): Year to analyze
-        
         Returns:
             Dict[str, float]: Delivery performance metrics
         """
-        year_data = self.sales_data[self.sales_data['purchase_year'] == year]
-        
-        if 'delivery_days' not in year_data.columns:
+        if 'delivery_days' not in self.period_data.columns:
             return {'error': 'Delivery data not available'}
         
-        # Remove duplicates for order-level analysis
-        order_data = year_data.drop_duplicates('order_id')
-        order_data = order_data.dropna(subset=['delivery_days'])
+        # Order-level analysis on the first row of each order
+        order_data = self.first_order_rows.dropna(subset=['delivery_days'])
         
         metrics = {
             'avg_delivery_days': order_data['delivery_days'].mean(),
@@ -224,30 +419,439 @@ class BusinessMetricsCalculator:
         
         return metrics
     
-    def generate_comprehensive_report(self, current_year: int, 
-                                    previous_year: Optional[int] = None) -> Dict[str, any]:
+    def payment_metrics(self) -> Dict[str, any]:
         """
-        Generate a comprehensive business metrics report.
+        Calculate payment mix and installment metrics.
+        
+        Returns:
+            Dict[str, any]: Payment metrics and the payment mix by type
+        """
+        if not all(col in self.period_data.columns for col in PAYMENT_COLUMNS):
+            return {'error': 'Payment data not available'}
+        
+        # Order-level analysis on the first row of each order
+        order_data = self.first_order_rows.dropna(subset=['total_paid'])
+        
+        payment_mix = order_data.groupby('payment_type', observed=True).agg(
+            orders=('total_paid', 'size'),
+            total_paid=('total_paid', 'sum')
+        )
+        payment_mix['order_share'] = (payment_mix['orders'] / payment_mix['orders'].sum() * 100).round(2)
+        
+        metrics = {
+            'avg_total_paid': order_data['total_paid'].mean(),
+            'avg_installments': order_data['payment_installments'].mean(),
+            'installment_order_percentage': (order_data['payment_installments'] > 1).mean() * 100,
+            'multi_method_percentage': (order_data['payment_methods'] > 1).mean() * 100,
+            'payment_mix': payment_mix.sort_values('orders', ascending=False).reset_index()
+        }
+        
+        return metrics
+
+
+class CubeReportEngine:
+    """
+    Computes the ``ReportEngine`` sections from a ``SalesCube`` slice of one period.
+    
+    Revenue, items and distinct orders are summed from the cube cells, and
+    the order-level satisfaction and delivery metrics come from the
+    distributions of review scores and delivery days over orders, so no
+    row-level data is touched.
+    """
+    
+    def __init__(self, cube: SalesCube):
+        """
+        Initialize the engine.
         
         Args:
-            current_year (int): Year to analyze
-            previous_year (int, optional): Comparison year
+            cube (SalesCube): Cube sliced to the analyzed period
+        """
+        self.cube = cube
+    
+    def period_totals(self) -> Dict[str, float]:
+        """
+        Calculate the revenue totals of the period.
         
         Returns:
-            Dict[str, any]: Comprehensive metrics report
+            Dict[str, float]: Revenue, orders, average order value and items sold
         """
-        report = {
-            'analysis_period': current_year,
-            'comparison_period': previous_year,
-            'revenue_metrics': self.calculate_revenue_metrics(current_year, previous_year),
-            'monthly_trends': self.calculate_monthly_trends(current_year),
-            'product_performance': self.analyze_product_performance(current_year),
-            'geographic_performance': self.analyze_geographic_performance(current_year),
-            'customer_satisfaction': self.analyze_customer_satisfaction(current_year),
-            'delivery_performance': self.analyze_delivery_performance(current_year)
+        totals = self.cube.totals()
+        return {
+            'total_revenue': totals['revenue'],
+            'total_orders': int(totals['orders']),
+            'average_order_value': totals['avg_order_value'],
+            'total_items_sold': int(totals['items'])
         }
+    
+    def revenue_metrics(self, previous: Optional['CubeReportEngine'] = None) -> Dict[str, float]:
+        """
+        Calculate revenue-related metrics.
         
-        return report
+        Args:
+            previous (CubeReportEngine, optional): Engine over the comparison period
+        
+        Returns:
+            Dict[str, float]: Revenue metrics
+        """
+        return _revenue_metrics(self, previous)
+    
+    def monthly_trends(self) -> pd.DataFrame:
+        """
+        Calculate month-over-month trends.
+        
+        Returns:
+            pd.DataFrame: Monthly trends data
+        """
+        monthly = self.cube.rollup(['purchase_month'])
+        
+        monthly_metrics = pd.DataFrame({
+            'month': monthly['purchase_month'],
+            'revenue': monthly['revenue'],
+            'orders': monthly['orders'].astype('int64'),
+            'avg_order_value': monthly['avg_order_value']
+        })
+        
+        return _add_growth_rates(monthly_metrics)
+    
+    def product_performance(self, top_n: int = 10) -> Dict[str, pd.DataFrame]:
+        """
+        Analyze product category performance.
+        
+        Args:
+            top_n (int): Number of top categories to return
+        
+        Returns:
+            Dict[str, pd.DataFrame]: Product performance metrics
+        """
+        if 'product_category_name' not in self.cube.dimensions:
+            return {'error': 'Product category data not available'}
+        
+        categories = self.cube.rollup(['product_category_name'])
+        
+        category_metrics = pd.DataFrame({
+            'product_category_name': categories['product_category_name'],
+            'total_revenue': categories['revenue'],
+            'avg_item_price': categories['avg_item_price'],
+            'items_sold': categories['items'].astype('int64'),
+            'unique_orders': categories['orders'].astype('int64')
+        }).round(2)
+        
+        return _category_report(category_metrics, top_n)
+    
+    def geographic_performance(self) -> pd.DataFrame:
+        """
+        Analyze sales performance by geographic region.
+        
+        Returns:
+            pd.DataFrame: Geographic performance metrics
+        """
+        if 'customer_state' not in self.cube.dimensions:
+            return pd.DataFrame({'error': ['Geographic data not available']})
+        
+        states = self.cube.rollup(['customer_state'])
+        
+        state_metrics = pd.DataFrame({
+            'state': states['customer_state'],
+            'revenue': states['revenue'],
+            'orders': states['orders'].astype('int64'),
+            'avg_order_value': states['avg_order_value']
+        })
+        
+        state_metrics = state_metrics.sort_values('revenue', ascending=False)
+        return state_metrics
+    
+    def customer_satisfaction(self) -> Dict[str, float]:
+        """
+        Calculate customer satisfaction metrics.
+        
+        Returns:
+            Dict[str, float]: Customer satisfaction metrics
+        """
+        if 'review_score' not in self.cube.order_dimensions:
+            return {'error': 'Review data not available'}
+        
+        # Orders per review score, including orders without a review
+        orders = self.cube.order_rollup(['review_score'], dropna=False)
+        scores, counts = orders['review_score'].to_numpy(), orders['orders'].to_numpy()
+        reviewed = ~np.isnan(scores)
+        
+        metrics = {
+            'avg_review_score': _ratio((scores[reviewed] * counts[reviewed]).sum(), counts[reviewed].sum()),
+            'total_reviews': int(counts[reviewed].sum()),
+            'score_5_percentage': _ratio(counts[scores == 5].sum(), counts.sum()) * 100,
+            'score_4_plus_percentage': _ratio(counts[scores >= 4].sum(), counts.sum()) * 100,
+            'score_1_2_percentage': _ratio(counts[scores <= 2].sum(), counts.sum()) * 100
+        }
+        
+        return metrics
+    
+    def delivery_performance(self) -> Dict[str, float]:
+        """
+        Calculate delivery performance metrics.
+        
+        Returns:
+            Dict[str, float]: Delivery performance metrics
+        """
+        if 'delivery_days' not in self.cube.order_dimensions:
+            return {'error': 'Delivery data not available'}
+        
+        # Orders per number of delivery days, sorted by days
+        orders = self.cube.order_rollup(['delivery_days'])
+        days, counts = orders['delivery_days'].to_numpy(dtype=float), orders['orders'].to_numpy()
+        
+        metrics = {
+            'avg_delivery_days': _ratio((days * counts).sum(), counts.sum()),
+            'median_delivery_days': _weighted_median(days, counts),
+            'fast_delivery_percentage': _ratio(counts[days <= 3].sum(), counts.sum()) * 100,
+            'slow_delivery_percentage': _ratio(counts[days > 7].sum(), counts.sum()) * 100
+        }
+        
+        return metrics
+    
+    def payment_metrics(self) -> Dict[str, any]:
+        """
+        Calculate payment metrics, which the cube does not carry.
+        
+        Returns:
+            Dict[str, any]: Error entry; use a row-based calculator instead
+        """
+        return {'error': 'Payment data not available in the sales cube'}
+
+
+class StateReportEngine:
+    """
+    Computes the ``ReportEngine`` sections from the merged ``ReportState`` of one period.
+    
+    The state can be merged from partitions computed separately (file
+    chunks, months, workers, appended rows), so no row-level data is
+    touched; see ``ReportState`` for the tolerance against the row path.
+    """
+    
+    def __init__(self, state: ReportState):
+        """
+        Initialize the engine.
+        
+        Args:
+            state (ReportState): Partial aggregates of the analyzed period
+        """
+        self.state = state
+    
+    def period_totals(self) -> Dict[str, float]:
+        """
+        Calculate the revenue totals of the period.
+        
+        Returns:
+            Dict[str, float]: Revenue, orders, average order value and items sold
+        """
+        revenue, orders = self.state.revenue.result(), int(round(self.state.orders.result()))
+        return {
+            'total_revenue': revenue,
+            'total_orders': orders,
+            'average_order_value': _ratio(revenue, orders),
+            'total_items_sold': self.state.items.result()
+        }
+    
+    def revenue_metrics(self, previous: Optional['StateReportEngine'] = None) -> Dict[str, float]:
+        """
+        Calculate revenue-related metrics.
+        
+        Args:
+            previous (StateReportEngine, optional): Engine over the comparison period
+        
+        Returns:
+            Dict[str, float]: Revenue metrics
+        """
+        return _revenue_metrics(self, previous)
+    
+    def monthly_trends(self) -> pd.DataFrame:
+        """
+        Calculate month-over-month trends.
+        
+        Returns:
+            pd.DataFrame: Monthly trends data
+        """
+        revenue, orders = self._revenue_and_orders(self.state.monthly_revenue, self.state.monthly_orders)
+        
+        monthly_metrics = pd.DataFrame({
+            'month': revenue.index,
+            'revenue': revenue.to_numpy(),
+            'orders': orders,
+            'avg_order_value': revenue.to_numpy() / np.where(orders > 0, orders, np.nan)
+        })
+        
+        return _add_growth_rates(monthly_metrics)
+    
+    def product_performance(self, top_n: int = 10) -> Dict[str, pd.DataFrame]:
+        """
+        Analyze product category performance.
+        
+        Args:
+            top_n (int): Number of top categories to return
+        
+        Returns:
+            Dict[str, pd.DataFrame]: Product performance metrics
+        """
+        if 'product_category_name' not in self.state.columns:
+            return {'error': 'Product category data not available'}
+        
+        prices = self.state.category_prices.groups
+        categories = self.state.category_prices.keys()
+        orders = self.state.category_orders.result().reindex(categories)
+        
+        category_metrics = pd.DataFrame({
+            'product_category_name': categories,
+            'total_revenue': [prices[category].total for category in categories],
+            'avg_item_price': [prices[category].result() for category in categories],
+            'items_sold': np.array([prices[category].count for category in categories], dtype=np.int64),
+            'unique_orders': np.round(orders.to_numpy(dtype=float)).astype(np.int64)
+        }).round(2)
+        
+        return _category_report(category_metrics, top_n)
+    
+    def geographic_performance(self) -> pd.DataFrame:
+        """
+        Analyze sales performance by geographic region.
+        
+        Returns:
+            pd.DataFrame: Geographic performance metrics
+        """
+        if 'customer_state' not in self.state.columns:
+            return pd.DataFrame({'error': ['Geographic data not available']})
+        
+        revenue, orders = self._revenue_and_orders(self.state.state_revenue, self.state.state_orders)
+        
+        state_metrics = pd.DataFrame({
+            'state': revenue.index,
+            'revenue': revenue.to_numpy(),
+            'orders': orders,
+            'avg_order_value': revenue.to_numpy() / np.where(orders > 0, orders, np.nan)
+        })
+        
+        state_metrics = state_metrics.sort_values('revenue', ascending=False)
+        return state_metrics
+    
+    def customer_satisfaction(self) -> Dict[str, float]:
+        """
+        Calculate customer satisfaction metrics.
+        
+        Returns:
+            Dict[str, float]: Customer satisfaction metrics
+        """
+        if 'review_score' not in self.state.columns:
+            return {'error': 'Review data not available'}
+        
+        # Orders per review score bin (<=1, 2, 3, 4, 5, >5 for integer scores), unreviewed included
+        histogram = self.state.review_histogram
+        counts, orders = histogram.result(), histogram.total
+        
+        metrics = {
+            'avg_review_score': self.state.review_scores.result(),
+            'total_reviews': self.state.review_scores.count,
+            'score_5_percentage': _ratio(counts[4], orders) * 100,
+            'score_4_plus_percentage': _ratio(counts[3:].sum(), orders) * 100,
+            'score_1_2_percentage': _ratio(counts[:2].sum(), orders) * 100
+        }
+        
+        return metrics
+    
+    def delivery_performance(self) -> Dict[str, float]:
+        """
+        Calculate delivery performance metrics.
+        
+        Returns:
+            Dict[str, float]: Delivery performance metrics
+        """
+        if 'delivery_days' not in self.state.columns:
+            return {'error': 'Delivery data not available'}
+        
+        # Delivered orders per bin (<=3, 3-7, >7 days)
+        histogram = self.state.delivery_histogram
+        counts, orders = histogram.result(), histogram.total
+        
+        metrics = {
+            'avg_delivery_days': self.state.delivery_days.result(),
+            'median_delivery_days': self.state.delivery_quantiles.quantile(0.5),
+            'fast_delivery_percentage': _ratio(counts[0], orders) * 100,
+            'slow_delivery_percentage': _ratio(counts[2], orders) * 100
+        }
+        
+        return metrics
+    
+    def payment_metrics(self) -> Dict[str, any]:
+        """
+        Calculate payment metrics, which the report state does not carry.
+        
+        Returns:
+            Dict[str, any]: Error entry; use a row-based calculator instead
+        """
+        return {'error': 'Payment data not available in the report state'}
+    
+    @staticmethod
+    def _revenue_and_orders(revenue_state, order_state) -> Tuple[pd.Series, np.ndarray]:
+        """Revenue per sorted group key, and the estimated distinct orders of each."""
+        revenue = revenue_state.result().astype(float)
+        orders = order_state.result().reindex(revenue.index).to_numpy(dtype=float)
+        return revenue, np.round(np.nan_to_num(orders)).astype(np.int64)
+
+
+def _revenue_metrics(engine, previous=None) -> Dict[str, float]:
+    """Revenue totals of an engine, with growth against a comparison engine."""
+    metrics = engine.period_totals()
+    
+    if previous is not None:
+        previous_totals = previous.period_totals()
+        prev_revenue = previous_totals['total_revenue']
+        prev_orders = previous_totals['total_orders']
+        prev_aov = previous_totals['average_order_value']
+        
+        metrics.update({
+            'revenue_growth_rate': ((metrics['total_revenue'] - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0,
+            'order_growth_rate': ((metrics['total_orders'] - prev_orders) / prev_orders * 100) if prev_orders > 0 else 0,
+            'aov_growth_rate': ((metrics['average_order_value'] - prev_aov) / prev_aov * 100) if prev_aov > 0 else 0,
+            'previous_year_revenue': prev_revenue,
+            'previous_year_orders': prev_orders,
+            'previous_year_aov': prev_aov
+        })
+    
+    return metrics
+
+
+def _add_growth_rates(monthly_metrics: pd.DataFrame) -> pd.DataFrame:
+    """Add month-over-month growth rates to monthly trends."""
+    monthly_metrics['revenue_growth'] = monthly_metrics['revenue'].pct_change() * 100
+    monthly_metrics['order_growth'] = monthly_metrics['orders'].pct_change() * 100
+    monthly_metrics['aov_growth'] = monthly_metrics['avg_order_value'].pct_change() * 100
+    return monthly_metrics
+
+
+def _category_report(category_metrics: pd.DataFrame, top_n: int) -> Dict[str, pd.DataFrame]:
+    """Add revenue shares to category metrics and select the top categories."""
+    category_metrics['revenue_share'] = (category_metrics['total_revenue'] / 
+                                       category_metrics['total_revenue'].sum() * 100).round(2)
+    
+    top_categories = category_metrics.nlargest(top_n, 'total_revenue')
+    
+    return {
+        'all_categories': category_metrics.sort_values('total_revenue', ascending=False),
+        'top_categories': top_categories
+    }
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    """Divide, returning NaN for an empty denominator like ``Series.mean``."""
+    return numerator / denominator if denominator > 0 else np.nan
+
+
+def _weighted_median(values: np.ndarray, counts: np.ndarray) -> float:
+    """Median of sorted values repeated by their counts, as ``Series.median``."""
+    total = counts.sum()
+    if total == 0:
+        return np.nan
+    
+    cumulative = np.cumsum(counts)
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cumulative, total // 2, side='right')]
+    return (lower + upper) / 2
 
 
 class MetricsVisualizer:
@@ -422,6 +1026,122 @@ class MetricsVisualizer:
         return fig
 
 
+def aggregate_order_values(data: pd.DataFrame, by: Optional[List[str]] = None,
+                           value_col: str = 'price', order_col: str = 'order_id') -> pd.DataFrame:
+    """
+    Aggregate order values in two vectorized levels: order totals, then per dimension.
+    
+    Rows are first summed per (dimensions, order), then the order totals are
+    counted and averaged per dimension value. This replaces
+    ``groupby(dim).apply(lambda x: x.groupby(order)[value].sum().mean())``
+    with integer factorization and ``np.bincount``, without a Python
+    callback per group. Only the observed combinations of dimension values
+    are numbered, so wide dimensions cost no more than the rows. Rows with a
+    missing order id or dimension value are ignored and missing values count
+    as zero, as in ``groupby().sum()``.
+    
+    Args:
+        data (pd.DataFrame): Item-level (or partially aggregated) rows
+        by (List[str], optional): Dimension columns; None aggregates all orders
+        value_col (str): Column holding the value to total per order
+        order_col (str): Order id column
+    
+    Returns:
+        pd.DataFrame: 'orders' and 'avg_order_value' indexed by the sorted
+        dimension values (a single row indexed by None when ``by`` is empty)
+    """
+    by = list(by or [])
+    order_codes, n_orders = _order_codes(data[order_col])
+    values = np.nan_to_num(data[value_col].to_numpy(dtype=float))
+    valid = order_codes >= 0
+    
+    dim_codes, levels = [], []
+    for col in by:
+        codes, uniques = pd.factorize(data[col], sort=True)
+        valid &= codes >= 0
+        dim_codes.append(codes)
+        levels.append(uniques)
+    
+    # Number the observed dimension combinations in sorted order, re-numbering
+    # after each column so that codes stay below the row count
+    rows = np.flatnonzero(valid)
+    group_codes = np.zeros(len(rows), dtype=np.int64)
+    for codes, level in zip(dim_codes, levels):
+        group_codes, _ = pd.factorize(group_codes * len(level) + codes[rows], sort=True)
+    n_groups = int(group_codes.max()) + 1 if len(rows) else int(not by)
+    
+    # Level 1: total value of each (group, order) pair
+    n_orders = max(n_orders, 1)
+    pair_keys = group_codes * n_orders + order_codes[rows]
+    if n_groups * n_orders <= 4 * len(data):
+        # Small key space: sum directly into every possible pair
+        pair_totals = np.bincount(pair_keys, weights=values[rows], minlength=n_groups * n_orders)
+        pair_keys = np.flatnonzero(np.bincount(pair_keys, minlength=n_groups * n_orders))
+        pair_totals = pair_totals[pair_keys]
+    else:
+        pair_ids, pair_keys = pd.factorize(pair_keys)
+        pair_totals = np.bincount(pair_ids, weights=values[rows], minlength=len(pair_keys))
+    pair_groups = pair_keys // n_orders
+    
+    # Level 2: number of orders and mean order total per group
+    orders = np.bincount(pair_groups, minlength=n_groups)
+    totals = np.bincount(pair_groups, weights=pair_totals, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_order_value = totals / orders
+    
+    if not by:
+        return pd.DataFrame({'orders': orders, 'avg_order_value': avg_order_value},
+                            index=pd.Index([None]))
+    
+    # Dimension values of each group, from its first row
+    first = np.zeros(n_groups, dtype=np.int64)
+    first[group_codes[::-1]] = rows[::-1]
+    arrays = [level.take(codes[first]) for codes, level in zip(dim_codes, levels)]
+    if len(arrays) == 1:
+        index = pd.Index(arrays[0], name=by[0])
+    else:
+        index = pd.MultiIndex.from_arrays(arrays, names=by)
+    return pd.DataFrame({'orders': orders, 'avg_order_value': avg_order_value}, index=index)
+
+
+def _order_codes(order_ids: pd.Series) -> Tuple[np.ndarray, int]:
+    """
+    Get dense integer order codes (-1 for missing) and the number of codes.
+    
+    Integer ids that are already dense, such as the loader's encoded ids,
+    are used as-is instead of being hashed again.
+    """
+    if pd.api.types.is_integer_dtype(order_ids.dtype) and not hasattr(order_ids.dtype, 'na_value'):
+        codes = order_ids.to_numpy(dtype=np.int64)
+        if len(codes) == 0:
+            return codes, 0
+        if codes.min() >= -1 and codes.max() < 2 * len(codes):
+            return codes, int(codes.max()) + 1
+    
+    codes, uniques = pd.factorize(order_ids)
+    return codes, len(uniques)
+
+
+def average_order_value(data: pd.DataFrame, by: Optional[List[str]] = None,
+                        value_col: str = 'price', order_col: str = 'order_id'):
+    """
+    Calculate the average order value overall or per dimension.
+    
+    Args:
+        data (pd.DataFrame): Item-level (or partially aggregated) rows
+        by (List[str], optional): Dimension columns
+        value_col (str): Column holding the value to total per order
+        order_col (str): Order id column
+    
+    Returns:
+        float or pd.Series: Overall average order value, or one per dimension value
+    """
+    aggregated = aggregate_order_values(data, by, value_col=value_col, order_col=order_col)
+    if not by:
+        return aggregated['avg_order_value'].iloc[0]
+    return aggregated['avg_order_value']
+
+
 def format_currency(value: float) -> str:
     """Format a numeric value as currency."""
     return f"${value:,.2f}"
@@ -9,7 +9,7 @@ import plotly.graph_objects as go
 import warnings
 
 # Import custom modules
-from data_loader import load_and_process_data
+from data_loader import load_and_process_data, bucketize, DERIVED_BUCKETS
 
 warnings.filterwarnings('ignore')
 
@@ -93,17 +93,76 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-@st.cache_data
+# Number of (year, month) selections whose aggregates are kept in memory
+SELECTION_CACHE_ENTRIES = 64
+
+
+@st.cache_resource
 def load_dashboard_data():
-    """Load and cache data for dashboard"""
+    """
+    Load data once and share it across reruns and sessions.
+    
+    The loader is cached as a resource, so every session gets the same
+    object instead of an unpickled copy. It must be treated as read-only.
+    """
     try:
-        loader, processed_data = load_and_process_data('ecommerce_data/')
+        loader, processed_data = load_and_process_data(
+            'ecommerce_data/', cache_dir='ecommerce_data/.cache/', max_workers=6, encode_ids=True,
+            snapshot_dir='ecommerce_data/.snapshot/'
+        )
+        # Build the sales cube up front so sessions only read shared state
+        loader.get_cube()
         return loader, processed_data
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None, None
 
 
+@st.cache_data(max_entries=SELECTION_CACHE_ENTRIES)
+def load_selection_metrics(_loader, selected_year, selected_month):
+    """
+    Compute the KPI and chart aggregates of one year/month selection.
+    
+    Results are small and cached per selection with a bounded number of
+    entries. The loader is excluded from the cache key (leading
+    underscore) since it is the shared resource from ``load_dashboard_data``.
+    """
+    current_cube = _loader.get_cube(
+        year_filter=selected_year,
+        month_filter=selected_month,
+        status_filter='delivered'
+    )
+    
+    previous_year = selected_year - 1
+    previous_cube = None
+    if previous_year in _loader.get_available_years():
+        previous_cube = _loader.get_cube(
+            year_filter=previous_year,
+            month_filter=selected_month,
+            status_filter='delivered'
+        )
+    
+    metrics = {
+        'current_totals': current_cube.totals(),
+        'previous_totals': previous_cube.totals() if previous_cube is not None else None,
+        'current_monthly': revenue_by(current_cube, 'purchase_month'),
+        'previous_monthly': revenue_by(previous_cube, 'purchase_month') if previous_cube is not None else None,
+        'category_revenue': None,
+        'state_revenue': None,
+        'delivery_satisfaction': None
+    }
+    
+    if 'product_category_name' in current_cube.dimensions:
+        metrics['category_revenue'] = revenue_by(current_cube, 'product_category_name')
+    if 'customer_state' in current_cube.dimensions:
+        metrics['state_revenue'] = revenue_by(current_cube, 'customer_state')
+    if 'delivery_category' in current_cube.dimensions and 'review_score' in metrics['current_totals']:
+        metrics['delivery_satisfaction'] = current_cube.rollup(['delivery_category']).set_index(
+            'delivery_category')['review_score']
+    
+    return metrics
+
+
 def format_currency(value):
     """Format currency values with K/M suffixes"""
     if abs(value) >= 1e6:
@@ -138,17 +197,26 @@ def format_trend(current, previous):
 
 def create_revenue_trend_chart(current_data, previous_data, current_year, previous_year):
     """Create revenue trend line chart"""
+    current_monthly = current_data.groupby('purchase_month')['price'].sum()
+    previous_monthly = None
+    if previous_data is not None and not previous_data.empty:
+        previous_monthly = previous_data.groupby('purchase_month')['price'].sum()
+    
+    return plot_revenue_trend(current_monthly, previous_monthly, current_year, previous_year)
+
+
+def plot_revenue_trend(current_monthly, previous_monthly, current_year, previous_year):
+    """Plot revenue trend from monthly revenue series (indexed by month)"""
     fig = go.Figure()
     
     # Check if we have multiple months of data
-    current_months = current_data['purchase_month'].nunique()
+    current_months = len(current_monthly)
     
     if current_months > 1:
         # Multiple months - show monthly trend
-        current_monthly = current_data.groupby('purchase_month')['price'].sum().reset_index()
         fig.add_trace(go.Scatter(
-            x=current_monthly['purchase_month'],
-            y=current_monthly['price'],
+            x=current_monthly.index,
+            y=current_monthly.values,
             mode='lines+markers',
             name=f'{current_year}',
             line=dict(color='#1f77b4', width=3),
@@ -156,11 +224,10 @@ def create_revenue_trend_chart(current_data, previous_data, current_year, previo
         ))
         
         # Previous period line (dashed)
-        if previous_data is not None and not previous_data.empty:
-            previous_monthly = previous_data.groupby('purchase_month')['price'].sum().reset_index()
+        if previous_monthly is not None and not previous_monthly.empty:
             fig.add_trace(go.Scatter(
-                x=previous_monthly['purchase_month'],
-                y=previous_monthly['price'],
+                x=previous_monthly.index,
+                y=previous_monthly.values,
                 mode='lines+markers',
                 name=f'{previous_year}',
                 line=dict(color='#ff7f0e', width=3, dash='dash'),
@@ -174,8 +241,8 @@ def create_revenue_trend_chart(current_data, previous_data, current_year, previo
         )
     else:
         # Single month - show daily trend if available, otherwise show comparison bar
-        current_revenue = current_data['price'].sum()
-        previous_revenue = previous_data['price'].sum() if previous_data is not None and not previous_data.empty else 0
+        current_revenue = current_monthly.sum()
+        previous_revenue = previous_monthly.sum() if previous_monthly is not None else 0
         
         fig.add_trace(go.Bar(
             x=[f'{current_year}', f'{previous_year}'],
@@ -192,7 +259,7 @@ def create_revenue_trend_chart(current_data, previous_data, current_year, previo
         )
     
     # Custom y-axis formatting with callback
-    max_value = max(current_data['price'].sum(), previous_data['price'].sum() if previous_data is not None and not previous_data.empty else 0)
+    max_value = max(current_monthly.sum(), previous_monthly.sum() if previous_monthly is not None else 0)
     if max_value > 1e6:
         dtick = 500000  # 500K intervals for millions
     elif max_value > 500000:
@@ -243,7 +310,13 @@ def create_category_chart(sales_data):
             xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
         )
     
-    category_revenue = sales_data.groupby('product_category_name')['price'].sum().sort_values(ascending=True).tail(10)
+    category_revenue = sales_data.groupby('product_category_name', observed=True)['price'].sum()
+    return plot_category_revenue(category_revenue)
+
+
+def plot_category_revenue(category_revenue):
+    """Plot the top 10 categories from revenue per category"""
+    category_revenue = category_revenue.sort_values(ascending=True).tail(10)
     
     fig = go.Figure(data=[
         go.Bar(
@@ -296,7 +369,13 @@ def create_state_map(sales_data):
             xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
         )
     
-    state_revenue = sales_data.groupby('customer_state')['price'].sum().reset_index()
+    state_revenue = sales_data.groupby('customer_state', observed=True)['price'].sum()
+    return plot_state_revenue(state_revenue)
+
+
+def plot_state_revenue(state_revenue):
+    """Plot US choropleth map from revenue per state"""
+    state_revenue = state_revenue.reset_index()
     state_revenue.columns = ['state', 'revenue']
     
     fig = go.Figure(data=go.Choropleth(
@@ -326,27 +405,23 @@ def create_satisfaction_delivery_chart(sales_data):
             xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
         )
     
-    # Categorize delivery days
-    def categorize_delivery(days):
-        if pd.isna(days):
-            return 'Unknown'
-        elif days <= 3:
-            return '1-3 days'
-        elif days <= 7:
-            return '4-7 days'
-        else:
-            return '8+ days'
-    
-    sales_data['delivery_category'] = sales_data['delivery_days'].apply(categorize_delivery)
+    # Categorize delivery days without modifying the caller's frame
+    delivery_category = bucketize(sales_data['delivery_days'], DERIVED_BUCKETS['delivery_category'])
     
     # Calculate average review score by delivery category
-    delivery_satisfaction = sales_data.groupby('delivery_category')['review_score'].mean().reset_index()
+    delivery_satisfaction = sales_data['review_score'].groupby(delivery_category, observed=True).mean()
+    return plot_delivery_satisfaction(delivery_satisfaction)
+
+
+def plot_delivery_satisfaction(delivery_satisfaction):
+    """Plot average review score per delivery category"""
+    delivery_satisfaction = delivery_satisfaction.rename('review_score').rename_axis('delivery_category').reset_index()
     delivery_satisfaction = delivery_satisfaction[delivery_satisfaction['delivery_category'] != 'Unknown']
     
     # Order categories properly
-    category_order = ['1-3 days', '4-7 days', '8+ days']
+    category_order = DERIVED_BUCKETS['delivery_category']['labels']
     delivery_satisfaction['delivery_category'] = pd.Categorical(
-        delivery_satisfaction['delivery_category'], 
+        delivery_satisfaction['delivery_category'].astype(str), 
         categories=category_order, 
         ordered=True
     )
@@ -376,6 +451,11 @@ def create_satisfaction_delivery_chart(sales_data):
     return fig
 
 
+def revenue_by(cube, dimension):
+    """Roll cube revenue up to one dimension as a series"""
+    return cube.rollup([dimension]).set_index(dimension)['revenue']
+
+
 def main():
     """Main dashboard function"""
     
@@ -446,34 +526,24 @@ def main():
         else:
             selected_month = int(selected_month_display.split(' - ')[0])
     
-    # Create datasets based on selected year and month
-    current_data = loader.create_sales_dataset(
-        year_filter=selected_year,
-        month_filter=selected_month,
-        status_filter='delivered'
-    )
-    
+    # Aggregates of the selected year and month from the precomputed sales cube
+    selection = load_selection_metrics(loader, selected_year, selected_month)
+    current_totals = selection['current_totals']
+    previous_totals = selection['previous_totals']
     previous_year = selected_year - 1
-    previous_data = None
-    if previous_year in available_years:
-        previous_data = loader.create_sales_dataset(
-            year_filter=previous_year,
-            month_filter=selected_month,
-            status_filter='delivered'
-        )
     
     # Calculate metrics
-    total_revenue = current_data['price'].sum()
-    total_orders = current_data['order_id'].nunique()
-    avg_order_value = current_data.groupby('order_id')['price'].sum().mean()
+    total_revenue = current_totals['revenue']
+    total_orders = int(current_totals['orders'])
+    avg_order_value = current_totals['avg_order_value']
     
     # Calculate previous year metrics for trends
-    prev_revenue = previous_data['price'].sum() if previous_data is not None else 0
-    prev_orders = previous_data['order_id'].nunique() if previous_data is not None else 0
-    prev_aov = previous_data.groupby('order_id')['price'].sum().mean() if previous_data is not None else 0
+    prev_revenue = previous_totals['revenue'] if previous_totals is not None else 0
+    prev_orders = int(previous_totals['orders']) if previous_totals is not None else 0
+    prev_aov = previous_totals['avg_order_value'] if previous_totals is not None else 0
     
     # Monthly growth calculation
-    monthly_data = current_data.groupby('purchase_month')['price'].sum()
+    monthly_data = selection['current_monthly']
     monthly_growth = monthly_data.pct_change().mean() * 100 if len(monthly_data) > 1 else 0
     
     # KPI Row - 4 cards
@@ -531,19 +601,28 @@ def main():
     chart_row2_col1, chart_row2_col2 = st.columns(2)
     
     with chart_row1_col1:
-        revenue_fig = create_revenue_trend_chart(current_data, previous_data, selected_year, previous_year)
+        revenue_fig = plot_revenue_trend(monthly_data, selection['previous_monthly'], selected_year, previous_year)
         st.plotly_chart(revenue_fig, use_container_width=True)
     
     with chart_row1_col2:
-        category_fig = create_category_chart(current_data)
+        if selection['category_revenue'] is not None:
+            category_fig = plot_category_revenue(selection['category_revenue'])
+        else:
+            category_fig = create_category_chart(pd.DataFrame())
         st.plotly_chart(category_fig, use_container_width=True)
     
     with chart_row2_col1:
-        map_fig = create_state_map(current_data)
+        if selection['state_revenue'] is not None:
+            map_fig = plot_state_revenue(selection['state_revenue'])
+        else:
+            map_fig = create_state_map(pd.DataFrame())
         st.plotly_chart(map_fig, use_container_width=True)
     
     with chart_row2_col2:
-        satisfaction_fig = create_satisfaction_delivery_chart(current_data)
+        if selection['delivery_satisfaction'] is not None:
+            satisfaction_fig = plot_delivery_satisfaction(selection['delivery_satisfaction'])
+        else:
+            satisfaction_fig = create_satisfaction_delivery_chart(pd.DataFrame())
         st.plotly_chart(satisfaction_fig, use_container_width=True)
     
     st.markdown("<br>", unsafe_allow_html=True)
@@ -555,9 +634,9 @@ def main():
     
     with bottom_col1:
         # Average delivery time
-        if 'delivery_days' in current_data.columns:
-            avg_delivery = current_data['delivery_days'].mean()
-            prev_delivery = previous_data['delivery_days'].mean() if previous_data is not None else 0
+        if 'delivery_days' in current_totals:
+            avg_delivery = current_totals['delivery_days']
+            prev_delivery = previous_totals['delivery_days'] if previous_totals is not None else 0
             delivery_trend = format_trend(avg_delivery, prev_delivery)
             
             st.markdown(f"""
@@ -578,8 +657,8 @@ def main():
     
     with bottom_col2:
         # Review score
-        if 'review_score' in current_data.columns:
-            avg_review = current_data['review_score'].mean()
+        if 'review_score' in current_totals:
+            avg_review = current_totals['review_score']
             stars = "★" * int(round(avg_review))
             
             st.markdown(f"""
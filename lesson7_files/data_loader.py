@@ -2,63 +2,966 @@
 Data loading and processing module for e-commerce data analysis.
 """
 
+import os
+import sys
+import shutil
+import json
+import hashlib
+import io
+from collections import OrderedDict
+from multiprocessing import resource_tracker, shared_memory
 import pandas as pd
 import numpy as np
-from typing import Dict, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple, Optional, Union
 import warnings
 
+from sales_cube import SalesCube
+from arrow_engine import lookup_join, resolve_engine
+
+# Optional pyarrow import (required for the Parquet/Feather cache and snapshots)
+try:
+    import pyarrow
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 warnings.filterwarnings('ignore')
 
+# Source CSV file for each raw table
+FILE_MAPPINGS = {
+    'orders': 'orders_dataset.csv',
+    'order_items': 'order_items_dataset.csv',
+    'products': 'products_dataset.csv',
+    'customers': 'customers_dataset.csv',
+    'reviews': 'order_reviews_dataset.csv',
+    'payments': 'order_payments_dataset.csv'
+}
+
+# Format of all timestamp columns in the source CSVs
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Declared column types applied when each raw table is parsed:
+#   category   - low-cardinality strings stored as pandas categoricals
+#   integer    - counts downcast to the smallest integer type that fits
+#   float64    - monetary values kept at full precision for summation
+#   timestamps - parsed with TIMESTAMP_FORMAT
+TABLE_SCHEMAS = {
+    'orders': {
+        'category': ['order_status'],
+        'timestamps': ['order_purchase_timestamp', 'order_approved_at',
+                       'order_delivered_carrier_date', 'order_delivered_customer_date',
+                       'order_estimated_delivery_date']
+    },
+    'order_items': {
+        'integer': ['order_item_id'],
+        'float64': ['price', 'freight_value'],
+        'timestamps': ['shipping_limit_date']
+    },
+    'products': {
+        'category': ['product_category_name'],
+        'integer': ['product_name_length', 'product_description_length', 'product_photos_qty',
+                    'product_weight_g', 'product_length_cm', 'product_height_cm',
+                    'product_width_cm']
+    },
+    'customers': {
+        'category': ['customer_city', 'customer_state'],
+        'integer': ['customer_zip_code_prefix']
+    },
+    'reviews': {
+        'category': ['review_comment_title'],
+        'integer': ['review_score'],
+        'timestamps': ['review_creation_date', 'review_answer_timestamp']
+    },
+    'payments': {
+        'category': ['payment_type'],
+        'integer': ['payment_sequential', 'payment_installments'],
+        'float64': ['payment_value']
+    }
+}
+
+# Id domain of each id column; all tables share one code space per domain
+ID_DOMAINS = {
+    'order_id': 'order',
+    'customer_id': 'customer',
+    'product_id': 'product',
+    'seller_id': 'seller'
+}
+
+# Columns of the per-order payment summary built by ``aggregate_payments_by_order``
+PAYMENT_COLUMNS = ['total_paid', 'payment_installments', 'payment_type', 'payment_methods']
+
+CACHE_FORMATS = ('parquet', 'feather')
+LOAD_EXECUTORS = ('thread', 'process')
+
+# Layout version of the files written by ``save_snapshot``
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MANIFEST = 'manifest.json'
+
+# Layout version of the blocks written by ``publish_shared``, and the byte
+# alignment of every column buffer inside a block
+SHARED_VERSION = 2
+SHARED_ALIGNMENT = 64
+
+# Names of the shared memory blocks created by this process
+_PUBLISHED_BLOCKS = set()
+
+# Processed tables exported by ``write_partitioned``, and the Hive name of
+# the partition holding rows without a purchase period
+PARTITIONED_TABLES = ('orders', 'order_items', 'sales')
+HIVE_NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Bucketed columns derived from a numeric source column by ``bucketize``.
+# A value falls in the first bin whose upper edge is >= the value; missing
+# values get the 'missing' label (or stay missing when it is None).
+DERIVED_BUCKETS = {
+    'delivery_category': {
+        'source': 'delivery_days',
+        'edges': [3, 7],
+        'labels': ['1-3 days', '4-7 days', '8+ days'],
+        'missing': 'Unknown'
+    },
+    'price_band': {
+        'source': 'price',
+        'edges': [50, 100, 250, 500, 1000],
+        'labels': ['$0-50', '$50-100', '$100-250', '$250-500', '$500-1000', '$1000+'],
+        'missing': None
+    },
+    'review_tier': {
+        'source': 'review_score',
+        'edges': [2, 3],
+        'labels': ['Low (1-2)', 'Neutral (3)', 'High (4-5)'],
+        'missing': 'No review'
+    }
+}
+
+# Derived buckets of every sales dataset; the others are opt-in through
+# create_sales_dataset(derived=...)
+DEFAULT_BUCKETS = ('delivery_category',)
+
+# Columns every scoped load keeps: the join keys and the fields that
+# processing relies on (status filters and the period sort)
+TABLE_KEYS = {
+    'orders': ['order_id', 'customer_id', 'order_status', 'order_purchase_timestamp'],
+    'order_items': ['order_id', 'order_item_id', 'product_id'],
+    'products': ['product_id'],
+    'customers': ['customer_id'],
+    'reviews': ['order_id'],
+    'payments': ['order_id']
+}
+
+# Tables the sales fact table is built on, loaded by every scoped load
+BASE_TABLES = ('orders', 'order_items')
+
+# Source columns of each derived column of the processed tables
+DERIVED_SOURCES = {
+    'purchase_year': ['order_purchase_timestamp'],
+    'purchase_month': ['order_purchase_timestamp'],
+    'purchase_date': ['order_purchase_timestamp'],
+    'delivery_days': ['order_purchase_timestamp', 'order_delivered_customer_date'],
+    'total_item_value': ['price', 'freight_value'],
+    'review_score': ['review_score', 'review_creation_date'],
+    **{col: ['payment_type', 'payment_installments', 'payment_value'] for col in PAYMENT_COLUMNS},
+    **{col: [spec['source']] for col, spec in DERIVED_BUCKETS.items()}
+}
+
+# Rows per chunk when a scoped load filters a CSV while reading it
+LOAD_CHUNK_ROWS = 500_000
+
 
 class EcommerceDataLoader:
     """
     A class for loading and processing e-commerce data.
     """
     
-    def __init__(self, data_path: str = 'ecommerce_data/'):
+    def __init__(self, data_path: str = 'ecommerce_data/',
+                 cache_dir: Optional[str] = None,
+                 cache_format: str = 'parquet',
+                 max_workers: int = 1,
+                 executor: str = 'thread',
+                 encode_ids: bool = False,
+                 dataset_cache_entries: int = 32,
+                 dataset_cache_bytes: Optional[int] = 256 * 1024**2,
+                 engine: Optional[str] = None):
         """
         Initialize the data loader.
         
         Args:
             data_path (str): Path to the directory containing CSV files
+            cache_dir (str, optional): Directory for the columnar cache of
+                parsed CSV files. Caching is disabled when None.
+            cache_format (str): Cache file format, 'parquet' or 'feather'
+            max_workers (int): Number of tables loaded concurrently (1 loads sequentially)
+            executor (str): Pool used for concurrent loading, 'thread' or 'process'
+            encode_ids (bool): Replace id strings in processed data with dense
+                int32 codes (see ``encode_id_columns``)
+            dataset_cache_entries (int): Maximum number of ``create_sales_dataset``
+                results kept in memory (0 disables memoization)
+            dataset_cache_bytes (int, optional): Maximum total size in bytes of
+                the memoized results, None for no size limit
+            engine (str, optional): Engine of the sales joins and cube
+                group-bys, 'pandas' or 'arrow' (multi-threaded, see
+                ``arrow_engine``); defaults to the ECOMMERCE_ENGINE
+                environment variable, then 'pandas'
         """
+        if cache_format not in CACHE_FORMATS:
+            raise ValueError(f"Unsupported cache format: {cache_format}")
+        if executor not in LOAD_EXECUTORS:
+            raise ValueError(f"Unsupported executor: {executor}")
+        
         self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.cache_format = cache_format
+        self.max_workers = max(1, max_workers)
+        self.executor = executor
+        self.encode_ids = encode_ids
+        self.engine = resolve_engine(engine)
+        self.id_dictionaries = {}
         self.raw_data = {}
         self.processed_data = {}
+        self.load_scope = None
+        self.source_offsets = {}
+        self.partition_dir = None
+        self.sql_backend = None
+        self.orders_index = None
+        self.sales_index = None
+        self.sales_cube = None
+        self.shared_name = None
+        self._shared_blocks = []
+        self._owns_shared = False
+        
+        # LRU memo of create_sales_dataset results, keyed by data version and filters
+        self.dataset_cache_entries = max(0, dataset_cache_entries)
+        self.dataset_cache_bytes = dataset_cache_bytes
+        self.data_version = 0
+        self._dataset_cache = OrderedDict()
+        self._dataset_cache_size = 0
+        self._dataset_sizes = {}
+        self._dataset_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        
+        if self.cache_dir and not HAS_PYARROW:
+            print("Warning: pyarrow is not installed, columnar cache disabled")
+            self.cache_dir = None
     
-    def load_raw_data(self) -> Dict[str, pd.DataFrame]:
+    def load_raw_data(self, columns: Optional[List[str]] = None,
+                      year_filter: Optional[int] = None,
+                      month_filter: Optional[int] = None) -> Dict[str, pd.DataFrame]:
         """
         Load all raw CSV files into DataFrames.
         
+        When a cache directory is configured, each table is read from its
+        columnar cache if the source CSV is unchanged, and the cache is
+        (re)written after parsing otherwise. With ``max_workers`` above 1 the
+        tables are loaded concurrently and logged in their usual order.
+        
+        Passing columns or a period scopes the load to what a consumer needs
+        (see ``_load_scoped``); the sales dataset then only holds those
+        columns and the orders of that period.
+        
+        Args:
+            columns (List[str], optional): Sales dataset columns the consumer
+                needs, e.g. ['order_id', 'price', 'customer_state']; every
+                column when None
+            year_filter (int, optional): Only load orders of this year
+            month_filter (int, optional): Only load orders of this month
+        
         Returns:
             Dict[str, pd.DataFrame]: Dictionary containing all raw datasets
         """
-        file_mappings = {
-            'orders': 'orders_dataset.csv',
-            'order_items': 'order_items_dataset.csv',
-            'products': 'products_dataset.csv',
-            'customers': 'customers_dataset.csv',
-            'reviews': 'order_reviews_dataset.csv',
-            'payments': 'order_payments_dataset.csv'
+        if columns is not None or year_filter is not None or month_filter is not None:
+            return self._load_scoped(columns, year_filter, month_filter)
+        
+        self.load_scope = None
+        source_sizes = self._source_sizes()
+        if self.max_workers > 1:
+            pool_class = ThreadPoolExecutor if self.executor == 'thread' else ProcessPoolExecutor
+            with pool_class(max_workers=min(self.max_workers, len(FILE_MAPPINGS))) as pool:
+                futures = {
+                    key: pool.submit(_load_table_task, self.data_path, self.cache_dir,
+                                     self.cache_format, key, filename)
+                    for key, filename in FILE_MAPPINGS.items()
+                }
+                results = ((key, future.result()) for key, future in futures.items())
+                self._store_loaded_tables(results)
+        else:
+            self._store_loaded_tables(
+                (key, self._load_table(key, filename)) for key, filename in FILE_MAPPINGS.items()
+            )
+        
+        # Remember how far each file was read for incremental refreshes
+        self.source_offsets = {
+            key: {'bytes': source_sizes[key], 'rows': len(df), 'columns': list(df.columns)}
+            for key, df in self.raw_data.items() if key in source_sizes
         }
         
-        for key, filename in file_mappings.items():
+        return self.raw_data
+    
+    def _source_sizes(self) -> Dict[str, int]:
+        """Get the current size in bytes of each existing source CSV."""
+        sizes = {}
+        for key, filename in FILE_MAPPINGS.items():
             try:
-                self.raw_data[key] = pd.read_csv(f"{self.data_path}{filename}")
-                print(f"Loaded {key}: {len(self.raw_data[key])} records")
-            except FileNotFoundError:
-                print(f"Warning: {filename} not found, skipping...")
+                sizes[key] = os.path.getsize(f"{self.data_path}{filename}")
+            except OSError:
+                continue
+        return sizes
+    
+    def _load_scoped(self, columns: Optional[List[str]], year_filter: Optional[int],
+                     month_filter: Optional[int]) -> Dict[str, pd.DataFrame]:
+        """
+        Load only the tables, columns and rows a scoped load needs.
+        
+        Projection: each table is read with the requested columns it holds,
+        the source columns of requested derived columns (``DERIVED_SOURCES``)
+        and its ``TABLE_KEYS``; tables other than ``BASE_TABLES`` that hold
+        none of the requested columns are not read at all.
+        
+        Period: orders are filtered by purchase date while the CSV is read in
+        chunks, and every other table is semi-joined while reading on the
+        keys kept so far (items, reviews and payments on order ids,
+        customers on customer ids, products on product ids), so rows outside
+        the period never accumulate in memory.
+        
+        Scoped tables are read from a fresh columnar cache when there is one
+        but never written to it, since the cache holds whole tables.
+        
+        Args:
+            columns (List[str], optional): Sales dataset columns to load
+            year_filter (int, optional): Only load orders of this year
+            month_filter (int, optional): Only load orders of this month
+        
+        Returns:
+            Dict[str, pd.DataFrame]: Dictionary containing the scoped raw datasets
+        """
+        needed = resolve_source_columns(columns) if columns is not None else None
+        has_period = year_filter is not None or month_filter is not None
+        self.raw_data = {}
+        self.load_scope = {'columns': columns, 'year_filter': year_filter, 'month_filter': month_filter}
+        
+        # Semi-join of each table: (table read before it, key column)
+        semi_joins = {
+            'order_items': ('orders', 'order_id'),
+            'customers': ('orders', 'customer_id'),
+            'products': ('order_items', 'product_id'),
+            'reviews': ('orders', 'order_id'),
+            'payments': ('orders', 'order_id')
+        }
         
+        results = {}
+        for key in ['orders'] + list(semi_joins):
+            filepath = f"{self.data_path}{FILE_MAPPINGS[key]}"
+            if not os.path.exists(filepath):
+                results[key] = (None, False)
+                continue
+            
+            usecols = None
+            if needed is not None:
+                keys = TABLE_KEYS[key]
+                usecols = [col for col in pd.read_csv(filepath, nrows=0).columns if col in needed or col in keys]
+                if key not in BASE_TABLES and all(col in keys for col in usecols):
+                    continue
+            
+            row_filter = None
+            if has_period and key == 'orders':
+                row_filter = lambda df: period_mask(parse_timestamps(df['order_purchase_timestamp']),
+                                                    year_filter, month_filter)
+            elif has_period and semi_joins[key][0] in self.raw_data:
+                source, col = semi_joins[key]
+                row_filter = semi_join_filter(col, self.raw_data[source][col])
+            results[key] = self._read_scoped_table(key, filepath, usecols, row_filter)
+            self.raw_data[key] = results[key][0]
+        
+        self.raw_data = {}
+        self._store_loaded_tables((key, results[key]) for key in FILE_MAPPINGS if key in results)
         return self.raw_data
     
-    def clean_orders_data(self) -> pd.DataFrame:
+    def _read_scoped_table(self, key: str, filepath: str, usecols: Optional[List[str]],
+                           row_filter) -> Tuple[pd.DataFrame, bool]:
+        """
+        Read selected columns and rows of a raw table.
+        
+        Args:
+            key (str): Raw table name
+            filepath (str): Path to the source CSV file
+            usecols (List[str], optional): Columns to read, all when None
+            row_filter (callable, optional): Function returning the boolean
+                mask of rows to keep of a chunk, applied before the schema so
+                only kept rows pay for type conversion
+        
+        Returns:
+            Tuple[pd.DataFrame, bool]: Loaded table and whether it came from the cache
+        """
+        if self.cache_dir:
+            cached = self._read_cache(key, filepath, columns=usecols)
+            if cached is not None:
+                if row_filter is not None:
+                    cached = cached[row_filter(cached)].reset_index(drop=True)
+                return cached, True
+        
+        if row_filter is None:
+            return apply_schema(pd.read_csv(filepath, usecols=usecols, dtype=parse_dtypes(key)), key), False
+        
+        chunks = [
+            chunk[row_filter(chunk)]
+            for chunk in pd.read_csv(filepath, usecols=usecols, dtype=parse_dtypes(key), chunksize=LOAD_CHUNK_ROWS)
+        ]
+        
+        # Chunks with different categories concatenate to strings, which the schema re-encodes
+        return apply_schema(pd.concat(chunks, ignore_index=True), key), False
+    
+    def _store_loaded_tables(self, results) -> None:
+        """
+        Store and log loaded tables in file-mapping order.
+        
+        Args:
+            results: Iterable of (key, (DataFrame or None, cached flag)) pairs
+        """
+        for key, (df, cached) in results:
+            if df is None:
+                print(f"Warning: {FILE_MAPPINGS[key]} not found, skipping...")
+                continue
+            
+            self.raw_data[key] = df
+            print(f"Loaded {key}: {len(df)} records" + (" (cached)" if cached else ""))
+    
+    def _load_table(self, key: str, filename: str) -> Tuple[Optional[pd.DataFrame], bool]:
+        """
+        Load a single raw table from its cache or source CSV.
+        
+        Args:
+            key (str): Raw table name
+            filename (str): Source CSV file name
+        
+        Returns:
+            Tuple[pd.DataFrame or None, bool]: Loaded table (None if the file
+            is missing) and whether it came from the cache
+        """
+        filepath = f"{self.data_path}{filename}"
+        if not os.path.exists(filepath):
+            return None, False
+        
+        if self.cache_dir:
+            cached = self._read_cache(key, filepath)
+            if cached is not None:
+                return cached, True
+        
+        df = apply_schema(pd.read_csv(filepath, dtype=parse_dtypes(key)), key)
+        
+        if self.cache_dir:
+            self._write_cache(key, filepath, df)
+        
+        return df, False
+    
+    def _cache_file(self, key: str) -> str:
+        """Return the cache file path for a raw table."""
+        return os.path.join(self.cache_dir, f"{key}.{self.cache_format}")
+    
+    def _manifest_file(self, key: str) -> str:
+        """Return the manifest path for a raw table (one per table, so concurrent loads never race)."""
+        return os.path.join(self.cache_dir, f"{key}.manifest.json")
+    
+    def _read_manifest(self, key: str) -> Optional[Dict]:
+        """Read the cache manifest entry of a raw table, or None if missing or corrupt."""
+        try:
+            with open(self._manifest_file(key), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _read_cache(self, key: str, filepath: str,
+                    columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        Read a raw table from the columnar cache.
+        
+        Args:
+            key (str): Raw table name
+            filepath (str): Path to the source CSV file
+            columns (List[str], optional): Columns to read, all when None
+        
+        Returns:
+            pd.DataFrame or None: Cached table, or None if the cache is
+            missing or stale
+        """
+        entry = self._read_manifest(key)
+        cache_file = self._cache_file(key)
+        if not entry or entry.get('format') != self.cache_format or not os.path.exists(cache_file):
+            return None
+        
+        # Tables cached under a different declared schema are re-parsed
+        if entry.get('schema') != TABLE_SCHEMAS.get(key):
+            return None
+        
+        stat = os.stat(filepath)
+        if entry['size'] != stat.st_size:
+            return None
+        
+        # Same size but touched: only a content change invalidates the cache
+        if entry['mtime_ns'] != stat.st_mtime_ns:
+            if entry['sha256'] != file_sha256(filepath):
+                return None
+            entry['mtime_ns'] = stat.st_mtime_ns
+            self._update_manifest(key, entry)
+        
+        try:
+            if self.cache_format == 'parquet':
+                return pd.read_parquet(cache_file, columns=columns)
+            return pd.read_feather(cache_file, columns=columns)
+        except Exception as e:
+            print(f"Warning: could not read cache for {key} ({e}), re-parsing...")
+            return None
+    
+    def _write_cache(self, key: str, filepath: str, df: pd.DataFrame) -> None:
+        """
+        Write a parsed table to the columnar cache and record its source fingerprint.
+        
+        Args:
+            key (str): Raw table name
+            filepath (str): Path to the source CSV file
+            df (pd.DataFrame): Parsed table
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_file = self._cache_file(key)
+        tmp_file = f"{cache_file}.tmp"
+        
+        try:
+            if self.cache_format == 'parquet':
+                df.to_parquet(tmp_file, index=False)
+            else:
+                df.reset_index(drop=True).to_feather(tmp_file)
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            print(f"Warning: could not write cache for {key} ({e})")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return
+        
+        stat = os.stat(filepath)
+        self._update_manifest(key, {
+            'source': os.path.abspath(filepath),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(filepath),
+            'format': self.cache_format,
+            'schema': TABLE_SCHEMAS.get(key)
+        })
+    
+    def _update_manifest(self, key: str, entry: Dict) -> None:
+        """Record the cache entry for a raw table in its manifest."""
+        manifest_path = self._manifest_file(key)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+    
+    def clear_cache(self) -> None:
+        """Remove all cached tables and the cache manifest."""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        
+        for key in FILE_MAPPINGS:
+            cache_files = [os.path.join(self.cache_dir, f"{key}.{fmt}") for fmt in CACHE_FORMATS]
+            for path in cache_files + [self._manifest_file(key)]:
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def save_snapshot(self, snapshot_dir: str) -> None:
+        """
+        Persist the loaded and processed state for a warm start.
+        
+        Raw and processed tables, id dictionaries and the cells of a built
+        sales cube are written as uncompressed Arrow IPC (Feather v2) files,
+        which ``restore_snapshot`` memory-maps instead of parsing and
+        processing the CSVs again. The manifest is written last and records
+        the row count of every file and a fingerprint of every source CSV.
+        
+        Args:
+            snapshot_dir (str): Directory for the snapshot files
+        """
+        if not HAS_PYARROW:
+            print("Warning: pyarrow is not installed, snapshot not written")
+            return
+        
+        # A snapshot only becomes valid once its new manifest is written
+        os.makedirs(snapshot_dir, exist_ok=True)
+        manifest_path = os.path.join(snapshot_dir, SNAPSHOT_MANIFEST)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        
+        frames, cube_dimensions = self._state_frames()
+        tables = {}
+        for name, df in frames.items():
+            filename = f"{name}.arrow"
+            feather.write_feather(df, os.path.join(snapshot_dir, filename), compression='uncompressed')
+            tables[name] = {'file': filename, 'rows': len(df)}
+        
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'schema': TABLE_SCHEMAS,
+            'encode_ids': self.encode_ids,
+            'load_scope': self.load_scope,
+            'sources': self._source_fingerprints(),
+            'source_offsets': self.source_offsets,
+            'tables': tables,
+            'cube_dimensions': cube_dimensions
+        }
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+    
+    def restore_snapshot(self, snapshot_dir: str) -> bool:
+        """
+        Restore the state written by ``save_snapshot``.
+        
+        The snapshot is only used when it was written with the same layout,
+        table schemas and id encoding, and every source CSV still starts
+        with the bytes it was built from (same size and mtime, or else the
+        same SHA-256 of that prefix). Rows appended since are left for
+        ``refresh``. Tables are memory-mapped, so numeric and string columns
+        are not copied until they are modified; period indexes are rebuilt
+        from the period-sorted tables.
+        
+        Args:
+            snapshot_dir (str): Directory written by ``save_snapshot``
+        
+        Returns:
+            bool: Whether the snapshot was restored (False when it is
+            missing, incompatible or stale)
+        """
+        if not HAS_PYARROW:
+            return False
+        
+        try:
+            with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        
+        if (manifest.get('version') != SNAPSHOT_VERSION or manifest.get('schema') != TABLE_SCHEMAS
+                or manifest.get('encode_ids') != self.encode_ids):
+            print(f"Warning: snapshot in {snapshot_dir} was written with other settings, ignoring it")
+            return False
+        if not self._sources_unchanged(manifest['sources']):
+            print(f"Warning: source files changed since the snapshot in {snapshot_dir}, ignoring it")
+            return False
+        
+        # Tables are named '<section>.<table>'
+        sections = {'raw': {}, 'processed': {}, 'ids': {}, 'cube': {}}
+        for name, entry in manifest['tables'].items():
+            try:
+                table = feather.read_table(os.path.join(snapshot_dir, entry['file']), memory_map=True)
+            except (OSError, pyarrow.ArrowException) as e:
+                print(f"Warning: could not read snapshot table {name} ({e}), ignoring the snapshot")
+                return False
+            if table.num_rows != entry['rows']:
+                print(f"Warning: snapshot table {name} is incomplete, ignoring the snapshot")
+                return False
+            prefix, table_name = name.split('.', 1)
+            sections[prefix][table_name] = table.to_pandas(split_blocks=True)
+        
+        self._install_state(sections, manifest)
+        print(f"Restored snapshot: {len(self.processed_data)} processed tables")
+        return True
+    
+    def _state_frames(self) -> Tuple[Dict[str, pd.DataFrame], Optional[List[List[str]]]]:
+        """Get the raw, processed, id and cube tables named '<section>.<table>', and the cube dimensions."""
+        frames = {f"raw.{key}": df for key, df in self.raw_data.items()}
+        frames.update({f"processed.{name}": df for name, df in self.processed_data.items()})
+        frames.update({f"ids.{domain}": pd.DataFrame({'id': dictionary})
+                       for domain, dictionary in self.id_dictionaries.items()})
+        cube_dimensions = None
+        if self.sales_cube is not None and self.sales_cube.order_cells is not None:
+            frames['cube.item_cells'] = self.sales_cube.item_cells
+            frames['cube.order_cells'] = self.sales_cube.order_cells
+            cube_dimensions = [self.sales_cube.dimensions, self.sales_cube.order_dimensions]
+        return frames, cube_dimensions
+    
+    def _install_state(self, sections: Dict[str, Dict[str, pd.DataFrame]], manifest: Dict) -> None:
+        """Install tables read back per section, rebuilding the period indexes and the cube."""
+        self.raw_data = sections['raw']
+        self.processed_data = sections['processed']
+        self.id_dictionaries = {domain: pd.Index(df['id'], name=None) for domain, df in sections['ids'].items()}
+        self.load_scope = manifest['load_scope']
+        self.source_offsets = manifest['source_offsets']
+        
+        orders, sales = self.processed_data.get('orders'), self.processed_data.get('sales')
+        self.orders_index = PeriodPartitionIndex.from_frame(orders) if orders is not None else None
+        self.sales_index = PeriodPartitionIndex.from_frame(sales) if sales is not None else None
+        self.sales_cube = None
+        if manifest['cube_dimensions']:
+            cells = sections['cube']
+            self.sales_cube = SalesCube(cells['item_cells'], cells['order_cells'], *manifest['cube_dimensions'])
+        self._invalidate_datasets()
+    
+    def _source_fingerprints(self) -> Dict[str, Optional[Dict]]:
+        """Fingerprint the ingested bytes of each source CSV (None for missing files)."""
+        fingerprints = {}
+        for key, filename in FILE_MAPPINGS.items():
+            filepath = f"{self.data_path}{filename}"
+            if not os.path.exists(filepath):
+                fingerprints[key] = None
+                continue
+            
+            stat = os.stat(filepath)
+            ingested = self.source_offsets.get(key, {}).get('bytes', stat.st_size)
+            fingerprints[key] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'bytes': ingested,
+                'sha256': file_sha256(filepath, length=ingested)
+            }
+        return fingerprints
+    
+    def _sources_unchanged(self, fingerprints: Dict[str, Optional[Dict]]) -> bool:
+        """Check that each source CSV still exists (or not) and starts with its fingerprinted bytes."""
+        for key, entry in fingerprints.items():
+            filepath = f"{self.data_path}{FILE_MAPPINGS[key]}"
+            if entry is None or not os.path.exists(filepath):
+                if entry is not None or os.path.exists(filepath):
+                    return False
+                continue
+            
+            stat = os.stat(filepath)
+            if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+                continue
+            if stat.st_size < entry['bytes'] or file_sha256(filepath, length=entry['bytes']) != entry['sha256']:
+                return False
+        return True
+    
+    def publish_shared(self, name: str = 'ecommerce') -> Dict[str, int]:
+        """
+        Publish the loaded and processed state in named shared memory blocks.
+        
+        Every table is copied once into a block of its own; numeric,
+        datetime and boolean columns, the codes of categoricals and the
+        values and masks of nullable columns are laid out as aligned
+        buffers that ``attach_shared`` maps without copying. Arrow-backed
+        string columns are written as Arrow IPC streams, also read in place;
+        object columns of strings or dates are written as UTF-8 bytes or
+        day numbers and copied by each attaching process (load with
+        ``encode_ids=True`` to share the id columns as int32 codes on any
+        pandas version). A JSON manifest block named ``name`` is written
+        last; attaching never unpickles anything. The blocks live until
+        ``unpublish_shared`` is called or this process exits.
+        
+        Args:
+            name (str): Name of the manifest block, used to attach
+        
+        Returns:
+            Dict[str, int]: Size in bytes of the block of each table
+        """
+        self.unpublish_shared()
+        frames, cube_dimensions = self._state_frames()
+        
+        blocks, tables, sizes = [], {}, {}
+        try:
+            for position, (table_name, df) in enumerate(frames.items()):
+                block_name = f"{name}_{position}"
+                block, columns = _write_shared_table(block_name, df)
+                blocks.append(block)
+                tables[table_name] = {'block': block_name, 'rows': len(df), 'columns': columns}
+                sizes[table_name] = block.size
+            
+            manifest = json.dumps({
+                'version': SHARED_VERSION,
+                'encode_ids': self.encode_ids,
+                'load_scope': self.load_scope,
+                'source_offsets': self.source_offsets,
+                'tables': tables,
+                'cube_dimensions': cube_dimensions
+            }).encode('utf-8')
+            block = _SharedBlock(name=name, create=True, size=8 + len(manifest))
+            _PUBLISHED_BLOCKS.add(name)
+            blocks.append(block)
+            block.buf[:8] = len(manifest).to_bytes(8, 'little')
+            block.buf[8:8 + len(manifest)] = manifest
+        except BaseException:
+            for block in blocks:
+                block.close()
+                block.unlink()
+            raise
+        
+        self.shared_name = name
+        self._shared_blocks = blocks
+        self._owns_shared = True
+        return sizes
+    
+    def attach_shared(self, name: str = 'ecommerce') -> bool:
+        """
+        Attach to the state published by ``publish_shared`` in another process.
+        
+        Tables are rebuilt as read-only views of the shared buffers, so the
+        processed data occupies memory once however many processes attach.
+        Operations that modify tables (e.g. ``refresh``) write new columns
+        instead of changing the shared ones.
+        
+        Args:
+            name (str): Name the state was published under
+        
+        Returns:
+            bool: True if the state was attached, False if nothing is
+            published under that name
+        """
+        try:
+            block = _attach_shared_block(name)
+        except FileNotFoundError:
+            return False
+        
+        blocks, sections = [block], {'raw': {}, 'processed': {}, 'ids': {}, 'cube': {}}
+        try:
+            length = int.from_bytes(block.buf[:8], 'little')
+            manifest = json.loads(bytes(block.buf[8:8 + length]))
+            if manifest.get('version') != SHARED_VERSION:
+                print(f"Warning: shared state {name} has an unsupported layout, not attached")
+                block.close()
+                return False
+            
+            for table_name, table in manifest['tables'].items():
+                table_block = _attach_shared_block(table['block'])
+                blocks.append(table_block)
+                prefix, key = table_name.split('.', 1)
+                sections[prefix][key] = _read_shared_table(table_block, table['rows'], table['columns'])
+        except BaseException:
+            # Drop the views of the tables read so far before unmapping them
+            sections.clear()
+            for opened in blocks:
+                opened.close()
+            raise
+        
+        self.unpublish_shared()
+        self.encode_ids = manifest['encode_ids']
+        self.partition_dir = None
+        self._install_state(sections, manifest)
+        self.shared_name = name
+        self._shared_blocks = blocks
+        self._owns_shared = False
+        return True
+    
+    def unpublish_shared(self) -> None:
+        """
+        Remove the blocks published by this loader.
+        
+        Processes already attached keep their mappings; the memory is freed
+        once the last of them exits. Attached loaders only drop the name.
+        """
+        if self._owns_shared:
+            for block in self._shared_blocks:
+                try:
+                    block.unlink()
+                except FileNotFoundError:
+                    pass
+        # Handles stay open while tables may still view their buffers
+        self.shared_name = None
+        self._owns_shared = False
+    
+    def write_partitioned(self, partition_dir: str,
+                          tables: Tuple[str, ...] = PARTITIONED_TABLES) -> Dict[str, int]:
+        """
+        Export processed tables as Hive-style partitions by purchase period.
+        
+        Each table is written to
+        ``<partition_dir>/<table>/year=<year>/month=<month>/part-0.parquet``,
+        replacing a previous export; rows without a period go to the
+        ``__HIVE_DEFAULT_PARTITION__`` partition. Order items get the period
+        columns of their order. The tables are period-sorted, so each
+        partition is a contiguous row range of ``PeriodPartitionIndex``. Id
+        dictionaries of encoded ids are written to ``<partition_dir>/ids/``.
+        
+        Args:
+            partition_dir (str): Root directory of the partitioned dataset
+            tables (Tuple[str, ...]): Processed tables to export
+        
+        Returns:
+            Dict[str, int]: Number of partitions written per table
+        """
+        if not HAS_PYARROW:
+            print("Warning: pyarrow is not installed, partitioned dataset not written")
+            return {}
+        
+        if 'sales' in tables and 'sales' not in self.processed_data:
+            self.build_sales_fact_table()
+        
+        written = {}
+        for name in tables:
+            df = self.processed_data[name]
+            if 'purchase_year' not in df.columns:
+                periods = self.processed_data['orders'][['order_id', 'purchase_year', 'purchase_month']]
+                df = sort_by_period(merge_many_to_one(df, periods, on='order_id', name='orders', engine=self.engine))
+            
+            partitions = dict(PeriodPartitionIndex.from_frame(df).period_ranges)
+            undated_start = len(df) - int(df['purchase_year'].isna().sum())
+            if undated_start < len(df):
+                partitions[(None, None)] = (undated_start, len(df))
+            
+            table_dir = os.path.join(partition_dir, name)
+            if os.path.isdir(table_dir):
+                shutil.rmtree(table_dir)
+            for (year, month), (start, stop) in partitions.items():
+                part_dir = os.path.join(table_dir, _partition_path(year, month))
+                os.makedirs(part_dir)
+                df.iloc[start:stop].to_parquet(os.path.join(part_dir, 'part-0.parquet'), index=False)
+            written[name] = len(partitions)
+        
+        ids_dir = os.path.join(partition_dir, 'ids')
+        if os.path.isdir(ids_dir):
+            shutil.rmtree(ids_dir)
+        for domain, dictionary in self.id_dictionaries.items():
+            os.makedirs(ids_dir, exist_ok=True)
+            pd.DataFrame({'id': dictionary}).to_parquet(os.path.join(ids_dir, f"{domain}.parquet"), index=False)
+        
+        return written
+    
+    def open_partitioned(self, partition_dir: str) -> None:
+        """
+        Serve period views from a dataset written by ``write_partitioned``.
+        
+        The in-memory tables are dropped. ``get_available_years`` and
+        ``get_available_months`` then list partition directories, and
+        ``create_sales_dataset`` and ``get_cube`` read only the partitions
+        of the requested period.
+        
+        Args:
+            partition_dir (str): Root directory of the partitioned dataset
+        """
+        if not os.path.isdir(os.path.join(partition_dir, 'sales')):
+            raise FileNotFoundError(f"No partitioned sales table in {partition_dir}")
+        
+        self.partition_dir = partition_dir
+        self.raw_data = {}
+        self.processed_data = {}
+        self.orders_index = None
+        self.sales_index = None
+        self.sales_cube = None
+        
+        ids_dir = os.path.join(partition_dir, 'ids')
+        self.id_dictionaries = {
+            filename[:-len('.parquet')]: pd.Index(pd.read_parquet(os.path.join(ids_dir, filename))['id'], name=None)
+            for filename in (os.listdir(ids_dir) if os.path.isdir(ids_dir) else [])
+            if filename.endswith('.parquet')
+        }
+        self._invalidate_datasets()
+    
+    def _partition_periods(self) -> List[Tuple[int, int]]:
+        """List the (year, month) partitions of the orders, or else the sales, of ``partition_dir``."""
+        return (partition_periods(self.partition_dir, 'orders')
+                or partition_periods(self.partition_dir, 'sales'))
+    
+    def clean_orders_data(self, orders: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Clean and process orders data.
         
+        Args:
+            orders (pd.DataFrame, optional): Orders to clean, e.g. newly
+                appended rows (default: the raw orders table)
+        
         Returns:
             pd.DataFrame: Cleaned orders data
         """
-        orders = self.raw_data['orders'].copy()
+        if orders is None:
+            orders = self.raw_data['orders']
+        orders = orders.copy()
         
         # Convert timestamp columns to datetime
         timestamp_cols = [
@@ -78,34 +981,71 @@ class EcommerceDataLoader:
         orders['purchase_month'] = orders['order_purchase_timestamp'].dt.month
         orders['purchase_date'] = orders['order_purchase_timestamp'].dt.date
         
-        return orders
+        # Keep orders in purchase order so each period is a contiguous block
+        return sort_by_period(orders)
     
-    def clean_order_items_data(self) -> pd.DataFrame:
+    def clean_order_items_data(self, order_items: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Clean and process order items data.
         
+        Args:
+            order_items (pd.DataFrame, optional): Items to clean, e.g. one
+                streamed chunk (default: the raw order items table)
+        
         Returns:
             pd.DataFrame: Cleaned order items data
         """
-        order_items = self.raw_data['order_items'].copy()
+        if order_items is None:
+            order_items = self.raw_data['order_items']
+        order_items = order_items.copy()
         
         # Convert shipping limit date to datetime
         if 'shipping_limit_date' in order_items.columns:
             order_items['shipping_limit_date'] = pd.to_datetime(order_items['shipping_limit_date'])
         
         # Calculate total item value (price + freight)
-        order_items['total_item_value'] = order_items['price'] + order_items['freight_value']
+        if 'price' in order_items.columns and 'freight_value' in order_items.columns:
+            order_items['total_item_value'] = order_items['price'] + order_items['freight_value']
         
         return order_items
     
-    def clean_reviews_data(self) -> pd.DataFrame:
+    def clean_payments_data(self, payments: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Clean and process payments data.
+        
+        Args:
+            payments (pd.DataFrame, optional): Payments to clean, e.g. newly
+                appended rows (default: the raw payments table)
+        
+        Returns:
+            pd.DataFrame: Cleaned payments data
+        """
+        if payments is None:
+            payments = self.raw_data['payments']
+        
+        # Drop payments that cannot be attributed or valued
+        payments = payments.dropna(subset=['order_id', 'payment_value']).copy()
+        
+        # Every payment is paid in at least one installment
+        if 'payment_installments' in payments.columns:
+            payments['payment_installments'] = payments['payment_installments'].fillna(1).clip(lower=1)
+        
+        return payments
+    
+    def clean_reviews_data(self, reviews: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Clean and process reviews data.
         
+        Args:
+            reviews (pd.DataFrame, optional): Reviews to clean, e.g. newly
+                appended rows (default: the raw reviews table)
+        
         Returns:
             pd.DataFrame: Cleaned reviews data
         """
-        reviews = self.raw_data['reviews'].copy()
+        if reviews is None:
+            reviews = self.raw_data['reviews']
+        reviews = reviews.copy()
         
         # Convert review dates to datetime
         date_cols = ['review_creation_date', 'review_answer_timestamp']
@@ -115,65 +1055,86 @@ class EcommerceDataLoader:
         
         return reviews
     
-    def create_sales_dataset(self, year_filter: Optional[int] = None, 
-                           month_filter: Optional[int] = None,
-                           status_filter: str = 'delivered') -> pd.DataFrame:
+    def build_sales_fact_table(self) -> pd.DataFrame:
         """
-        Create a comprehensive sales dataset by joining relevant tables.
+        Build the fully joined sales fact table for all order statuses and periods.
         
-        Args:
-            year_filter (int, optional): Filter by specific year
-            month_filter (int, optional): Filter by specific month
-            status_filter (str): Filter by order status (default: 'delivered')
+        Order items are joined once with orders, products, customers and
+        per-order review summaries, and delivery metrics are derived.
+        Every join is many-to-one (see ``merge_many_to_one``), so the table
+        keeps exactly one row per order item. ``create_sales_dataset``
+        answers every filter combination by slicing this table.
         
         Returns:
-            pd.DataFrame: Comprehensive sales dataset
+            pd.DataFrame: Sales fact table with one row per joined order item
         """
-        # Start with order items
-        sales_data = self.processed_data['order_items'].copy()
+        sales_data = self.join_sales_dimensions(self.processed_data['order_items'])
         
-        # Join with orders
-        sales_data = sales_data.merge(
-            self.processed_data['orders'][['order_id', 'customer_id', 'order_status', 
-                                         'order_purchase_timestamp', 'order_delivered_customer_date',
-                                         'purchase_year', 'purchase_month']],
-            on='order_id',
-            how='left'
-        )
+        # Sort by purchase time and index the (year, month) row ranges
+        sales_data = sort_by_period(sales_data)
+        self.sales_index = PeriodPartitionIndex.from_frame(sales_data)
+        self.sales_cube = None
+        self._invalidate_datasets()
         
-        # Filter by order status
-        if status_filter:
-            sales_data = sales_data[sales_data['order_status'] == status_filter]
+        self.processed_data['sales'] = sales_data
+        return sales_data
+    
+    def join_sales_dimensions(self, order_items: pd.DataFrame) -> pd.DataFrame:
+        """
+        Join cleaned order items with the order-level and dimension tables.
+        
+        Args:
+            order_items (pd.DataFrame): Cleaned order items, the whole table
+                or one streamed chunk
         
-        # Apply time filters
-        if year_filter:
-            sales_data = sales_data[sales_data['purchase_year'] == year_filter]
+        Returns:
+            pd.DataFrame: One sales row per order item, in item order
+        """
+        sales_data = order_items
         
-        if month_filter:
-            sales_data = sales_data[sales_data['purchase_month'] == month_filter]
+        # Join with orders (scoped loads may lack some of the columns)
+        orders = self.processed_data['orders']
+        order_cols = [col for col in ['order_id', 'customer_id', 'order_status',
+                                      'order_purchase_timestamp', 'order_delivered_customer_date',
+                                      'purchase_year', 'purchase_month'] if col in orders.columns]
+        sales_data = merge_many_to_one(sales_data, orders[order_cols], on='order_id', name='orders',
+                                       engine=self.engine)
+        
+        products = self._dimension_table('products')
+        customers = self._dimension_table('customers')
+        reviews = self._dimension_table('reviews')
         
         # Add product information
-        if 'products' in self.raw_data:
-            sales_data = sales_data.merge(
-                self.raw_data['products'][['product_id', 'product_category_name']],
+        if products is not None:
+            sales_data = merge_many_to_one(
+                sales_data,
+                products[['product_id', 'product_category_name']],
                 on='product_id',
-                how='left'
+                name='products',
+                engine=self.engine
             )
         
         # Add customer information (avoid duplicate joins)
-        if 'customers' in self.raw_data and 'customer_id' in sales_data.columns:
-            sales_data = sales_data.merge(
-                self.raw_data['customers'][['customer_id', 'customer_state', 'customer_city']],
+        if customers is not None and 'customer_id' in sales_data.columns:
+            sales_data = merge_many_to_one(
+                sales_data,
+                customers[[col for col in ['customer_id', 'customer_state', 'customer_city']
+                           if col in customers.columns]],
                 on='customer_id',
-                how='left'
+                name='customers',
+                engine=self.engine
             )
         
-        # Add review information
-        if 'reviews' in self.raw_data:
-            sales_data = sales_data.merge(
-                self.raw_data['reviews'][['order_id', 'review_score']],
+        # Add review information, collapsed to one summary row per order
+        if reviews is not None:
+            if 'order_reviews' not in self.processed_data:
+                self.processed_data['order_reviews'] = aggregate_reviews_by_order(reviews)
+            sales_data = merge_many_to_one(
+                sales_data,
+                self.processed_data['order_reviews'][['order_id', 'review_score']],
                 on='order_id',
-                how='left'
+                name='order_reviews',
+                engine=self.engine
             )
         
         # Calculate delivery metrics
@@ -182,51 +1143,335 @@ class EcommerceDataLoader:
                 sales_data['order_delivered_customer_date'] - 
                 sales_data['order_purchase_timestamp']
             ).dt.days
-            
-            # Add delivery speed category
-            sales_data['delivery_category'] = sales_data['delivery_days'].apply(categorize_delivery_speed)
         
-        return sales_data
+        # Add the delivery speed bucket
+        return add_derived_buckets(sales_data, {col: DERIVED_BUCKETS[col] for col in DEFAULT_BUCKETS})
     
-    def get_delivered_sales_with_categories(self, year_filter: Optional[int] = None, 
-                                          month_filter: Optional[int] = None) -> pd.DataFrame:
+    def _dimension_table(self, name: str) -> Optional[pd.DataFrame]:
+        """Get a table for joining, preferring its processed (e.g. id-encoded) version."""
+        if name in self.processed_data:
+            return self.processed_data[name]
+        return self.raw_data.get(name)
+    
+    def encode_id_columns(self) -> Dict[str, pd.Index]:
         """
-        Get delivered sales data with product categories.
+        Replace id strings in the processed tables with dense int32 codes.
         
-        Args:
-            year_filter (int, optional): Filter by specific year
-            month_filter (int, optional): Filter by specific month
+        Each id domain (orders, customers, products, sellers) gets one
+        dictionary shared by every table, so equal ids map to equal codes and
+        joins, groupbys and ``nunique`` run on integers. The products and
+        customers tables are copied from ``raw_data`` and encoded into
+        ``processed_data`` on every call, so processing again rebuilds each
+        dictionary from the original strings. Use ``decode_ids`` to turn
+        codes back into the original strings.
         
         Returns:
-            pd.DataFrame: Delivered sales with categories
+            Dict[str, pd.Index]: Id dictionary per domain (position = code)
         """
-        return self.create_sales_dataset(year_filter=year_filter, 
-                                       month_filter=month_filter, 
-                                       status_filter='delivered')
+        for name in ('products', 'customers'):
+            if name in self.raw_data:
+                self.processed_data[name] = self.raw_data[name].copy()
+        
+        # Gather every column of each domain across all processed tables
+        domain_columns = {}
+        for name, df in self.processed_data.items():
+            for col, domain in ID_DOMAINS.items():
+                if col in df.columns and not pd.api.types.is_integer_dtype(df[col]):
+                    domain_columns.setdefault(domain, []).append((name, col))
+        
+        for domain, columns in domain_columns.items():
+            values = np.concatenate([
+                self.processed_data[name][col].dropna().to_numpy(dtype=object)
+                for name, col in columns
+            ])
+            dictionary = pd.Index(pd.unique(values))
+            self.id_dictionaries[domain] = dictionary
+            
+            for name, col in columns:
+                df = self.processed_data[name]
+                df[col] = _codes_to_series(dictionary.get_indexer(df[col]), df.index)
+        
+        return self.id_dictionaries
     
-    def get_available_years(self) -> list:
+    def encode_id_values(self, column: str, values) -> np.ndarray:
         """
-        Get list of available years in the dataset.
+        Look up the codes of id strings, e.g. to filter encoded data by id.
+        
+        Args:
+            column (str): Id column name, e.g. 'order_id'
+            values: Id strings to encode
         
         Returns:
-            list: Available years sorted
+            np.ndarray: Codes, -1 for unknown ids
         """
-        if 'orders' not in self.processed_data:
-            return []
-        
-        return sorted(self.processed_data['orders']['purchase_year'].dropna().unique().tolist())
+        dictionary = self.id_dictionaries[ID_DOMAINS[column]]
+        return dictionary.get_indexer(pd.Index(np.atleast_1d(values)))
     
-    def get_product_categories(self) -> list:
+    def decode_ids(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Get list of unique product categories.
+        Map encoded id columns back to their original strings for display or export.
+        
+        Args:
+            df (pd.DataFrame): DataFrame with encoded id columns
         
         Returns:
-            list: Product categories sorted alphabetically
+            pd.DataFrame: Copy with id strings restored
         """
-        if 'products' not in self.raw_data:
-            return []
-        
-        return sorted(self.raw_data['products']['product_category_name'].unique().tolist())
+        decoded = df.copy()
+        for col, domain in ID_DOMAINS.items():
+            if col in decoded.columns and domain in self.id_dictionaries \
+                    and pd.api.types.is_integer_dtype(decoded[col]):
+                codes = decoded[col].to_numpy(dtype=np.int64, na_value=-1)
+                strings = self.id_dictionaries[domain].to_numpy(dtype=object).take(np.maximum(codes, 0))
+                decoded[col] = pd.Series(np.where(codes >= 0, strings, None), index=decoded.index)
+        return decoded
+    
+    def create_sales_dataset(self, year_filter: Optional[int] = None, 
+                           month_filter: Optional[int] = None,
+                           status_filter: str = 'delivered',
+                           include_payments: bool = False,
+                           derived: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Create a comprehensive sales dataset by joining relevant tables.
+        
+        The joined table is materialized once by ``build_sales_fact_table``.
+        Period filters are resolved through its partition index as row
+        ranges, and the status filter is a boolean mask over that slice.
+        Results are memoized per filter combination in a bounded LRU cache
+        (see ``get_cache_stats``); each call returns its own copy.
+        
+        Args:
+            year_filter (int, optional): Filter by specific year
+            month_filter (int, optional): Filter by specific month
+            status_filter (str): Filter by order status (default: 'delivered')
+            include_payments (bool): Join the per-order payment summary
+                (see ``aggregate_payments_by_order``); its values repeat on
+                every item row of an order
+            derived (List[str], optional): Extra ``DERIVED_BUCKETS`` columns to
+                add, e.g. ['price_band', 'review_tier']; 'delivery_category'
+                is always included
+        
+        Returns:
+            pd.DataFrame: Comprehensive sales dataset
+        """
+        derived = tuple(col for col in (derived or []) if col not in DEFAULT_BUCKETS)
+        unknown = [col for col in derived if col not in DERIVED_BUCKETS]
+        if unknown:
+            raise ValueError(f"Unknown derived columns: {unknown}")
+        
+        if 'sales' not in self.processed_data and self.partition_dir is None and self.sql_backend is None:
+            self.build_sales_fact_table()
+        
+        key = (self.data_version, year_filter, month_filter, status_filter, include_payments, derived)
+        cached = self._dataset_cache.get(key)
+        if cached is not None:
+            self._dataset_cache.move_to_end(key)
+            self._dataset_cache_stats['hits'] += 1
+            return cached.copy()
+        
+        self._dataset_cache_stats['misses'] += 1
+        if self.sql_backend is not None:
+            sales_data = self.sql_backend.sales_dataset(year_filter, month_filter, status_filter, include_payments)
+        else:
+            sales_data = self._filter_sales(year_filter, month_filter, status_filter)
+            if include_payments and 'order_payments' in self.processed_data:
+                sales_data = merge_many_to_one(sales_data, self.processed_data['order_payments'],
+                                               on='order_id', name='order_payments', engine=self.engine)
+        
+        if derived:
+            sales_data = add_derived_buckets(sales_data, {col: DERIVED_BUCKETS[col] for col in derived})
+        self._store_dataset(key, sales_data)
+        return sales_data.copy()
+    
+    def _filter_sales(self, year_filter: Optional[int], month_filter: Optional[int],
+                      status_filter: Optional[str]) -> pd.DataFrame:
+        """Slice the sales fact table for a filter combination."""
+        if 'sales' not in self.processed_data:
+            # Partitioned sales: only the files of the period are read
+            sales_data = read_partitioned(self.partition_dir, 'sales', year_filter or None, month_filter or None)
+        elif year_filter:
+            sales_data = self.sales_index.slice(self.processed_data['sales'], year_filter, month_filter or None)
+        elif month_filter:
+            sales_data = self.processed_data['sales'].take(self.sales_index.month_positions(month_filter))
+        else:
+            sales_data = self.processed_data['sales']
+        
+        # Filter by order status
+        if status_filter:
+            sales_data = sales_data[(sales_data['order_status'] == status_filter).to_numpy()]
+        
+        return restore_whole_days(sales_data.reset_index(drop=True))
+    
+    def _store_dataset(self, key: Tuple, sales_data: pd.DataFrame) -> None:
+        """Memoize a dataset, evicting least recently used entries over budget."""
+        if self.dataset_cache_entries == 0:
+            return
+        
+        size = int(sales_data.memory_usage(deep=True).sum())
+        if self.dataset_cache_bytes is not None and size > self.dataset_cache_bytes:
+            return
+        
+        self._dataset_cache[key] = sales_data
+        self._dataset_cache_size += size
+        self._dataset_sizes[key] = size
+        
+        while (len(self._dataset_cache) > self.dataset_cache_entries or
+               (self.dataset_cache_bytes is not None and self._dataset_cache_size > self.dataset_cache_bytes)):
+            evicted, _ = self._dataset_cache.popitem(last=False)
+            self._dataset_cache_size -= self._dataset_sizes.pop(evicted)
+            self._dataset_cache_stats['evictions'] += 1
+    
+    def _invalidate_datasets(self) -> None:
+        """Drop memoized datasets after the underlying data changed."""
+        self.data_version += 1
+        self.sql_backend = None
+        self._dataset_cache.clear()
+        self._dataset_sizes.clear()
+        self._dataset_cache_size = 0
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        Get counters of the ``create_sales_dataset`` memo.
+        
+        Returns:
+            Dict[str, int]: Hits, misses, evictions, current entries and
+            bytes, the configured budgets and the data version
+        """
+        return {
+            **self._dataset_cache_stats,
+            'entries': len(self._dataset_cache),
+            'bytes': self._dataset_cache_size,
+            'max_entries': self.dataset_cache_entries,
+            'max_bytes': self.dataset_cache_bytes,
+            'data_version': self.data_version
+        }
+    
+    def get_cube(self, year_filter: Optional[int] = None,
+                 month_filter: Optional[int] = None,
+                 status_filter: Optional[str] = None) -> SalesCube:
+        """
+        Get the precomputed sales cube, optionally sliced like ``create_sales_dataset``.
+        
+        The cube is built from the sales fact table on first use and
+        answers revenue, order and review/delivery aggregates for any
+        period, category, state or status without row-level data.
+        
+        Args:
+            year_filter (int, optional): Filter by specific year
+            month_filter (int, optional): Filter by specific month
+            status_filter (str, optional): Filter by order status (default: all statuses)
+        
+        Returns:
+            SalesCube: Cube over the matching cells
+        """
+        if 'sales' not in self.processed_data and self.partition_dir is not None:
+            sales = read_partitioned(self.partition_dir, 'sales', year_filter or None, month_filter or None)
+            return SalesCube.from_sales(sales, self.engine).slice(order_status=status_filter or None)
+        
+        if 'sales' not in self.processed_data and self.sql_backend is None:
+            self.build_sales_fact_table()
+        
+        if self.sales_cube is None:
+            if self.sql_backend is not None:
+                self.sales_cube = self.sql_backend.build_cube()
+            else:
+                self.sales_cube = SalesCube.from_sales(self.processed_data['sales'], self.engine)
+        
+        return self.sales_cube.slice(purchase_year=year_filter or None,
+                                     purchase_month=month_filter or None,
+                                     order_status=status_filter or None)
+    
+    def attach_sql_backend(self, database: str = ':memory:'):
+        """
+        Answer sales queries from an embedded SQLite copy of the processed tables.
+        
+        ``create_sales_dataset`` and the cube behind ``get_cube`` are then
+        compiled to SQL joins and GROUP BY queries (see
+        ``sql_backend.SQLiteSalesBackend``) with the same results. Changes
+        to the loaded data (refreshes, order updates, restores) detach the
+        backend, since its copy no longer matches.
+        
+        Args:
+            database (str): SQLite database file, or ':memory:'
+        
+        Returns:
+            SQLiteSalesBackend: The attached backend
+        """
+        # Imported here: the backend module builds on this one
+        from sql_backend import SQLiteSalesBackend
+        
+        backend = SQLiteSalesBackend(database)
+        backend.load(self)
+        self.sql_backend = backend
+        return backend
+    
+    def get_delivered_sales_with_categories(self, year_filter: Optional[int] = None, 
+                                          month_filter: Optional[int] = None) -> pd.DataFrame:
+        """
+        Get delivered sales data with product categories.
+        
+        Args:
+            year_filter (int, optional): Filter by specific year
+            month_filter (int, optional): Filter by specific month
+        
+        Returns:
+            pd.DataFrame: Delivered sales with categories
+        """
+        return self.create_sales_dataset(year_filter=year_filter, 
+                                       month_filter=month_filter, 
+                                       status_filter='delivered')
+    
+    def get_available_years(self) -> list:
+        """
+        Get list of available years in the dataset.
+        
+        Returns:
+            list: Available years sorted
+        """
+        if 'orders' not in self.processed_data and self.partition_dir is not None:
+            return sorted({year for year, _ in self._partition_periods()})
+        
+        if 'orders' not in self.processed_data:
+            return []
+        
+        if self.orders_index is not None:
+            return self.orders_index.years()
+        
+        return sorted(self.processed_data['orders']['purchase_year'].dropna().unique().tolist())
+    
+    def get_available_months(self, year: int) -> list:
+        """
+        Get list of months with orders in a given year.
+        
+        Args:
+            year (int): Year to inspect
+        
+        Returns:
+            list: Available months sorted
+        """
+        if 'orders' not in self.processed_data and self.partition_dir is not None:
+            return [month for period_year, month in self._partition_periods() if period_year == int(year)]
+        
+        if 'orders' not in self.processed_data:
+            return []
+        
+        if self.orders_index is not None:
+            return self.orders_index.months(year)
+        
+        orders = self.processed_data['orders']
+        return sorted(orders.loc[orders['purchase_year'] == year, 'purchase_month'].dropna().unique().tolist())
+    
+    def get_product_categories(self) -> list:
+        """
+        Get list of unique product categories.
+        
+        Returns:
+            list: Product categories sorted alphabetically
+        """
+        if 'products' not in self.raw_data:
+            return []
+        
+        return sorted(self.raw_data['products']['product_category_name'].unique().tolist())
     
     def process_all_data(self) -> Dict[str, pd.DataFrame]:
         """
@@ -238,15 +1483,353 @@ class EcommerceDataLoader:
         if not self.raw_data:
             self.load_raw_data()
         
-        # Process each dataset
+        # Process each dataset (streaming loads leave order items on disk)
         self.processed_data['orders'] = self.clean_orders_data()
-        self.processed_data['order_items'] = self.clean_order_items_data()
+        self.orders_index = PeriodPartitionIndex.from_frame(self.processed_data['orders'])
+        if 'order_items' in self.raw_data:
+            self.processed_data['order_items'] = self.clean_order_items_data()
         
+        self.processed_data.pop('order_reviews', None)
         if 'reviews' in self.raw_data:
             self.processed_data['reviews'] = self.clean_reviews_data()
         
+        if 'payments' in self.raw_data and not self.raw_data['payments'].empty:
+            self.processed_data['payments'] = self.clean_payments_data()
+        
+        if self.encode_ids:
+            self.encode_id_columns()
+        
+        if 'payments' in self.processed_data:
+            self.processed_data['order_payments'] = aggregate_payments_by_order(self.processed_data['payments'])
+        
+        if 'reviews' in self.processed_data:
+            self.processed_data['order_reviews'] = aggregate_reviews_by_order(self.processed_data['reviews'])
+        
+        # Materialize the joined sales table once for all filter combinations
+        if 'order_items' in self.processed_data:
+            self.build_sales_fact_table()
+        
         return self.processed_data
     
+    def load_dimension_tables(self) -> Dict[str, pd.DataFrame]:
+        """
+        Load and process every table except order items, for streaming.
+        
+        Returns:
+            Dict[str, pd.DataFrame]: Processed orders and dimension tables
+        """
+        self._store_loaded_tables(
+            (key, self._load_table(key, filename))
+            for key, filename in FILE_MAPPINGS.items() if key != 'order_items'
+        )
+        return self.process_all_data()
+    
+    def iter_sales_chunks(self, chunksize: int = LOAD_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """
+        Stream the sales rows without materializing the order items table.
+        
+        The order items CSV is read ``chunksize`` rows at a time, and each
+        chunk is cleaned and joined with the in-memory orders and dimension
+        tables (loaded by ``load_dimension_tables`` unless already processed)
+        exactly like the rows of ``build_sales_fact_table``. With
+        ``encode_ids`` the chunk ids are encoded with the dictionaries of the
+        processed tables.
+        
+        Args:
+            chunksize (int): Order items per chunk
+        
+        Yields:
+            pd.DataFrame: Joined sales rows of one chunk, in file order
+        """
+        if 'orders' not in self.processed_data:
+            self.load_dimension_tables()
+        
+        filepath = f"{self.data_path}{FILE_MAPPINGS['order_items']}"
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"{filepath} not found")
+        
+        for chunk in pd.read_csv(filepath, dtype=parse_dtypes('order_items'), chunksize=chunksize):
+            order_items = self.clean_order_items_data(apply_schema(chunk, 'order_items'))
+            for col, domain in ID_DOMAINS.items():
+                if col in order_items.columns and domain in self.id_dictionaries:
+                    codes = self.id_dictionaries[domain].get_indexer(order_items[col])
+                    order_items[col] = _codes_to_series(codes, order_items.index)
+            yield self.join_sales_dimensions(order_items)
+    
+    def refresh(self) -> Dict[str, int]:
+        """
+        Ingest the rows appended to the source CSVs since they were loaded.
+        
+        The files are treated as append-only: each is read from the byte
+        offset reached by the previous load or refresh up to its last
+        complete line, and only those rows are parsed, cleaned (and
+        id-encoded) and appended to the raw and processed tables. The
+        per-order review and payment summaries are recomputed for the orders
+        with new reviews or payments only, and the sales rows are re-derived
+        for the orders the new rows touch (see ``_refresh_fact_rows``).
+        
+        Returns:
+            Dict[str, int]: Number of appended rows per table
+        """
+        if self.load_scope is not None or not self.source_offsets:
+            raise ValueError("refresh() needs a loader that loaded all tables with load_raw_data()")
+        if 'sales' not in self.processed_data:
+            raise ValueError("refresh() needs processed data; call process_all_data() first")
+        
+        appended = {}
+        for key in self.source_offsets:
+            rows = self._read_appended_rows(key)
+            if rows is not None and len(rows):
+                appended[key] = rows
+                self.raw_data[key] = concat_rows([self.raw_data[key], rows])
+                print(f"Refreshed {key}: +{len(rows)} records")
+        
+        if not appended:
+            return {}
+        
+        cleaners = {
+            'orders': self.clean_orders_data,
+            'order_items': self.clean_order_items_data,
+            'reviews': self.clean_reviews_data,
+            'payments': self.clean_payments_data
+        }
+        new_rows = {}
+        for key, rows in appended.items():
+            # Dimension tables are only processed (copied) when ids are encoded
+            if key in cleaners or key in self.processed_data:
+                cleaned = cleaners[key](rows) if key in cleaners else rows.copy()
+                new_rows[key] = self._encode_appended_ids(cleaned)
+                existing = self.processed_data.get(key)
+                self.processed_data[key] = new_rows[key] if existing is None else concat_rows([existing, new_rows[key]])
+            else:
+                new_rows[key] = rows
+        
+        if 'orders' in new_rows:
+            self.processed_data['orders'] = sort_by_period(self.processed_data['orders'])
+            self.orders_index = PeriodPartitionIndex.from_frame(self.processed_data['orders'])
+        
+        summaries = {'reviews': ('order_reviews', aggregate_reviews_by_order),
+                     'payments': ('order_payments', aggregate_payments_by_order)}
+        for key, (name, aggregate) in summaries.items():
+            if key in new_rows and name in self.processed_data:
+                self._upsert_order_summaries(name, aggregate, self.processed_data[key], new_rows[key]['order_id'])
+            elif key in new_rows:
+                self.processed_data[name] = aggregate(self.processed_data[key])
+        
+        # Orders whose sales rows change: new orders, items and reviews, and
+        # orders of items or customers whose product or customer is new
+        touched = [new_rows[key]['order_id'] for key in ('orders', 'order_items', 'reviews') if key in new_rows]
+        if 'products' in new_rows:
+            items = self.processed_data['order_items']
+            touched.append(items.loc[semi_join_filter('product_id', new_rows['products']['product_id'])(items),
+                                     'order_id'])
+        if 'customers' in new_rows:
+            orders = self.processed_data['orders']
+            touched.append(orders.loc[semi_join_filter('customer_id', new_rows['customers']['customer_id'])(orders),
+                                      'order_id'])
+        
+        if touched:
+            self._refresh_fact_rows(pd.concat(touched, ignore_index=True))
+        
+        return {key: len(rows) for key, rows in appended.items()}
+    
+    def apply_order_updates(self, updates: pd.DataFrame) -> Dict[str, int]:
+        """
+        Upsert order status and timestamp changes keyed by order id.
+        
+        ``updates`` is a change feed with an 'order_id' column and any other
+        orders columns, e.g. 'order_status' and 'order_delivered_customer_date'
+        (schema columns the loaded table lacks are added). Missing values
+        leave a column unchanged and later rows of an order win, so one
+        batch may hold several changes of the same order. Changes of loaded
+        orders are written into the raw orders table and orders not loaded
+        yet are inserted. Only the changed orders are cleaned again and
+        their sales rows re-derived (see ``_refresh_fact_rows``), so
+        status-filtered datasets such as the delivered sales reflect the
+        changes without a reload.
+        
+        Args:
+            updates (pd.DataFrame): Order changes, raw or parsed
+        
+        Returns:
+            Dict[str, int]: Number of updated and inserted orders
+        """
+        if self.load_scope is not None:
+            raise ValueError("apply_order_updates() needs a loader that loaded all orders")
+        if 'sales' not in self.processed_data:
+            raise ValueError("apply_order_updates() needs processed data; call process_all_data() first")
+        
+        orders = self.raw_data['orders'].copy()
+        schema_columns = [col for cols in TABLE_SCHEMAS['orders'].values() for col in cols]
+        unknown_columns = [col for col in updates.columns
+                           if col not in orders.columns and col not in schema_columns]
+        if 'order_id' not in updates.columns or unknown_columns:
+            raise ValueError(f"Order updates need an 'order_id' column and orders columns only; "
+                             f"got unknown columns {unknown_columns}")
+        
+        # Latest non-missing value of each column per order
+        changes = apply_schema(updates.dropna(subset=['order_id']).copy(), 'orders')
+        changes = changes.groupby('order_id', sort=False, observed=True).last()
+        if changes.empty:
+            return {'updated': 0, 'inserted': 0}
+        
+        positions = pd.Index(orders['order_id']).get_indexer(changes.index)
+        known = positions >= 0
+        for col in changes.columns:
+            if col not in orders.columns:
+                orders[col] = pd.Series(np.nan, index=orders.index).astype(changes[col].dtype)
+            values = changes[col].to_numpy()[known]
+            has_value = pd.notna(values)
+            target = positions[known][has_value]
+            if not len(target):
+                continue
+            
+            column = orders[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                categories = column.cat.categories.union(pd.Index(values[has_value]).unique())
+                column = column.cat.set_categories(categories)
+            else:
+                column = column.copy()
+            column.iloc[target] = values[has_value]
+            orders[col] = column
+        
+        inserted = changes[~known].reset_index().reindex(columns=orders.columns)
+        if len(inserted):
+            orders = concat_rows([orders, apply_schema(inserted, 'orders')])
+        self.raw_data['orders'] = orders
+        
+        # Re-clean the changed orders and replace their processed rows
+        changed = orders[semi_join_filter('order_id', changes.index.to_series())(orders)]
+        cleaned = self._encode_appended_ids(self.clean_orders_data(changed))
+        processed = self.processed_data['orders']
+        stale = semi_join_filter('order_id', cleaned['order_id'])(processed)
+        self.processed_data['orders'] = sort_by_period(concat_rows([processed[~stale], cleaned]))
+        self.orders_index = PeriodPartitionIndex.from_frame(self.processed_data['orders'])
+        
+        self._refresh_fact_rows(cleaned['order_id'])
+        
+        counts = {'updated': int(known.sum()), 'inserted': int((~known).sum())}
+        print(f"Applied order updates: {counts['updated']} updated, {counts['inserted']} inserted")
+        return counts
+    
+    def _read_appended_rows(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        Parse the complete lines appended to a source CSV since its last read.
+        
+        Args:
+            key (str): Raw table name
+        
+        Returns:
+            pd.DataFrame or None: Appended rows with the table schema applied,
+            None when nothing new was appended
+        """
+        state = self.source_offsets[key]
+        filepath = f"{self.data_path}{FILE_MAPPINGS[key]}"
+        size = os.path.getsize(filepath)
+        if size < state['bytes']:
+            raise ValueError(f"{FILE_MAPPINGS[key]} shrank since it was loaded; reload the data instead")
+        
+        with open(filepath, 'rb') as f:
+            f.seek(state['bytes'])
+            data = f.read(size - state['bytes'])
+        
+        # A record still being written is left for the next refresh; a line
+        # break inside a quoted field (odd number of quotes before it) does
+        # not end a record
+        end = data.rfind(b'\n') + 1
+        while end and data.count(b'"', 0, end) % 2:
+            end = data.rfind(b'\n', 0, end - 1) + 1
+        if end == 0:
+            return None
+        
+        rows = pd.read_csv(io.BytesIO(data[:end]), header=None, names=state['columns'], dtype=parse_dtypes(key))
+        state['bytes'] += end
+        state['rows'] += len(rows)
+        return apply_schema(rows, key)
+    
+    def _encode_appended_ids(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Encode the ids of appended rows, extending the id dictionaries with new ids.
+        
+        New ids are appended to the end of their dictionary, so the codes of
+        existing ids never change.
+        
+        Args:
+            df (pd.DataFrame): Appended rows with id strings
+        
+        Returns:
+            pd.DataFrame: The rows with encoded id columns
+        """
+        if not self.encode_ids:
+            return df
+        
+        for col, domain in ID_DOMAINS.items():
+            if col not in df.columns or pd.api.types.is_integer_dtype(df[col]):
+                continue
+            dictionary = self.id_dictionaries.get(domain, pd.Index([]))
+            values = pd.Index(df[col].dropna().unique())
+            new_ids = values[dictionary.get_indexer(values) < 0]
+            if len(new_ids):
+                dictionary = dictionary.append(new_ids)
+                self.id_dictionaries[domain] = dictionary
+            df[col] = _codes_to_series(dictionary.get_indexer(df[col]), df.index)
+        return df
+    
+    def _upsert_order_summaries(self, name: str, aggregate, rows: pd.DataFrame, order_ids: pd.Series) -> None:
+        """
+        Recompute a per-order summary table for some orders only.
+        
+        Args:
+            name (str): Processed summary table, e.g. 'order_reviews'
+            aggregate (callable): Function building the summary from rows
+            rows (pd.DataFrame): All processed rows the summary is built from
+            order_ids (pd.Series): Orders whose summaries are recomputed
+        """
+        touched = semi_join_filter('order_id', order_ids)
+        summaries = self.processed_data[name]
+        self.processed_data[name] = concat_rows([summaries[~touched(summaries)], aggregate(rows[touched(rows)])])
+    
+    def _refresh_fact_rows(self, order_ids: pd.Series) -> pd.DataFrame:
+        """
+        Re-derive the sales rows of some orders from the processed tables.
+        
+        The rows of the orders are dropped from the sales fact table and
+        rebuilt from their order items, so the table equals a full rebuild.
+        The sales cube is extended with the cube of the rebuilt rows when
+        they all belong to orders new to the table, and dropped (rebuilt on
+        the next ``get_cube``) otherwise; memoized datasets are invalidated.
+        
+        Args:
+            order_ids (pd.Series): Orders whose sales rows changed
+        
+        Returns:
+            pd.DataFrame: The updated sales fact table
+        """
+        touched = semi_join_filter('order_id', order_ids)
+        sales = self.processed_data['sales']
+        items = self.processed_data['order_items']
+        
+        stale = touched(sales)
+        new_sales = self.join_sales_dimensions(items[touched(items)])
+        sales_data = sort_by_period(concat_rows([sales[~stale], new_sales]))
+        
+        # Items loaded before their order had missing order columns, which
+        # turned them float; restore the integer columns a rebuild would give
+        for col, dtype in new_sales.dtypes.items():
+            if (pd.api.types.is_integer_dtype(dtype) and sales_data[col].dtype != dtype
+                    and sales_data[col].notna().all()):
+                sales_data[col] = sales_data[col].astype(dtype)
+        
+        if self.sales_cube is not None and not stale.any() and len(new_sales):
+            self.sales_cube = self.sales_cube.combine(SalesCube.from_sales(new_sales, self.engine))
+        elif stale.any() or len(new_sales):
+            self.sales_cube = None
+        
+        self.sales_index = PeriodPartitionIndex.from_frame(sales_data)
+        self._invalidate_datasets()
+        self.processed_data['sales'] = sales_data
+        return sales_data
+    
     def get_data_summary(self) -> Dict[str, Dict]:
         """
         Get summary statistics for all datasets.
@@ -257,10 +1840,14 @@ class EcommerceDataLoader:
         summary = {}
         
         for name, df in self.processed_data.items():
+            memory_usage = df.memory_usage(deep=True).sum()
+            inferred_memory_usage = estimate_inferred_memory(df)
             summary[name] = {
                 'rows': len(df),
                 'columns': len(df.columns),
-                'memory_usage_mb': df.memory_usage(deep=True).sum() / 1024**2,
+                'memory_usage_mb': memory_usage / 1024**2,
+                'inferred_memory_usage_mb': inferred_memory_usage / 1024**2,
+                'memory_saved_mb': (inferred_memory_usage - memory_usage) / 1024**2,
                 'date_range': None
             }
             
@@ -274,6 +1861,472 @@ class EcommerceDataLoader:
         return summary
 
 
+class PeriodPartitionIndex:
+    """
+    Index of contiguous (year, month) row ranges over a period-sorted DataFrame.
+    
+    Rows must be sorted by year and month with missing years last (see
+    ``sort_by_period``), so that every year and every (year, month) period
+    occupies one contiguous block. Slicing a period is then a positional
+    range instead of a full-column scan.
+    """
+    
+    def __init__(self, years: np.ndarray, months: Optional[np.ndarray] = None):
+        """
+        Initialize the index from period-sorted year and month values.
+        
+        Args:
+            years (np.ndarray): Year of each row
+            months (np.ndarray, optional): Month of each row
+        """
+        years = np.asarray(years, dtype=float)
+        n_rows = int((~np.isnan(years)).sum())
+        valid_years = years[:n_rows]
+        if np.isnan(valid_years).any() or (np.diff(valid_years) < 0).any():
+            raise ValueError("Rows must be sorted by period with missing years last")
+        
+        self.year_ranges = _contiguous_ranges(valid_years)
+        self.period_ranges = {}
+        
+        if months is not None:
+            valid_months = np.asarray(months, dtype=float)[:n_rows]
+            period_keys = valid_years * 100 + valid_months
+            for key, row_range in _contiguous_ranges(period_keys).items():
+                if not np.isnan(key):
+                    self.period_ranges[(int(key // 100), int(key % 100))] = row_range
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, year_col: str = 'purchase_year',
+                   month_col: str = 'purchase_month') -> 'PeriodPartitionIndex':
+        """
+        Build an index over a period-sorted DataFrame.
+        
+        Args:
+            df (pd.DataFrame): DataFrame sorted by ``sort_by_period``
+            year_col (str): Year column name
+            month_col (str): Month column name (optional in ``df``)
+        
+        Returns:
+            PeriodPartitionIndex: Index of the DataFrame's period ranges
+        """
+        months = df[month_col].to_numpy(dtype=float) if month_col in df.columns else None
+        return cls(df[year_col].to_numpy(dtype=float), months)
+    
+    def row_range(self, year: int, month: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Get the [start, stop) row range of a year or (year, month) period.
+        
+        Args:
+            year (int): Year to look up
+            month (int, optional): Month to look up
+        
+        Returns:
+            Tuple[int, int]: Row range, empty if the period has no rows
+        """
+        if month is None:
+            return self.year_ranges.get(int(year), (0, 0))
+        return self.period_ranges.get((int(year), int(month)), (0, 0))
+    
+    def slice(self, df: pd.DataFrame, year: int, month: Optional[int] = None) -> pd.DataFrame:
+        """
+        Slice the rows of a year or (year, month) period.
+        
+        Args:
+            df (pd.DataFrame): DataFrame the index was built from
+            year (int): Year to slice
+            month (int, optional): Month to slice
+        
+        Returns:
+            pd.DataFrame: Rows of the period
+        """
+        start, stop = self.row_range(year, month)
+        return df.iloc[start:stop]
+    
+    def month_positions(self, month: int) -> np.ndarray:
+        """
+        Get the row positions of a month across all years.
+        
+        Args:
+            month (int): Month to look up
+        
+        Returns:
+            np.ndarray: Sorted row positions
+        """
+        ranges = [np.arange(start, stop) for (_, period_month), (start, stop)
+                  in sorted(self.period_ranges.items()) if period_month == int(month)]
+        return np.concatenate(ranges) if ranges else np.array([], dtype=np.int64)
+    
+    def years(self) -> list:
+        """Get the indexed years in ascending order."""
+        return sorted(self.year_ranges)
+    
+    def months(self, year: int) -> list:
+        """Get the indexed months of a year in ascending order."""
+        return sorted(month for period_year, month in self.period_ranges if period_year == int(year))
+
+
+def _codes_to_series(codes: np.ndarray, index: pd.Index) -> pd.Series:
+    """Wrap id codes as int32, or nullable Int32 when some ids were missing (-1)."""
+    missing = codes < 0
+    if missing.any():
+        return pd.Series(pd.array(np.where(missing, 0, codes), dtype='Int32'), index=index).mask(missing)
+    return pd.Series(codes.astype(np.int32), index=index)
+
+
+class _SharedBlock(shared_memory.SharedMemory):
+    """Shared memory block that stays mapped while tables still view its buffer."""
+    
+    def __del__(self):
+        # Numpy views reference the mapping itself, which is unmapped once the
+        # last of them is gone; closing it here would leave them dangling
+        if self._fd >= 0:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = -1
+
+
+def _write_shared_table(block_name: str, df: pd.DataFrame) -> Tuple[_SharedBlock, List[Dict]]:
+    """Copy the columns of a table into a new shared memory block; return it and the column layout."""
+    columns, buffers, offset = [], [], 0
+    for col in df.columns:
+        column, arrays = _column_buffers(df[col])
+        
+        layout = []
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            offset = -(-offset // SHARED_ALIGNMENT) * SHARED_ALIGNMENT
+            layout.append({'offset': offset, 'dtype': array.dtype.str, 'length': len(array)})
+            buffers.append((offset, array))
+            offset += array.nbytes
+        columns.append({'name': col, **column, 'buffers': layout})
+    
+    block = _SharedBlock(name=block_name, create=True, size=max(offset, 1))
+    _PUBLISHED_BLOCKS.add(block_name)
+    for offset, array in buffers:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, offset=offset)[:] = array
+    return block, columns
+
+
+def _read_shared_table(block: _SharedBlock, rows: int, columns: List[Dict]) -> pd.DataFrame:
+    """Rebuild a table from its shared memory block as read-only views of the buffers."""
+    data = {}
+    for column in columns:
+        arrays = []
+        for layout in column['buffers']:
+            array = np.ndarray(layout['length'], dtype=np.dtype(layout['dtype']), buffer=block.buf,
+                               offset=layout['offset'])
+            array.flags.writeable = False
+            arrays.append(array)
+        values = _column_values(column, iter(arrays))
+        # An explicit dtype keeps object columns from being inferred as strings
+        data[column['name']] = pd.Series(values, dtype=values.dtype, copy=False)
+    return pd.DataFrame(data, index=pd.RangeIndex(rows), columns=[column['name'] for column in columns], copy=False)
+
+
+def _column_buffers(column: Union[pd.Series, pd.Index]) -> Tuple[Dict, List[np.ndarray]]:
+    """
+    Split a column into JSON-safe metadata and the flat arrays holding its data.
+    
+    Args:
+        column (Union[pd.Series, pd.Index]): Column, or the categories of a categorical
+    
+    Returns:
+        Tuple[Dict, List[np.ndarray]]: Column kind and dtype details, and its arrays
+    """
+    values, dtype = column.array, column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories, arrays = _column_buffers(dtype.categories)
+        column = {'kind': 'categorical', 'ordered': bool(dtype.ordered), 'categories': categories}
+        return column, [values.codes] + arrays
+    if isinstance(values, (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)):
+        numbers = values.to_numpy(dtype=dtype.numpy_dtype, na_value=dtype.numpy_dtype.type(0))
+        return {'kind': 'masked', 'dtype': str(dtype)}, [numbers, np.asarray(values.isna())]
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+        return {'kind': 'array'}, [np.asarray(values)]
+    if HAS_PYARROW and isinstance(values, pd.arrays.ArrowStringArray):
+        return {'kind': 'arrow', 'dtype': str(dtype)}, [np.frombuffer(_arrow_stream(values), dtype=np.uint8)]
+    
+    objects = np.asarray(values, dtype=object)
+    inferred = pd.api.types.infer_dtype(objects, skipna=True)
+    if inferred == 'date':
+        days = pd.to_datetime(pd.Series(objects, dtype=object)).to_numpy(dtype='datetime64[D]')
+        return {'kind': 'dates'}, [days]
+    if inferred in ('string', 'empty'):
+        missing = pd.isna(objects)
+        encoded = [b'' if is_missing else value.encode('utf-8') for value, is_missing in zip(objects, missing)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return {'kind': 'text'}, [np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets, missing]
+    raise TypeError(f"Columns of {inferred} values cannot be shared")
+
+
+def _column_values(column: Dict, arrays: Iterator[np.ndarray]):
+    """Rebuild column values from the metadata and arrays of ``_column_buffers``."""
+    kind = column['kind']
+    if kind == 'categorical':
+        codes = next(arrays)
+        categories = _column_values(column['categories'], arrays)
+        categories = pd.Index(categories, dtype=categories.dtype)
+        return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories, ordered=column['ordered']))
+    if kind == 'masked':
+        return pd.api.types.pandas_dtype(column['dtype']).construct_array_type()(next(arrays), next(arrays))
+    if kind == 'array':
+        return next(arrays)
+    if kind == 'arrow':
+        stream = pyarrow.ipc.open_stream(pyarrow.py_buffer(next(arrays)))
+        return pd.api.types.pandas_dtype(column['dtype']).__from_arrow__(stream.read_all().column(0))
+    if kind == 'dates':
+        days = next(arrays)
+        values = days.astype(object)
+        values[np.isnat(days)] = pd.NaT
+        return values
+    if kind == 'text':
+        blob, offsets, missing = next(arrays).tobytes(), next(arrays).tolist(), next(arrays)
+        values = np.empty(len(missing), dtype=object)
+        values[:] = [blob[start:stop].decode('utf-8') for start, stop in zip(offsets[:-1], offsets[1:])]
+        values[missing] = np.nan
+        return values
+    raise ValueError(f"Unknown shared column kind {kind}")
+
+
+def _arrow_stream(values: pd.api.extensions.ExtensionArray) -> 'pyarrow.Buffer':
+    """Serialize an Arrow-backed column as an IPC stream, whose buffers can be read in place."""
+    table = pyarrow.Table.from_arrays([pyarrow.array(values)], names=['values'])
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _attach_shared_block(name: str) -> _SharedBlock:
+    """Open an existing shared memory block without handing its removal to this process."""
+    if sys.version_info >= (3, 13):
+        return _SharedBlock(name=name, track=False)
+    
+    block = _SharedBlock(name=name)
+    # The resource tracker would remove the block when this process exits
+    if name not in _PUBLISHED_BLOCKS:
+        resource_tracker.unregister(block._name, 'shared_memory')
+    return block
+
+
+def _contiguous_ranges(values: np.ndarray) -> Dict[float, Tuple[int, int]]:
+    """Map each run of equal values in a sorted array to its [start, stop) range."""
+    if len(values) == 0:
+        return {}
+    
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    stops = np.r_[starts[1:], len(values)]
+    return {
+        (int(values[start]) if not np.isnan(values[start]) else values[start]): (int(start), int(stop))
+        for start, stop in zip(starts, stops)
+    }
+
+
+def sort_by_period(df: pd.DataFrame, timestamp_col: str = 'order_purchase_timestamp',
+                   year_col: str = 'purchase_year', month_col: str = 'purchase_month') -> pd.DataFrame:
+    """
+    Stably sort a DataFrame by purchase period, with undated rows last.
+    
+    Rows are sorted by the year and month columns, then by the purchase
+    timestamp when present, so that rows whose timestamp is missing still
+    fall in the period of their year and month. Rows with equal keys keep
+    their order.
+    
+    Args:
+        df (pd.DataFrame): DataFrame to sort
+        timestamp_col (str): Purchase timestamp column name
+        year_col (str): Year column name
+        month_col (str): Month column name
+    
+    Returns:
+        pd.DataFrame: Sorted copy with a fresh RangeIndex
+    """
+    by = [col for col in (year_col, month_col, timestamp_col) if col in df.columns]
+    
+    return df.sort_values(by, kind='mergesort', na_position='last').reset_index(drop=True)
+
+
+def concat_rows(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate tables, keeping categorical columns categorical.
+    
+    ``pd.concat`` turns categoricals with different categories into
+    strings; here unordered categories are unioned and sorted, as parsing
+    the combined data would produce.
+    
+    Args:
+        frames (List[pd.DataFrame]): Tables with the same columns
+    
+    Returns:
+        pd.DataFrame: Concatenated table with a fresh RangeIndex
+    """
+    frames = [df for df in frames if len(df)] or frames[:1]
+    for col in frames[0].columns:
+        dtypes = [df[col].dtype for df in frames if col in df.columns]
+        if not all(isinstance(dtype, pd.CategoricalDtype) and not dtype.ordered for dtype in dtypes):
+            continue
+        if all(dtype == dtypes[0] for dtype in dtypes):
+            continue
+        categories = pd.Index(np.concatenate([dtype.categories.to_numpy(dtype=object) for dtype in dtypes]))
+        categories = categories.unique().sort_values()
+        frames = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _partition_path(year: Optional[int], month: Optional[int]) -> str:
+    """Relative directory of a (year, month) partition; None is the Hive null partition."""
+    year_name = HIVE_NULL_PARTITION if year is None else int(year)
+    month_name = HIVE_NULL_PARTITION if month is None else int(month)
+    return os.path.join(f"year={year_name}", f"month={month_name}")
+
+
+def _partition_value(name: str, key: str) -> Optional[int]:
+    """Parse the value of a 'key=value' directory name, None for other or null partitions."""
+    prefix = f"{key}="
+    if not name.startswith(prefix):
+        return None
+    try:
+        return int(name[len(prefix):])
+    except ValueError:
+        return None
+
+
+def partition_periods(partition_dir: str, table: str) -> List[Tuple[int, int]]:
+    """
+    List the dated partitions of a partitioned table from its directory names.
+    
+    Args:
+        partition_dir (str): Root directory written by ``write_partitioned``
+        table (str): Table name
+    
+    Returns:
+        List[Tuple[int, int]]: Sorted (year, month) pairs
+    """
+    table_dir = os.path.join(partition_dir, table)
+    if not os.path.isdir(table_dir):
+        return []
+    
+    periods = []
+    for year_entry in os.scandir(table_dir):
+        year = _partition_value(year_entry.name, 'year')
+        if year is None or not year_entry.is_dir():
+            continue
+        for month_entry in os.scandir(year_entry.path):
+            month = _partition_value(month_entry.name, 'month')
+            if month is not None and month_entry.is_dir():
+                periods.append((year, month))
+    return sorted(periods)
+
+
+def read_partitioned(partition_dir: str, table: str, year_filter: Optional[int] = None,
+                     month_filter: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read the partitions of a table that fall in a period.
+    
+    Partitions are pruned by directory name, so only the files of the
+    period are opened. They are read in period order with undated rows
+    last (unfiltered reads only), so the result is period-sorted like the
+    exported table.
+    
+    Args:
+        partition_dir (str): Root directory written by ``write_partitioned``
+        table (str): Table name
+        year_filter (int, optional): Only read this year
+        month_filter (int, optional): Only read this month
+    
+    Returns:
+        pd.DataFrame: Rows of the period
+    """
+    periods = [(year, month) for year, month in partition_periods(partition_dir, table)
+               if year_filter in (None, year) and month_filter in (None, month)]
+    if year_filter is None and month_filter is None:
+        periods.append((None, None))
+    
+    files = []
+    for year, month in periods:
+        part_dir = os.path.join(partition_dir, table, _partition_path(year, month))
+        if os.path.isdir(part_dir):
+            files.extend(os.path.join(part_dir, name) for name in sorted(os.listdir(part_dir))
+                         if name.endswith('.parquet'))
+    
+    if files:
+        try:
+            # One conversion of all files is much faster than one per file
+            return pyarrow.concat_tables([pq.read_table(path) for path in files]).to_pandas()
+        except pyarrow.ArrowInvalid:
+            # Partitions with differing schemas, e.g. an all-missing column
+            return concat_rows([pd.read_parquet(path) for path in files])
+    
+    # No partition in the period: an empty table with the schema of any partition
+    for root, _, names in os.walk(os.path.join(partition_dir, table)):
+        for name in names:
+            if name.endswith('.parquet'):
+                return pd.read_parquet(os.path.join(root, name)).iloc[:0]
+    raise FileNotFoundError(f"No partitioned {table} table in {partition_dir}")
+
+
+def resolve_source_columns(columns: List[str]) -> set:
+    """
+    Resolve sales dataset columns to the raw columns they are built from.
+    
+    Args:
+        columns (List[str]): Raw or derived sales dataset columns
+    
+    Returns:
+        set: The columns and, recursively, their ``DERIVED_SOURCES``
+    """
+    resolved = set()
+    pending = list(columns)
+    while pending:
+        col = pending.pop()
+        if col not in resolved:
+            resolved.add(col)
+            pending.extend(DERIVED_SOURCES.get(col, []))
+    return resolved
+
+
+def semi_join_filter(column: str, keys: pd.Series):
+    """
+    Build a row filter keeping the rows whose key is among given keys.
+    
+    The keys are hashed into an index once, so each chunk is filtered by a
+    single hash lookup per row.
+    
+    Args:
+        column (str): Key column of the filtered table
+        keys (pd.Series): Key values to keep
+    
+    Returns:
+        callable: Function returning the boolean mask of a table's rows to keep
+    """
+    key_index = pd.Index(keys.dropna().unique())
+    return lambda df: key_index.get_indexer(df[column]) >= 0
+
+
+def period_mask(timestamps: pd.Series, year: Optional[int] = None,
+                month: Optional[int] = None) -> np.ndarray:
+    """
+    Boolean mask of the timestamps falling in a period.
+    
+    Args:
+        timestamps (pd.Series): Datetime values
+        year (int, optional): Year to match, any year when None
+        month (int, optional): Month to match, any month when None
+    
+    Returns:
+        np.ndarray: True where the timestamp is in the period (False for NaT)
+    """
+    mask = timestamps.notna().to_numpy(copy=True)
+    if year is not None:
+        mask &= (timestamps.dt.year == year).to_numpy()
+    if month is not None:
+        mask &= (timestamps.dt.month == month).to_numpy()
+    return mask
+
+
 def categorize_delivery_speed(days: float) -> str:
     """
     Categorize delivery speed based on number of days.
@@ -294,18 +2347,367 @@ def categorize_delivery_speed(days: float) -> str:
         return '8+ days'
 
 
-def load_and_process_data(data_path: str = 'ecommerce_data/') -> Tuple[EcommerceDataLoader, Dict[str, pd.DataFrame]]:
+def merge_many_to_one(left: pd.DataFrame, right: pd.DataFrame, on: str, name: str,
+                      engine: str = 'pandas') -> pd.DataFrame:
+    """
+    Left-join a table that must have at most one row per join key.
+    
+    Duplicate keys in ``right`` would fan out ``left`` rows and inflate
+    every sum over the result. When duplicates are found a warning
+    reports them and only the last row per key is joined.
+    
+    Args:
+        left (pd.DataFrame): Table whose rows are kept one-to-one
+        right (pd.DataFrame): Lookup table joined on ``on``
+        on (str): Join key column
+        name (str): Name of the lookup table, for the warning
+        engine (str): 'pandas', or 'arrow' to join through an Arrow hash
+            lookup (see ``arrow_engine.lookup_join``)
+    
+    Returns:
+        pd.DataFrame: ``left`` with the columns of ``right`` added
+    """
+    duplicated = right[on].duplicated(keep='last').to_numpy()
+    if duplicated.any():
+        print(f"Warning: {name} has {duplicated.sum()} duplicate '{on}' rows that would fan out "
+              f"the join, keeping the last row per key")
+        right = right[~duplicated]
+    
+    if engine == 'arrow':
+        return lookup_join(left, right, on)
+    return left.merge(right, on=on, how='left', validate='many_to_one')
+
+
+def aggregate_reviews_by_order(reviews: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collapse reviews to one summary row per order.
+    
+    Args:
+        reviews (pd.DataFrame): Review rows with 'order_id' and 'review_score'
+            and optionally 'review_creation_date' and 'review_answer_timestamp'
+    
+    Returns:
+        pd.DataFrame: Per order the 'review_score' of the latest review (by
+        creation date, missing if that review has no score),
+        'review_score_mean', 'review_count' and 'first_response_hours', the
+        time from the first review to its first answer
+    """
+    reviews = reviews[reviews['order_id'].notna()]
+    has_dates = 'review_creation_date' in reviews.columns
+    if has_dates:
+        reviews = reviews.assign(review_creation_date=pd.to_datetime(reviews['review_creation_date']))
+        reviews = reviews.sort_values('review_creation_date', kind='mergesort', na_position='first')
+    
+    grouped = reviews.groupby('order_id', sort=False, observed=True)
+    review_count = grouped.size()
+    # Score of the last review row even when missing, unlike ``last()``, which skips NaN
+    latest = reviews.drop_duplicates('order_id', keep='last').set_index('order_id')['review_score']
+    summary = pd.DataFrame({
+        'review_score': latest.reindex(review_count.index),
+        'review_score_mean': grouped['review_score'].mean(),
+        'review_count': review_count
+    })
+    
+    summary['first_response_hours'] = np.nan
+    if has_dates and 'review_answer_timestamp' in reviews.columns:
+        answered = pd.to_datetime(reviews['review_answer_timestamp'])
+        first_answer = answered.groupby(reviews['order_id'], sort=False, observed=True).min()
+        first_review = grouped['review_creation_date'].min()
+        summary['first_response_hours'] = (first_answer - first_review).dt.total_seconds() / 3600
+    
+    return summary.rename_axis('order_id').reset_index()
+
+
+def aggregate_payments_by_order(payments: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collapse payments to one summary row per order.
+    
+    Built from two vectorized groupbys (per order, and per order and
+    payment type), so it scales linearly with the number of payments.
+    
+    Args:
+        payments (pd.DataFrame): Payment rows with 'order_id', 'payment_type',
+            'payment_installments' and 'payment_value'
+    
+    Returns:
+        pd.DataFrame: Per order 'total_paid', 'payment_installments' (the
+        largest installment count), 'payment_type' (the type with the largest
+        paid value) and 'payment_methods' (number of distinct types)
+    """
+    by_order = payments.groupby('order_id', sort=False, observed=True)
+    summary = pd.DataFrame({
+        'total_paid': by_order['payment_value'].sum(),
+        'payment_installments': by_order['payment_installments'].max()
+    })
+    
+    # Value paid per (order, type); the first row per order after sorting is dominant
+    by_type = payments.groupby(['order_id', 'payment_type'], sort=False, observed=True)['payment_value'].sum()
+    by_type = by_type.reset_index().sort_values('payment_value', ascending=False, kind='mergesort')
+    dominant = by_type.drop_duplicates('order_id').set_index('order_id')['payment_type']
+    
+    summary['payment_type'] = dominant.reindex(summary.index)
+    summary['payment_methods'] = by_type.groupby('order_id', sort=False).size().reindex(summary.index)
+    
+    return summary.rename_axis('order_id').reset_index()
+
+
+def restore_whole_days(df: pd.DataFrame, column: str = 'delivery_days') -> pd.DataFrame:
+    """
+    Store whole day counts as int64 when none of them is missing.
+    
+    The sales fact table computes delivery days for every order status, so
+    undelivered orders make the column float64. ``Series.dt.days`` over a
+    slice without missing dates returns int64, which this restores.
+    
+    Args:
+        df (pd.DataFrame): Sales rows
+        column (str): Day count column (default: 'delivery_days')
+    
+    Returns:
+        pd.DataFrame: The rows, with the column cast when it has no missing values
+    """
+    if column in df.columns and df[column].dtype.kind == 'f' and not df[column].isna().any():
+        df = df.assign(**{column: df[column].astype('int64')})
+    return df
+
+
+def bucketize(values: pd.Series, spec: Dict) -> pd.Series:
+    """
+    Bin numeric values into an ordered categorical in one vectorized pass.
+    
+    Bin positions are found with ``np.searchsorted`` over the upper edges,
+    replacing a Python call per row such as
+    ``values.apply(categorize_delivery_speed)``.
+    
+    Args:
+        values (pd.Series): Numeric values to bin
+        spec (Dict): Bucket spec with 'edges', 'labels' and 'missing' keys
+            (see ``DERIVED_BUCKETS``)
+    
+    Returns:
+        pd.Series: Ordered categorical with the labels (then the missing
+        label) as categories, aligned with ``values``
+    """
+    edges = np.asarray(spec['edges'], dtype=float)
+    labels = list(spec['labels'])
+    if len(labels) != len(edges) + 1:
+        raise ValueError("A bucket spec needs exactly one more label than edges")
+    
+    numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    codes = np.searchsorted(edges, numbers, side='left')
+    
+    missing = np.isnan(numbers)
+    if spec.get('missing') is not None:
+        codes[missing] = len(labels)
+        labels.append(spec['missing'])
+    else:
+        codes[missing] = -1
+    
+    categories = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+    return pd.Series(categories, index=values.index, name=values.name)
+
+
+def add_derived_buckets(df: pd.DataFrame, specs: Optional[Dict[str, Dict]] = None) -> pd.DataFrame:
+    """
+    Add every bucketed column whose source column is present.
+    
+    Args:
+        df (pd.DataFrame): Table with the source columns
+        specs (Dict[str, Dict], optional): Bucket specs per derived column
+            (default: ``DERIVED_BUCKETS``)
+    
+    Returns:
+        pd.DataFrame: The table with the derived columns added
+    """
+    specs = DERIVED_BUCKETS if specs is None else specs
+    for column, spec in specs.items():
+        if spec['source'] in df.columns:
+            df[column] = bucketize(df[spec['source']], spec)
+    return df
+
+
+def parse_dtypes(table: str) -> Dict[str, str]:
+    """
+    Get the dtypes passed to ``pd.read_csv`` for a raw table.
+    
+    Args:
+        table (str): Raw table name
+    
+    Returns:
+        Dict[str, str]: Column name to dtype mapping
+    """
+    schema = TABLE_SCHEMAS.get(table, {})
+    dtypes = {col: 'category' for col in schema.get('category', [])}
+    dtypes.update({col: 'float64' for col in schema.get('float64', [])})
+    return dtypes
+
+
+def apply_schema(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """
+    Apply the declared schema of a raw table to a parsed DataFrame.
+    
+    Columns missing from the DataFrame are ignored, so partial or mocked
+    tables can be passed through safely.
+    
+    Args:
+        df (pd.DataFrame): Parsed table
+        table (str): Raw table name
+    
+    Returns:
+        pd.DataFrame: Table with categorical, downcast and timestamp columns
+    """
+    schema = TABLE_SCHEMAS.get(table, {})
+    
+    for col in schema.get('category', []):
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    
+    for col in schema.get('integer', []):
+        if col in df.columns:
+            values = pd.to_numeric(df[col], downcast='integer')
+            # Columns with missing values cannot be integers; shrink the float instead
+            if pd.api.types.is_float_dtype(values):
+                values = pd.to_numeric(values, downcast='float')
+            df[col] = values
+    
+    for col in schema.get('float64', []):
+        if col in df.columns:
+            df[col] = df[col].astype('float64')
+    
+    for col in schema.get('timestamps', []):
+        if col in df.columns:
+            df[col] = parse_timestamps(df[col])
+    
+    return df
+
+
+def parse_timestamps(values: pd.Series) -> pd.Series:
+    """
+    Parse timestamp strings, using TIMESTAMP_FORMAT when every value matches it.
+    
+    Args:
+        values (pd.Series): Timestamp strings or already parsed datetimes
+    
+    Returns:
+        pd.Series: Datetime values
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, format=TIMESTAMP_FORMAT)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values)
+
+
+def estimate_inferred_memory(df: pd.DataFrame) -> int:
+    """
+    Estimate the memory a DataFrame would use with inferred dtypes.
+    
+    Categorical columns are costed as object strings and downcast numeric
+    columns as 64-bit values, which is what ``pd.read_csv`` infers without
+    a schema.
+    
+    Args:
+        df (pd.DataFrame): DataFrame to estimate
+    
+    Returns:
+        int: Estimated memory usage in bytes
+    """
+    total = df.index.memory_usage(deep=True)
+    
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            counts = series.value_counts(sort=False, dropna=True)
+            value_sizes = np.array([sys.getsizeof(value) for value in counts.index], dtype=np.int64)
+            total += 8 * len(series) + int((counts.to_numpy() * value_sizes).sum())
+        elif pd.api.types.is_numeric_dtype(series) and series.dtype.itemsize < 8:
+            total += 8 * len(series)
+        else:
+            total += series.memory_usage(deep=True, index=False)
+    
+    return int(total)
+
+
+def file_sha256(filepath: str, chunk_size: int = 1 << 20, length: Optional[int] = None) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents.
+    
+    Args:
+        filepath (str): Path to the file
+        chunk_size (int): Number of bytes read per iteration
+        length (int, optional): Only hash the first ``length`` bytes
+    
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    remaining = length
+    with open(filepath, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _load_table_task(data_path: str, cache_dir: Optional[str], cache_format: str,
+                     key: str, filename: str) -> Tuple[Optional[pd.DataFrame], bool]:
+    """Load one raw table in a worker; module-level so process pools can pickle it."""
+    loader = EcommerceDataLoader(data_path, cache_dir=cache_dir, cache_format=cache_format)
+    return loader._load_table(key, filename)
+
+
+def load_and_process_data(data_path: str = 'ecommerce_data/',
+                          cache_dir: Optional[str] = None,
+                          max_workers: int = 1,
+                          encode_ids: bool = False,
+                          columns: Optional[List[str]] = None,
+                          year_filter: Optional[int] = None,
+                          month_filter: Optional[int] = None,
+                          snapshot_dir: Optional[str] = None,
+                          engine: Optional[str] = None) -> Tuple[EcommerceDataLoader, Dict[str, pd.DataFrame]]:
     """
     Convenience function to load and process all data.
     
+    With a snapshot directory, unscoped loads restore the snapshot when it
+    is still valid, and otherwise load, process, build the sales cube and
+    write a new snapshot for the next start.
+    
     Args:
         data_path (str): Path to data directory
+        cache_dir (str, optional): Directory for the columnar CSV cache
+        max_workers (int): Number of tables loaded concurrently
+        encode_ids (bool): Encode id columns as int32 codes
+        columns (List[str], optional): Only load what these sales columns need
+        year_filter (int, optional): Only load orders of this year
+        month_filter (int, optional): Only load orders of this month
+        snapshot_dir (str, optional): Directory of the warm-start snapshot
+            (see ``EcommerceDataLoader.save_snapshot``)
+        engine (str, optional): Engine of the sales joins and group-bys,
+            'pandas' or 'arrow' (default: ECOMMERCE_ENGINE, then 'pandas')
     
     Returns:
         Tuple[EcommerceDataLoader, Dict[str, pd.DataFrame]]: Loader instance and processed data
     """
-    loader = EcommerceDataLoader(data_path)
-    loader.load_raw_data()
+    options = {'cache_dir': cache_dir, 'max_workers': max_workers, 'encode_ids': encode_ids, 'engine': engine}
+    use_snapshot = snapshot_dir is not None and columns is None and year_filter is None and month_filter is None
+    
+    if use_snapshot:
+        loader = EcommerceDataLoader(data_path, **options)
+        if loader.restore_snapshot(snapshot_dir) and loader.load_scope is None:
+            return loader, loader.processed_data
+    
+    loader = EcommerceDataLoader(data_path, **options)
+    loader.load_raw_data(columns=columns, year_filter=year_filter, month_filter=month_filter)
     processed_data = loader.process_all_data()
     
+    if use_snapshot:
+        if 'sales' in processed_data:
+            loader.get_cube()
+        loader.save_snapshot(snapshot_dir)
+    
     return loader, processed_data
\ No newline at end of file
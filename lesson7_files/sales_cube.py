@@ -0,0 +1,315 @@
+"""
+Precomputed OLAP cube of sales measures for e-commerce data analysis.
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional
+
+from arrow_engine import group_sum
+
+# Dimensions of the item-grain cube, in cell key order
+ITEM_DIMENSIONS = ['purchase_year', 'purchase_month', 'product_category_name',
+                   'customer_state', 'order_status', 'delivery_category']
+
+# Dimensions of the order-grain cube; every one is constant within an order
+ORDER_DIMENSIONS = ['purchase_year', 'purchase_month', 'customer_state', 'order_status',
+                    'delivery_category', 'delivery_days', 'review_score']
+
+# Dimensions that vary between the items of one order
+ITEM_ONLY_DIMENSIONS = ['product_category_name']
+
+
+class SalesCube:
+    """
+    Additive sales measures pre-aggregated over year × month × category × state × status.
+    
+    The cube holds two cell tables built from the sales fact table:
+    
+    - ``item_cells``: one row per combination of ``ITEM_DIMENSIONS`` with the
+      additive measures revenue, items, freight, review and delivery-day sums
+      and counts, and the number of distinct orders in the cell.
+    - ``order_cells``: one row per combination of ``ORDER_DIMENSIONS`` with
+      order counts and order values, taken from the first row of each order.
+    
+    Distinct order counts are only additive over dimensions that are constant
+    within an order. An order belongs to exactly one year, month, state and
+    status, so the per-cell counts of ``item_cells`` can be summed across
+    those, which answers per-category queries. An order can span several
+    categories, so every query that rolls categories up counts orders from
+    ``order_cells`` instead, which has no category dimension. Keeping
+    delivery days and review score as order dimensions also makes their
+    order-level distributions (and medians) exact.
+    """
+    
+    def __init__(self, item_cells: pd.DataFrame, order_cells: Optional[pd.DataFrame],
+                 dimensions: List[str], order_dimensions: List[str]):
+        """
+        Initialize the cube from its cell tables.
+        
+        Args:
+            item_cells (pd.DataFrame): Item-grain cells (dimensions and measures)
+            order_cells (pd.DataFrame, optional): Order-grain cells, None when
+                the cube was sliced by an item-only dimension
+            dimensions (List[str]): Dimension columns of ``item_cells``
+            order_dimensions (List[str]): Dimension columns of ``order_cells``
+        """
+        self.item_cells = item_cells
+        self.order_cells = order_cells
+        self.dimensions = dimensions
+        self.order_dimensions = order_dimensions
+        self.measures = [col for col in item_cells.columns if col not in dimensions]
+    
+    @classmethod
+    def from_sales(cls, sales_data: pd.DataFrame, engine: str = 'pandas') -> 'SalesCube':
+        """
+        Build the cube from the sales fact table.
+        
+        Args:
+            sales_data (pd.DataFrame): Sales rows with at least 'order_id',
+                'price' and 'purchase_year'
+            engine (str): 'pandas', or 'arrow' to sum the cells with Arrow's
+                multi-threaded group-by (see ``arrow_engine.group_sum``)
+        
+        Returns:
+            SalesCube: Cube over every order status and period of the data
+        """
+        dimensions = [col for col in ITEM_DIMENSIONS if col in sales_data.columns]
+        order_dimensions = [col for col in ORDER_DIMENSIONS if col in sales_data.columns]
+        order_codes = pd.factorize(sales_data['order_id'])[0]
+        
+        rows = item_measure_rows(sales_data, dimensions)
+        if engine == 'arrow':
+            # Distinct orders per cell are counted in the same group-by pass
+            rows['orders'] = pd.Series(order_codes).where(order_codes >= 0).to_numpy()
+            item_cells = group_sum(rows, dimensions, distinct='orders')
+        else:
+            item_cells = sum_cells(rows, dimensions)
+        
+            # Distinct orders per cell: count unique (cell, order) pairs
+            pairs = rows.loc[order_codes >= 0, dimensions].assign(order_code=order_codes[order_codes >= 0])
+            pair_counts = pairs.drop_duplicates().groupby(dimensions, sort=True, dropna=False, observed=True).size()
+            item_cells['orders'] = pair_counts.reindex(item_cells.index, fill_value=0).astype(np.int64)
+        
+        # Order grain: first row of each order, with the order's total value
+        valid = order_codes >= 0
+        order_totals = np.bincount(order_codes[valid], weights=rows['revenue'].to_numpy()[valid])
+        first_rows = np.flatnonzero(~pd.Series(order_codes).duplicated().to_numpy() & valid)
+        orders = sales_data[order_dimensions].iloc[first_rows].reset_index(drop=True)
+        orders['orders'] = 1
+        orders['order_value'] = order_totals[order_codes[first_rows]]
+        order_cells = sum_cells(orders, order_dimensions, engine)
+        
+        return cls(item_cells.reset_index(), order_cells.reset_index(), dimensions, order_dimensions)
+    
+    def slice(self, **filters) -> 'SalesCube':
+        """
+        Restrict the cube to the cells matching dimension filters.
+        
+        Each filter is a dimension name with a single value, a list of
+        values, or None for no filter, e.g.
+        ``cube.slice(purchase_year=2023, purchase_month=[1, 2, 3])``.
+        Slicing by an item-only dimension (product category) drops the
+        order-grain cells, since orders spanning other categories cannot
+        be separated from them.
+        
+        Returns:
+            SalesCube: Cube over the matching cells
+        """
+        filters = {dim: value for dim, value in filters.items() if value is not None}
+        unknown = [dim for dim in filters if dim not in self.dimensions]
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {unknown}")
+        if not filters:
+            return self
+        
+        item_cells = self.item_cells[_filter_mask(self.item_cells, filters)]
+        
+        order_cells = self.order_cells
+        if any(dim in ITEM_ONLY_DIMENSIONS for dim in filters):
+            order_cells = None
+        elif order_cells is not None:
+            order_cells = order_cells[_filter_mask(order_cells, filters)]
+        
+        return SalesCube(item_cells, order_cells, self.dimensions, self.order_dimensions)
+    
+    def combine(self, other: 'SalesCube') -> 'SalesCube':
+        """
+        Add the cells of a cube built over other orders.
+        
+        Distinct order counts only add up when no order is in both cubes,
+        e.g. when ``other`` holds newly appended orders.
+        
+        Args:
+            other (SalesCube): Unsliced cube with the same dimensions
+        
+        Returns:
+            SalesCube: Cube over the rows of both cubes
+        """
+        if other.dimensions != self.dimensions or other.order_dimensions != self.order_dimensions:
+            raise ValueError("Only cubes with the same dimensions can be combined")
+        
+        item_cells = sum_cells(_concat_cells([self.item_cells, other.item_cells]), self.dimensions)
+        order_cells = sum_cells(_concat_cells([self._require_order_cells(), other._require_order_cells()]),
+                                self.order_dimensions)
+        return SalesCube(item_cells.reset_index(), order_cells.reset_index(),
+                         self.dimensions, self.order_dimensions)
+    
+    def rollup(self, by: List[str]) -> pd.DataFrame:
+        """
+        Roll the item measures up to the given dimensions.
+        
+        Cells with a missing value in any of the dimensions are dropped, as
+        in ``groupby``. Besides the summed measures the result holds
+        'orders', 'avg_order_value', 'avg_item_price' and the item-level
+        means 'review_score' and 'delivery_days' when available.
+        
+        Args:
+            by (List[str]): Dimensions to keep
+        
+        Returns:
+            pd.DataFrame: One row per observed combination of ``by``, sorted
+        """
+        _check_dimensions(by, self.dimensions)
+        cells = self.item_cells.groupby(by, sort=True, observed=True)[self.measures].sum()
+        
+        if not all(dim in by for dim in ITEM_ONLY_DIMENSIONS if dim in self.dimensions):
+            orders = self.order_rollup(by).set_index(by)
+            cells['orders'] = orders['orders'].reindex(cells.index, fill_value=0)
+            cells['order_value'] = orders['order_value'].reindex(cells.index, fill_value=0.0)
+        
+        return _derive_measures(cells).reset_index()
+    
+    def totals(self) -> pd.Series:
+        """
+        Get the measures of the whole cube.
+        
+        Returns:
+            pd.Series: Summed measures with the same derived values as ``rollup``
+        """
+        totals = self.item_cells[self.measures].sum()
+        
+        if any(dim in self.dimensions for dim in ITEM_ONLY_DIMENSIONS):
+            order_cells = self._require_order_cells()
+            totals['orders'] = order_cells['orders'].sum()
+            totals['order_value'] = order_cells['order_value'].sum()
+        
+        return _derive_measures(totals.to_frame().T).iloc[0]
+    
+    def order_rollup(self, by: List[str], dropna: bool = True) -> pd.DataFrame:
+        """
+        Roll order counts and order values up to the given order dimensions.
+        
+        Args:
+            by (List[str]): Order dimensions to keep, e.g. ['review_score']
+            dropna (bool): Drop combinations with missing values
+        
+        Returns:
+            pd.DataFrame: 'orders', 'order_value' and 'avg_order_value' per
+            observed combination of ``by``, sorted
+        """
+        order_cells = self._require_order_cells()
+        _check_dimensions(by, self.order_dimensions)
+        
+        if not by:
+            cells = order_cells[['orders', 'order_value']].sum().to_frame().T
+        else:
+            cells = order_cells.groupby(by, sort=True, dropna=dropna, observed=True)[
+                ['orders', 'order_value']].sum().reset_index()
+        cells['avg_order_value'] = cells['order_value'] / cells['orders'].where(cells['orders'] > 0)
+        return cells
+    
+    def _require_order_cells(self) -> pd.DataFrame:
+        """Get the order-grain cells, failing for category slices."""
+        if self.order_cells is None:
+            raise ValueError("Distinct order measures are not available for a cube sliced by "
+                             f"{ITEM_ONLY_DIMENSIONS}; roll up by those dimensions instead")
+        return self.order_cells
+
+
+def item_measure_rows(sales_data: pd.DataFrame, dimensions: List[str]) -> pd.DataFrame:
+    """
+    Get the dimensions and additive item measures of each sales row.
+    
+    Args:
+        sales_data (pd.DataFrame): Sales rows with at least 'price'
+        dimensions (List[str]): Dimension columns to keep
+    
+    Returns:
+        pd.DataFrame: Dimensions, 'revenue', 'items' and, when available,
+        'freight' and the sums and counts of review score and delivery days
+    """
+    rows = sales_data[dimensions].reset_index(drop=True)
+    rows['revenue'] = sales_data['price'].to_numpy()
+    rows['items'] = 1
+    if 'freight_value' in sales_data.columns:
+        rows['freight'] = sales_data['freight_value'].to_numpy()
+    for col in ('review_score', 'delivery_days'):
+        if col in sales_data.columns:
+            values = sales_data[col].astype(float).to_numpy()
+            rows[f'{col}_sum'] = np.nan_to_num(values)
+            rows[f'{col}_count'] = (~np.isnan(values)).astype(np.int64)
+    return rows
+
+
+def sum_cells(rows: pd.DataFrame, dimensions: List[str], engine: str = 'pandas') -> pd.DataFrame:
+    """
+    Sum every non-dimension column per observed combination of dimensions.
+    
+    Missing dimension values form cells of their own, so partial cells
+    (e.g. of separate chunks) can be summed again into the same cells.
+    
+    Args:
+        rows (pd.DataFrame): Rows or cells with dimension and measure columns
+        dimensions (List[str]): Dimension columns
+        engine (str): 'pandas', or 'arrow' for Arrow's multi-threaded group-by
+    
+    Returns:
+        pd.DataFrame: Summed measures indexed by the sorted dimensions
+    """
+    if engine == 'arrow':
+        return group_sum(rows, dimensions)
+    measures = [col for col in rows.columns if col not in dimensions]
+    return rows.groupby(dimensions, sort=True, dropna=False, observed=True)[measures].sum()
+
+
+def _concat_cells(cells: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate cell tables, unioning the categories of categorical dimensions."""
+    combined = pd.concat(cells, ignore_index=True)
+    for col, dtype in cells[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(combined[col].dtype, pd.CategoricalDtype):
+            categories = pd.Index(combined[col].dropna().unique()).sort_values()
+            combined[col] = combined[col].astype(pd.CategoricalDtype(categories, ordered=dtype.ordered))
+    return combined
+
+
+def _filter_mask(cells: pd.DataFrame, filters: Dict) -> np.ndarray:
+    """Boolean mask of the cells matching every filter."""
+    mask = np.ones(len(cells), dtype=bool)
+    for dim, value in filters.items():
+        if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+            mask &= cells[dim].isin(list(value)).to_numpy()
+        else:
+            mask &= (cells[dim] == value).to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+def _check_dimensions(by: List[str], dimensions: List[str]) -> None:
+    """Raise ValueError for dimensions the cube does not have."""
+    unknown = [dim for dim in by if dim not in dimensions]
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions: {unknown}")
+
+
+def _derive_measures(cells: pd.DataFrame) -> pd.DataFrame:
+    """Add averages derived from the additive measures."""
+    orders = cells['orders'].where(cells['orders'] > 0)
+    items = cells['items'].where(cells['items'] > 0)
+    
+    cells['avg_order_value'] = cells.get('order_value', cells['revenue']) / orders
+    cells['avg_item_price'] = cells['revenue'] / items
+    for col in ('review_score', 'delivery_days'):
+        if f'{col}_sum' in cells.columns:
+            counts = cells[f'{col}_count'].where(cells[f'{col}_count'] > 0)
+            cells[col] = cells[f'{col}_sum'] / counts
+    return cells
@@ -0,0 +1,335 @@
+"""
+Embedded SQLite query backend for e-commerce data analysis.
+"""
+
+import json
+import sqlite3
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from data_loader import EcommerceDataLoader, DERIVED_BUCKETS, PAYMENT_COLUMNS, restore_whole_days
+from sales_cube import SalesCube, ITEM_DIMENSIONS, ORDER_DIMENSIONS
+
+# Tables copied into the database with their alias and the columns kept
+# (None keeps every column); all but the items are joined on their key
+SQL_TABLES = {
+    'order_items': ('i', None),
+    'orders': ('o', ['order_id', 'customer_id', 'order_status', 'order_purchase_timestamp',
+                     'order_delivered_customer_date', 'purchase_year', 'purchase_month']),
+    'products': ('p', ['product_id', 'product_category_name']),
+    'customers': ('c', ['customer_id', 'customer_state', 'customer_city']),
+    'order_reviews': ('r', ['order_id', 'review_score']),
+    'order_payments': ('pay', ['order_id'] + PAYMENT_COLUMNS)
+}
+
+# Join condition of each table, in join order
+SQL_JOINS = {
+    'orders': 'o.order_id = i.order_id',
+    'products': 'p.product_id = i.product_id',
+    'customers': 'c.customer_id = o.customer_id',
+    'order_reviews': 'r.order_id = i.order_id',
+    'order_payments': 'pay.order_id = i.order_id'
+}
+
+# Indexed columns of each table: join keys and the purchase timestamp
+SQL_INDEXES = {
+    'order_items': ['order_id', 'product_id'],
+    'orders': ['order_id', 'customer_id', 'order_purchase_timestamp'],
+    'products': ['product_id'],
+    'customers': ['customer_id'],
+    'order_reviews': ['order_id'],
+    'order_payments': ['order_id']
+}
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+class SQLiteSalesBackend:
+    """
+    Sales datasets and cubes queried from an embedded SQLite database.
+    
+    ``load`` copies the processed order items, orders, products, customers
+    and per-order review and payment summaries into SQLite, indexed on
+    their join keys and the purchase timestamp, and records the columns
+    and dtypes of the pandas sales table. Queries then filter and join
+    inside SQLite:
+    
+    - ``sales_dataset`` returns the frame ``create_sales_dataset`` returns;
+    - ``build_cube`` compiles the cell aggregation of
+      ``SalesCube.from_sales`` to two GROUP BY queries, so the
+      ``BusinessMetricsCalculator`` reports of its cube match the pandas
+      reports (float sums up to summation order).
+    
+    Order items are stored in sales table order, so row order matches too.
+    Timestamps are stored as integer nanoseconds, which keeps delivery-day
+    arithmetic exact. With a database file the tables stay on disk, and a
+    backend reopened on the file queries without the loader.
+    """
+    
+    def __init__(self, database: str = ':memory:'):
+        """
+        Open the backend database.
+        
+        Args:
+            database (str): SQLite database file, or ':memory:'
+        """
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.schema = self._read_schema()
+    
+    def load(self, loader: EcommerceDataLoader) -> None:
+        """
+        Copy the processed tables of a loader into the database.
+        
+        Args:
+            loader (EcommerceDataLoader): Loader with processed data
+        """
+        if 'sales' not in loader.processed_data:
+            loader.build_sales_fact_table()
+        sales = loader.processed_data['sales']
+        
+        stored = {}
+        for name, (alias, columns) in SQL_TABLES.items():
+            if name == 'order_items':
+                # Items in sales order, so rowid order is the sales row order
+                item_columns = loader.processed_data['order_items'].columns
+                df = sales[[col for col in sales.columns if col in item_columns]]
+            else:
+                df = loader.processed_data.get(name, loader.raw_data.get(name))
+                if df is None:
+                    continue
+                df = df[[col for col in columns if col in df.columns]]
+            
+            _to_sql_frame(df).to_sql(name, self.connection, if_exists='replace', index=False)
+            for col in SQL_INDEXES[name]:
+                if col in df.columns:
+                    self.connection.execute(f'CREATE INDEX "{name}_{col}" ON "{name}" ("{col}")')
+            stored[name] = list(df.columns)
+        
+        schema = {
+            'tables': stored,
+            'sales': [_column_spec(col, sales[col], _column_expression(col, stored)) for col in sales.columns],
+            'payments': []
+        }
+        if 'order_payments' in stored:
+            payments = loader.processed_data['order_payments']
+            schema['payments'] = [_column_spec(col, payments[col], f'pay."{col}"')
+                                  for col in stored['order_payments'] if col != 'order_id']
+        
+        self.connection.execute('CREATE TABLE IF NOT EXISTS backend_metadata (key TEXT PRIMARY KEY, value TEXT)')
+        self.connection.execute('INSERT OR REPLACE INTO backend_metadata VALUES (?, ?)',
+                                ('schema', json.dumps(schema)))
+        self.connection.commit()
+        self.schema = schema
+    
+    def _read_schema(self) -> Optional[Dict]:
+        """Read the schema recorded by ``load``, None for an empty database."""
+        try:
+            row = self.connection.execute("SELECT value FROM backend_metadata WHERE key = 'schema'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return json.loads(row[0]) if row else None
+    
+    def _require_schema(self) -> Dict:
+        """Get the recorded schema, raising when nothing was loaded."""
+        if self.schema is None:
+            raise ValueError(f"No sales tables loaded into {self.database}; call load() first")
+        return self.schema
+    
+    def _from_clause(self, include_payments: bool = False) -> str:
+        """Join the items with every stored table."""
+        tables = self._require_schema()['tables']
+        clause = 'order_items i'
+        for name, condition in SQL_JOINS.items():
+            if name in tables and (name != 'order_payments' or include_payments):
+                clause += f' LEFT JOIN {name} {SQL_TABLES[name][0]} ON {condition}'
+        return clause
+    
+    def _where_clause(self, year_filter: Optional[int], month_filter: Optional[int],
+                      status_filter: Optional[str]) -> Tuple[str, list]:
+        """Compile the period and status filters of ``create_sales_dataset``."""
+        conditions, params = [], []
+        
+        # Year (and month) filters are ranges over the indexed purchase timestamp
+        if year_filter:
+            start = pd.Timestamp(int(year_filter), int(month_filter or 1), 1)
+            end = start + (pd.DateOffset(months=1) if month_filter else pd.DateOffset(years=1))
+            conditions.append('o.order_purchase_timestamp >= ? AND o.order_purchase_timestamp < ?')
+            params.extend([start.value, end.value])
+        elif month_filter:
+            conditions.append('o.purchase_month = ?')
+            params.append(int(month_filter))
+        
+        if status_filter:
+            conditions.append('o.order_status = ?')
+            params.append(status_filter)
+        
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+    
+    def sales_dataset(self, year_filter: Optional[int] = None,
+                      month_filter: Optional[int] = None,
+                      status_filter: Optional[str] = 'delivered',
+                      include_payments: bool = False) -> pd.DataFrame:
+        """
+        Query the sales dataset of ``EcommerceDataLoader.create_sales_dataset``.
+        
+        Args:
+            year_filter (int, optional): Filter by specific year
+            month_filter (int, optional): Filter by specific month
+            status_filter (str, optional): Filter by order status
+            include_payments (bool): Join the per-order payment summary
+        
+        Returns:
+            pd.DataFrame: Sales rows with the dtypes of the pandas path
+        """
+        schema = self._require_schema()
+        columns = schema['sales'] + (schema['payments'] if include_payments else [])
+        select = ', '.join(f'{spec["expression"]} AS "{spec["name"]}"' for spec in columns)
+        where, params = self._where_clause(year_filter, month_filter, status_filter)
+        
+        query = f'SELECT {select} FROM {self._from_clause(include_payments)}{where} ORDER BY i.rowid'
+        sales_data = pd.read_sql_query(query, self.connection, params=params)
+        
+        # Payment columns are joined per query, so missing summaries promote dtypes like a merge
+        for spec in columns:
+            sales_data[spec['name']] = _restore_column(sales_data[spec['name']], spec,
+                                                       promote=spec in schema['payments'])
+        return restore_whole_days(sales_data)
+    
+    def build_cube(self) -> SalesCube:
+        """
+        Aggregate the cells of the sales cube inside the database.
+        
+        Returns:
+            SalesCube: The cube ``SalesCube.from_sales`` builds over the sales table
+        """
+        specs = {spec['name']: spec for spec in self._require_schema()['sales']}
+        dimensions = [col for col in ITEM_DIMENSIONS if col in specs]
+        order_dimensions = [col for col in ORDER_DIMENSIONS if col in specs]
+        
+        measures = ['TOTAL(i.price) AS revenue', 'COUNT(*) AS items']
+        if 'freight_value' in specs:
+            measures.append('TOTAL(i.freight_value) AS freight')
+        for col in ('review_score', 'delivery_days'):
+            if col in specs:
+                expression = specs[col]['expression']
+                measures.extend([f'TOTAL({expression}) AS {col}_sum', f'COUNT({expression}) AS {col}_count'])
+        measures.append('COUNT(DISTINCT i.order_id) AS orders')
+        
+        dims = ', '.join(f'{specs[col]["expression"]} AS "{col}"' for col in dimensions)
+        group = ', '.join(str(position + 1) for position in range(len(dimensions)))
+        item_cells = self._read_cells(
+            f'SELECT {dims}, {", ".join(measures)} FROM {self._from_clause()} GROUP BY {group}',
+            dimensions, specs)
+        
+        # Order grain: the order dimensions are constant within an order
+        order_dims = ', '.join(f'{specs[col]["expression"]} AS "{col}"' for col in order_dimensions)
+        order_columns = ', '.join(f'"{col}"' for col in order_dimensions)
+        order_cells = self._read_cells(
+            f'SELECT {order_columns}, COUNT(*) AS orders, TOTAL(order_value) AS order_value FROM '
+            f'(SELECT {order_dims}, TOTAL(i.price) AS order_value FROM {self._from_clause()} '
+            f'WHERE i.order_id IS NOT NULL GROUP BY i.order_id) GROUP BY {order_columns}',
+            order_dimensions, specs)
+        
+        return SalesCube(item_cells, order_cells, dimensions, order_dimensions)
+    
+    def _read_cells(self, query: str, dimensions: List[str], specs: Dict[str, Dict]) -> pd.DataFrame:
+        """Run a cell query and order its cells like ``sum_cells``."""
+        cells = pd.read_sql_query(query, self.connection)
+        for col in dimensions:
+            cells[col] = _restore_column(cells[col], specs[col])
+        return cells.sort_values(dimensions, na_position='last', kind='mergesort').reset_index(drop=True)
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        self.connection.close()
+
+
+def _to_sql_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert datetime columns to nullable integer nanoseconds for storage."""
+    converted = {}
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            values = df[col].astype('datetime64[ns]')
+            nanoseconds = values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            converted[col] = pd.arrays.IntegerArray(nanoseconds, values.isna().to_numpy())
+    return df.assign(**converted) if converted else df
+
+
+def _column_expression(col: str, stored: Dict[str, List[str]]) -> str:
+    """
+    SQL expression of a sales column over the joined tables.
+    
+    Args:
+        col (str): Sales table column
+        stored (Dict[str, List[str]]): Stored columns per table
+    
+    Returns:
+        str: Expression computing the column
+    """
+    if col == 'delivery_days':
+        # Whole days between the timestamps, floored like Timedelta.days
+        diff = '(o.order_delivered_customer_date - o.order_purchase_timestamp)'
+        return f'(({diff} - ((({diff} % {NS_PER_DAY}) + {NS_PER_DAY}) % {NS_PER_DAY})) / {NS_PER_DAY})'
+    
+    if col in DERIVED_BUCKETS:
+        spec = DERIVED_BUCKETS[col]
+        source = _column_expression(spec['source'], stored)
+        missing = 'NULL' if spec.get('missing') is None else _sql_literal(spec['missing'])
+        cases = ''.join(f' WHEN {source} <= {edge} THEN {_sql_literal(label)}'
+                        for edge, label in zip(spec['edges'], spec['labels']))
+        return f'(CASE WHEN {source} IS NULL THEN {missing}{cases} ELSE {_sql_literal(spec["labels"][-1])} END)'
+    
+    for name in ('order_items', 'orders', 'products', 'customers', 'order_reviews'):
+        if col in stored.get(name, []):
+            return f'{SQL_TABLES[name][0]}."{col}"'
+    raise ValueError(f"Sales column {col} is not stored in the SQL backend")
+
+
+def _sql_literal(value: str) -> str:
+    """Quote a string as an SQL literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _column_spec(name: str, values: pd.Series, expression: str) -> Dict:
+    """Record the expression and pandas dtype of a result column."""
+    spec = {'name': name, 'expression': expression, 'dtype': str(values.dtype)}
+    if pd.api.types.is_datetime64_any_dtype(values):
+        # Read as text: a float column would round nanoseconds next to NULLs
+        spec['expression'] = f'CAST({expression} AS TEXT)'
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        spec['dtype'] = 'category'
+        spec['categories'] = values.cat.categories.tolist()
+        spec['ordered'] = bool(values.cat.ordered)
+    return spec
+
+
+def _restore_column(values: pd.Series, spec: Dict, promote: bool = False) -> pd.Series:
+    """
+    Convert a queried column back to its pandas dtype.
+    
+    Args:
+        values (pd.Series): Column as read from SQLite
+        spec (Dict): Column spec recorded by ``load``
+        promote (bool): Turn integer columns with missing values into
+            float64, as a left merge does
+    
+    Returns:
+        pd.Series: Column with the recorded dtype
+    """
+    dtype = spec['dtype']
+    if dtype == 'category':
+        categorical = pd.Categorical(values.astype(object), categories=spec['categories'],
+                                     ordered=spec['ordered'])
+        return pd.Series(categorical, index=values.index, name=values.name)
+    if dtype.startswith('datetime64'):
+        # Missing values become the NaT sentinel, the minimum int64
+        missing = values.isna().to_numpy()
+        nanoseconds = np.full(len(values), np.iinfo(np.int64).min)
+        nanoseconds[~missing] = values[~missing].to_numpy(dtype=object).astype(np.int64)
+        return pd.Series(nanoseconds.view('datetime64[ns]'), index=values.index, name=values.name).astype(dtype)
+    target = pd.api.types.pandas_dtype(dtype)
+    if promote and isinstance(target, np.dtype) and target.kind in 'iu' and values.isna().any():
+        return values.astype('float64')
+    return values.astype(target)
@@ -0,0 +1,293 @@
+"""
+Streaming aggregation of order items larger than memory for e-commerce data analysis.
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional
+
+from data_loader import EcommerceDataLoader, LOAD_CHUNK_ROWS
+from sales_cube import (SalesCube, ITEM_DIMENSIONS, ORDER_DIMENSIONS, ITEM_ONLY_DIMENSIONS,
+                        item_measure_rows, sum_cells)
+from business_metrics import BusinessMetricsCalculator
+from aggregates import ReportState, REPORT_COLUMNS
+
+# Orders whose item keys are unpacked at once when counting distinct orders per item cell
+COUNT_BLOCK_ORDERS = 100_000
+
+
+class StreamingMetricsAggregator:
+    """
+    Folds chunks of sales rows into the cells of a ``SalesCube``.
+    
+    Memory scales with the number of orders and cube cells, never with the
+    number of order items:
+    
+    - item measures are summed per cell for each chunk, and the partial
+      cells are re-summed once they outgrow ``compact_rows`` or twice the
+      cells left by the previous compaction, whichever is larger;
+    - order values are accumulated in an array indexed by the position of
+      each order in the orders table, and the order dimensions are kept
+      from the first row of each order;
+    - the item-only keys (categories) of each order, behind the distinct
+      order counts of the item cells, are kept as one bit per order and
+      key, i.e. ``len(order_ids) * ceil(keys / 8)`` bytes.
+    
+    Peak memory is therefore about the order arrays, the first-row order
+    dimensions, the key bits and up to twice the compacted cells, plus one
+    chunk.
+    
+    ``to_cube`` returns the cube ``SalesCube.from_sales`` builds over the same
+    rows, so a ``BusinessMetricsCalculator`` over it reproduces the row-level
+    reports.
+    """
+    
+    def __init__(self, order_ids: pd.Series, status_filter: Optional[str] = 'delivered',
+                 compact_rows: int = 1_000_000):
+        """
+        Initialize the aggregator.
+        
+        Args:
+            order_ids (pd.Series): Ids of the orders table; rows of other
+                orders have no period or status and are skipped
+            status_filter (str, optional): Only aggregate rows of this order
+                status (default: 'delivered', as ``create_sales_dataset``)
+            compact_rows (int): Number of buffered partial rows that triggers
+                re-summing them
+        """
+        self.order_index = pd.Index(order_ids.dropna().unique())
+        self.status_filter = status_filter
+        self.compact_rows = compact_rows
+        self.order_values = np.zeros(len(self.order_index))
+        self.order_seen = np.zeros(len(self.order_index), dtype=bool)
+        self.order_keys = np.zeros((len(self.order_index), 0), dtype=np.uint8)
+        self.item_keys = None
+        self.dimensions = None
+        self.order_dimensions = None
+        self._cells = []
+        self._cell_rows = 0
+        self._compact_at = compact_rows
+        self._orders = []
+        self.stats = {'chunks': 0, 'rows': 0, 'skipped_rows': 0}
+    
+    def update(self, sales_chunk: pd.DataFrame) -> None:
+        """
+        Fold one chunk of joined sales rows into the aggregates.
+        
+        Args:
+            sales_chunk (pd.DataFrame): Sales rows as yielded by
+                ``EcommerceDataLoader.iter_sales_chunks``
+        """
+        if self.status_filter is not None:
+            sales_chunk = sales_chunk[(sales_chunk['order_status'] == self.status_filter).to_numpy(
+                dtype=bool, na_value=False)]
+        
+        positions = self.order_index.get_indexer(sales_chunk['order_id'])
+        known = positions >= 0
+        self.stats['chunks'] += 1
+        self.stats['rows'] += int(known.sum())
+        self.stats['skipped_rows'] += int((~known).sum())
+        sales_chunk, positions = sales_chunk[known], positions[known]
+        
+        if self.dimensions is None:
+            self.dimensions = [col for col in ITEM_DIMENSIONS if col in sales_chunk.columns]
+            self.order_dimensions = [col for col in ORDER_DIMENSIONS if col in sales_chunk.columns]
+        
+        cells = sum_cells(item_measure_rows(sales_chunk, self.dimensions), self.dimensions).reset_index()
+        self._cells.append(cells)
+        self._cell_rows += len(cells)
+        
+        # Order values, summed in row order like SalesCube.from_sales
+        np.add.at(self.order_values, positions, sales_chunk['price'].to_numpy(dtype=float))
+        
+        # Dimensions of orders seen for the first time
+        first = ~pd.Series(positions).duplicated().to_numpy() & ~self.order_seen[positions]
+        self.order_seen[positions] = True
+        orders = sales_chunk[self.order_dimensions].iloc[np.flatnonzero(first)].reset_index(drop=True)
+        orders['order_position'] = positions[first]
+        self._orders.append(orders)
+        
+        self._add_order_keys(sales_chunk, positions)
+        
+        if self._cell_rows > self._compact_at:
+            self._compact()
+    
+    def _add_order_keys(self, sales_chunk: pd.DataFrame, positions: np.ndarray) -> None:
+        """Set the bit of the item-only key (category) of every row in the bits of its order."""
+        item_only = [dim for dim in ITEM_ONLY_DIMENSIONS if dim in self.dimensions]
+        if not item_only:
+            codes = np.zeros(len(sales_chunk), dtype=np.int64)
+            self.item_keys = pd.DataFrame(index=pd.RangeIndex(1))
+        else:
+            keys = sales_chunk[item_only].reset_index(drop=True)
+            if self.item_keys is None:
+                self.item_keys = keys.iloc[:0]
+            codes = pd.MultiIndex.from_frame(self.item_keys).get_indexer(pd.MultiIndex.from_frame(keys))
+            if (codes < 0).any():
+                self.item_keys = pd.concat([self.item_keys, keys[codes < 0].drop_duplicates()], ignore_index=True)
+                codes = pd.MultiIndex.from_frame(self.item_keys).get_indexer(pd.MultiIndex.from_frame(keys))
+        
+        width = -(-len(self.item_keys) // 8)
+        if width > self.order_keys.shape[1]:
+            self.order_keys = np.pad(self.order_keys, ((0, 0), (0, width - self.order_keys.shape[1])))
+        np.bitwise_or.at(self.order_keys, (positions, codes // 8), (1 << (codes % 8)).astype(np.uint8))
+    
+    def _compact(self) -> None:
+        """Re-sum the buffered partial cells, and compact again at twice their number."""
+        if self._cells:
+            self._cells = [sum_cells(pd.concat(self._cells, ignore_index=True), self.dimensions).reset_index()]
+            self._cell_rows = len(self._cells[0])
+            self._compact_at = max(self.compact_rows, 2 * self._cell_rows)
+    
+    def to_cube(self) -> SalesCube:
+        """
+        Build the sales cube of every row aggregated so far.
+        
+        Returns:
+            SalesCube: Cube over the aggregated rows
+        """
+        if self.dimensions is None:
+            raise ValueError("No sales rows have been aggregated")
+        
+        self._compact()
+        item_cells = sum_cells(self._cells[0], self.dimensions)
+        orders = pd.concat(self._orders, ignore_index=True)
+        item_cells['orders'] = self._cell_order_counts(orders).reindex(item_cells.index, fill_value=0).astype(np.int64)
+        
+        orders = orders.drop(columns='order_position').assign(
+            orders=1, order_value=self.order_values[orders['order_position'].to_numpy()])
+        order_cells = sum_cells(orders, self.order_dimensions)
+        
+        return SalesCube(item_cells.reset_index(), order_cells.reset_index(),
+                         self.dimensions, self.order_dimensions)
+    
+    def _cell_order_counts(self, orders: pd.DataFrame) -> pd.Series:
+        """
+        Count the distinct orders of every item cell from the key bits of each order.
+        
+        Args:
+            orders (pd.DataFrame): First-row order dimensions with 'order_position'
+        
+        Returns:
+            pd.Series: Number of orders per observed item cell, indexed by the dimensions
+        """
+        order_dims = [dim for dim in self.dimensions if dim not in ITEM_ONLY_DIMENSIONS]
+        cell_codes = orders.groupby(order_dims, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+        cells = orders[order_dims].iloc[np.flatnonzero(~pd.Series(cell_codes).duplicated().to_numpy())]
+        
+        # Orders per (order cell, item key), unpacking the key bits of a block of orders at a time
+        n_keys = len(self.item_keys)
+        counts = np.zeros(len(cells) * n_keys, dtype=np.int64)
+        positions = orders['order_position'].to_numpy()
+        for start in range(0, len(orders), COUNT_BLOCK_ORDERS):
+            block = slice(start, start + COUNT_BLOCK_ORDERS)
+            bits = np.unpackbits(self.order_keys[positions[block]], axis=1, count=n_keys, bitorder='little')
+            rows, keys = np.nonzero(bits)
+            counts += np.bincount(cell_codes[block][rows] * n_keys + keys, minlength=len(counts))
+        
+        cell_rows, key_codes = np.divmod(np.flatnonzero(counts), n_keys)
+        pairs = cells.iloc[cell_rows].reset_index(drop=True)
+        for col in self.item_keys.columns:
+            pairs[col] = self.item_keys[col].iloc[key_codes].to_numpy()
+        pairs['orders'] = counts[counts > 0]
+        return pairs.set_index(self.dimensions)['orders']
+
+
+def stream_sales_cube(loader: EcommerceDataLoader, chunksize: int = LOAD_CHUNK_ROWS,
+                      status_filter: Optional[str] = 'delivered') -> SalesCube:
+    """
+    Build the sales cube by streaming the order items in chunks.
+    
+    Args:
+        loader (EcommerceDataLoader): Loader of the data directory
+        chunksize (int): Order items per chunk
+        status_filter (str, optional): Only aggregate orders of this status
+    
+    Returns:
+        SalesCube: Cube over the streamed sales rows
+    """
+    if 'orders' not in loader.processed_data:
+        loader.load_dimension_tables()
+    
+    aggregator = StreamingMetricsAggregator(loader.processed_data['orders']['order_id'],
+                                            status_filter=status_filter)
+    for sales_chunk in loader.iter_sales_chunks(chunksize):
+        aggregator.update(sales_chunk)
+    
+    return aggregator.to_cube()
+
+
+def stream_report_states(loader: EcommerceDataLoader, chunksize: int = LOAD_CHUNK_ROWS,
+                         status_filter: Optional[str] = 'delivered', **kwargs) -> Dict[int, ReportState]:
+    """
+    Fold the streamed sales rows into one mergeable ``ReportState`` per purchase year.
+    
+    Each chunk is folded into the states of its years, whose size does not
+    depend on the number of rows or cells; only a flag per order is kept
+    across chunks, so that the order-level attributes of orders spanning
+    chunks are taken from their first row once, as in the row path, along
+    with the hash of each order id, computed once for the distinct order
+    counts. Rows of orders missing from the orders table are skipped.
+    
+    Args:
+        loader (EcommerceDataLoader): Loader of the data directory
+        chunksize (int): Order items per chunk
+        status_filter (str, optional): Only aggregate orders of this status
+        **kwargs: Sketch settings passed to ``ReportState``
+    
+    Returns:
+        Dict[int, ReportState]: State of the sales rows of each year
+    """
+    if 'orders' not in loader.processed_data:
+        loader.load_dimension_tables()
+    
+    order_index = pd.Index(loader.processed_data['orders']['order_id'].dropna().unique())
+    order_seen = np.zeros(len(order_index), dtype=bool)
+    order_hashes = pd.util.hash_array(order_index.to_numpy(), categorize=False)
+    states = {}
+    for sales_chunk in loader.iter_sales_chunks(chunksize):
+        # Only the columns read by the states are filtered and split by year
+        sales_chunk = sales_chunk[[col for col in ['order_status', 'purchase_year'] + REPORT_COLUMNS
+                                   if col in sales_chunk.columns]]
+        if status_filter is not None:
+            sales_chunk = sales_chunk[(sales_chunk['order_status'] == status_filter).to_numpy(
+                dtype=bool, na_value=False)]
+        positions = order_index.get_indexer(sales_chunk['order_id'])
+        sales_chunk, positions = sales_chunk[positions >= 0], positions[positions >= 0]
+        
+        first_order_rows = ~pd.Series(positions).duplicated().to_numpy() & ~order_seen[positions]
+        order_seen[positions] = True
+        for year, rows in sales_chunk.groupby('purchase_year', sort=True).indices.items():
+            if int(year) not in states:
+                states[int(year)] = ReportState(**kwargs)
+            states[int(year)].update(sales_chunk.iloc[rows], first_order_rows[rows], order_hashes[positions[rows]])
+    
+    return states
+
+
+def stream_comprehensive_report(loader: EcommerceDataLoader, current_year: int,
+                                previous_year: Optional[int] = None,
+                                chunksize: int = LOAD_CHUNK_ROWS,
+                                exact: bool = True) -> Dict[str, any]:
+    """
+    Generate the comprehensive report of delivered orders without loading all order items.
+    
+    Args:
+        loader (EcommerceDataLoader): Loader of the data directory
+        current_year (int): Year to analyze
+        previous_year (int, optional): Comparison year
+        chunksize (int): Order items per chunk
+        exact (bool): Build the report from a streamed ``SalesCube``; when
+            False, from ``stream_report_states``, whose memory does not grow
+            with the number of cube cells (within the tolerance documented
+            by ``ReportState``)
+    
+    Returns:
+        Dict[str, any]: The report of
+        ``BusinessMetricsCalculator.generate_comprehensive_report``
+    """
+    if exact:
+        calculator = BusinessMetricsCalculator(cube=stream_sales_cube(loader, chunksize))
+    else:
+        calculator = BusinessMetricsCalculator(states=stream_report_states(loader, chunksize))
+    return calculator.generate_comprehensive_report(current_year, previous_year)
@@ -24,7 +24,13 @@ def run_all_tests():
     test_modules = [
         'test_data_loader',
         'test_business_metrics', 
-        'test_dashboard'
+        'test_dashboard',
+        'test_sales_cube',
+        'test_streaming',
+        'test_sql_backend',
+        'test_arrow_engine',
+        'test_batch_reports',
+        'test_aggregates'
     ]
     
     for module_name in test_modules:
@@ -0,0 +1,248 @@
+"""
+Tests for aggregates.py functionality
+"""
+import unittest
+import pickle
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from aggregates import (
+    AggregateState, CountState, SumState, MeanState, MinMaxState, DistinctCountSketch, QuantileSketch,
+    HistogramState, GroupedState, ReportState, merge_states
+)
+from business_metrics import BusinessMetricsCalculator
+
+
+class TestAggregateStates(unittest.TestCase):
+
+    def setUp(self):
+        """Set up values with missing entries split into uneven partitions"""
+        rng = np.random.default_rng(7)
+        self.values = pd.Series(rng.lognormal(3, 1, 1000))
+        self.values[rng.choice(1000, 50, replace=False)] = np.nan
+        self.partitions = [self.values.iloc[:10], self.values.iloc[10:400], self.values.iloc[400:]]
+    
+    def _merged(self, factory):
+        states = [factory().update(partition) for partition in self.partitions]
+        # Any grouping and order of the merges gives the same state
+        left = merge_states(states)
+        right = states[2].merge(states[0].merge(states[1]))
+        return left, right
+    
+    def test_scalar_states_match_pandas(self):
+        """Test that merged counts, sums, means and ranges equal those of all values"""
+        for factory, expected in [(CountState, self.values.count()),
+                                  (lambda: CountState(skipna=False), len(self.values)),
+                                  (SumState, self.values.sum()),
+                                  (MeanState, self.values.mean())]:
+            for state in self._merged(factory):
+                self.assertAlmostEqual(state.result(), expected, places=9)
+        
+        for state in self._merged(MinMaxState):
+            self.assertEqual(state.result(), (self.values.min(), self.values.max()))
+    
+    def test_empty_states(self):
+        """Test the results of states without values, like empty Series"""
+        self.assertEqual(SumState().result(), 0.0)
+        self.assertTrue(np.isnan(MeanState().result()))
+        self.assertTrue(np.isnan(MinMaxState().update([np.nan]).result()[0]))
+        self.assertEqual(DistinctCountSketch().result(), 0.0)
+        self.assertTrue(np.isnan(QuantileSketch().quantile(0.5)))
+    
+    def test_incomplete_state_rejected(self):
+        """Test that states must implement update, merge and result"""
+        class UpdateOnlyState(AggregateState):
+            def update(self, values):
+                return self
+        
+        with self.assertRaises(TypeError):
+            UpdateOnlyState()
+    
+    def test_merge_leaves_inputs_unchanged(self):
+        """Test that merging returns a new state"""
+        left, right = MeanState().update([1.0, 2.0]), MeanState().update([3.0])
+        
+        merged = left.merge(right)
+        
+        self.assertEqual((left.count, right.count, merged.count), (2, 1, 3))
+    
+    def test_distinct_count_exact_below_limit(self):
+        """Test that small distinct counts are exact across partitions and dtypes"""
+        ids = pd.Series([f"ord{i % 700}" for i in range(2000)])
+        
+        sketch = merge_states([DistinctCountSketch().update(ids.iloc[start:start + 300])
+                               for start in range(0, len(ids), 300)])
+        
+        self.assertTrue(sketch.exact)
+        self.assertEqual(sketch.result(), 700)
+        self.assertEqual(DistinctCountSketch().update(pd.array([1, 2, None, 2], dtype='Int32')).result(), 2)
+    
+    def test_distinct_count_estimate(self):
+        """Test that large distinct counts are within 3 standard errors, in any merge order"""
+        ids = np.arange(200_000)
+        partitions = [DistinctCountSketch().update(ids[start::4]) for start in range(4)]
+        
+        merged = merge_states(partitions)
+        
+        self.assertFalse(merged.exact)
+        self.assertAlmostEqual(merged.result(), len(ids), delta=3 * 0.0081 * len(ids))
+        self.assertEqual(merged.result(), merge_states(partitions[::-1]).result())
+        self.assertEqual(merged.result(), DistinctCountSketch().update(ids).result())
+        self.assertLess(len(pickle.dumps(merged)), 20_000)
+    
+    def test_mismatched_settings(self):
+        """Test that states with different settings are not merged"""
+        with self.assertRaises(ValueError):
+            DistinctCountSketch(10).merge(DistinctCountSketch(12))
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+        with self.assertRaises(ValueError):
+            HistogramState([1, 2]).merge(HistogramState([1, 3]))
+        with self.assertRaises(ValueError):
+            merge_states([])
+    
+    def test_quantiles_within_relative_accuracy(self):
+        """Test that sketch quantiles are within the relative accuracy of Series.quantile"""
+        values = pd.concat([self.values, -self.values.iloc[:100], pd.Series([0.0] * 20)])
+        
+        for state in self._merged(QuantileSketch):
+            for q in (0.1, 0.5, 0.9, 0.99):
+                expected = self.values.quantile(q)
+                self.assertAlmostEqual(state.quantile(q), expected, delta=0.01 * expected)
+        
+        sketch = QuantileSketch().update(values)
+        self.assertEqual(sketch.count, values.count())
+        self.assertAlmostEqual(sketch.quantile(0.0), values.min(), delta=0.01 * abs(values.min()))
+        self.assertAlmostEqual(sketch.result(), values.median(), delta=0.01 * values.median())
+    
+    def test_histogram_bins(self):
+        """Test that values fall in the first bin whose upper edge is >= the value"""
+        histogram = merge_states([HistogramState([3, 7]).update([0, 3, 3.5]),
+                                  HistogramState([3, 7]).update([7, 8, np.nan])])
+        
+        self.assertEqual(histogram.result().tolist(), [2, 2, 1])
+        self.assertEqual((histogram.missing, histogram.total), (1, 6))
+    
+    def test_grouped_state(self):
+        """Test per-key states against groupby, with categorical keys and missing keys"""
+        keys = pd.Series(pd.Categorical(['TX', 'CA', None, 'TX', 'NY'], categories=['TX', 'NY', 'CA']))
+        values = pd.Series([1.0, 2.0, 4.0, 8.0, 16.0])
+        
+        grouped = GroupedState(SumState).update(keys.iloc[:2], values.iloc[:2]).merge(
+            GroupedState(SumState).update(keys.iloc[2:], values.iloc[2:]))
+        
+        expected = values.groupby(keys, observed=True).sum()
+        pd.testing.assert_series_equal(grouped.result().astype(float), expected, check_names=False)
+        self.assertIsInstance(grouped.keys(), pd.CategoricalIndex)
+    
+    def test_grouped_updates_match_groupby(self):
+        """Test the one-pass updates of every group against groupby, over several partitions"""
+        rng = np.random.default_rng(3)
+        keys = pd.Series(rng.integers(0, 20, 1000)).where(rng.random(1000) > 0.05)
+        ids = pd.Series(rng.integers(0, 300, 1000), dtype='Int64').where(rng.random(1000) > 0.05)
+        
+        for factory, values, expected in [(CountState, self.values, self.values.groupby(keys).count()),
+                                          (MeanState, self.values, self.values.groupby(keys).mean()),
+                                          (DistinctCountSketch, ids, ids.groupby(keys).nunique())]:
+            grouped = merge_states([GroupedState(factory).update(keys.iloc[start:start + 300],
+                                                                 values.iloc[start:start + 300])
+                                    for start in range(0, len(keys), 300)])
+            pd.testing.assert_series_equal(grouped.result().astype(float), expected.astype(float),
+                                           check_names=False)
+        
+        ranges = GroupedState(MinMaxState).update(keys, self.values).result()
+        self.assertEqual(ranges.tolist(), list(zip(self.values.groupby(keys).min(), self.values.groupby(keys).max())))
+    
+    def test_hashed_distinct_count(self):
+        """Test that sketches of hashed values count like sketches of the values"""
+        ids = pd.Series([f"ord{i % 700}" for i in range(2000)])
+        hashes = pd.util.hash_array(ids.to_numpy())
+        
+        for count in (100, 2000):
+            expected = DistinctCountSketch().update(ids.iloc[:count])
+            hashed = DistinctCountSketch(hashed=True).update(hashes[:count])
+            self.assertEqual(hashed.result(), expected.result())
+            self.assertEqual(hashed.merge(expected).result(), expected.result())
+
+
+class TestReportState(unittest.TestCase):
+    """Reports from merged partition states against the row path"""
+    
+    def setUp(self):
+        """Set up two years of sales with multi-item orders"""
+        self.sales_data = pd.DataFrame({
+            'order_id': ['ord1', 'ord1', 'ord2', 'ord3', 'ord4', 'ord5', 'ord5', 'ord6', 'ord7'],
+            'price': [100.0, 50.0, 200.0, 150.0, 300.0, 40.0, 60.0, 80.0, 120.0],
+            'purchase_year': [2023, 2023, 2023, 2023, 2023, 2023, 2023, 2022, 2022],
+            'purchase_month': [1, 1, 1, 2, 2, 3, 3, 1, 2],
+            'order_purchase_timestamp': pd.to_datetime(['2023-01-05', '2023-01-05', '2023-01-20', '2023-02-10',
+                                                        '2023-02-11', '2023-03-01', '2023-03-01', '2022-01-15',
+                                                        '2022-02-20']),
+            'customer_state': pd.Categorical(['CA', 'CA', 'TX', 'CA', 'NY', 'TX', 'TX', 'CA', 'NY']),
+            'product_category_name': pd.Categorical(['books', 'toys', 'books', 'electronics', 'books', 'toys',
+                                                     'toys', 'books', 'toys']),
+            'review_score': [5.0, 5.0, 4.0, np.nan, 1.0, 3.0, 3.0, 5.0, 2.0],
+            'delivery_days': [2.0, 2.0, 9.0, 5.0, np.nan, 3.0, 3.0, 12.0, 4.0]
+        })
+    
+    def _states(self):
+        """States of each (year, month) partition, merged per year"""
+        states = {}
+        for (year, _), rows in self.sales_data.groupby(['purchase_year', 'purchase_month']):
+            state = ReportState.from_sales(rows)
+            states[year] = states[year].merge(state) if year in states else state
+        return states
+    
+    def test_report_matches_row_path(self):
+        """Test that the report from merged month states equals the row-level report"""
+        expected = BusinessMetricsCalculator(self.sales_data).generate_comprehensive_report(2023, 2022)
+        
+        report = BusinessMetricsCalculator(states=self._states()).generate_comprehensive_report(2023, 2022)
+        
+        for section in ['revenue_metrics', 'customer_satisfaction']:
+            for key, value in expected[section].items():
+                self.assertAlmostEqual(report[section][key], value, msg=f"{section}.{key}")
+        for key, value in expected['delivery_performance'].items():
+            self.assertAlmostEqual(report['delivery_performance'][key], value, delta=0.01 * value, msg=key)
+        pd.testing.assert_frame_equal(report['monthly_trends'], expected['monthly_trends'], check_dtype=False)
+        pd.testing.assert_frame_equal(report['geographic_performance'], expected['geographic_performance'],
+                                      check_dtype=False)
+        pd.testing.assert_frame_equal(report['product_performance']['all_categories'],
+                                      expected['product_performance']['all_categories'], check_dtype=False)
+    
+    def test_missing_year_and_columns(self):
+        """Test reports of years without rows and of tables without optional columns"""
+        states = {2023: ReportState.from_sales(self.sales_data.drop(columns=['review_score', 'customer_state']))}
+        
+        report = BusinessMetricsCalculator(states=states).generate_comprehensive_report(2021)
+        
+        self.assertEqual(report['revenue_metrics']['total_orders'], 0)
+        self.assertIn('error', report['customer_satisfaction'])
+        self.assertIn('error', report['geographic_performance'].columns)
+    
+    def test_state_pickles_for_workers(self):
+        """Test that states can be returned from worker processes"""
+        state = pickle.loads(pickle.dumps(ReportState.from_sales(self.sales_data)))
+        
+        self.assertEqual(state.items.result(), len(self.sales_data))
+        self.assertEqual(state.orders.result(), 7)
+    
+    def test_given_order_hashes(self):
+        """Test that order hashes passed in count like hashes of the order ids"""
+        hashes = pd.util.hash_array(self.sales_data['order_id'].to_numpy())
+        
+        state = ReportState().update(self.sales_data, order_hashes=hashes)
+        
+        expected = ReportState.from_sales(self.sales_data)
+        self.assertEqual(state.orders.result(), 7)
+        for name in ['monthly_orders', 'state_orders', 'category_orders']:
+            pd.testing.assert_series_equal(getattr(state, name).result(), getattr(expected, name).result())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for arrow_engine.py functionality
+"""
+import unittest
+import pandas as pd
+import numpy as np
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from arrow_engine import HAS_PYARROW, ENGINE_ENV_VAR, lookup_join, group_sum, resolve_engine
+from data_loader import load_and_process_data
+from business_metrics import BusinessMetricsCalculator
+from sales_cube import sum_cells
+
+
+class TestResolveEngine(unittest.TestCase):
+
+    def test_default_and_environment(self):
+        """Test that the environment variable picks the engine unless one is passed"""
+        with patch.dict(os.environ, {ENGINE_ENV_VAR: ''}):
+            self.assertEqual(resolve_engine(), 'pandas')
+        with patch.dict(os.environ, {ENGINE_ENV_VAR: 'arrow'}), patch('arrow_engine.HAS_PYARROW', True):
+            self.assertEqual(resolve_engine(), 'arrow')
+            self.assertEqual(resolve_engine('pandas'), 'pandas')
+    
+    def test_unknown_engine(self):
+        """Test that unknown engines are rejected"""
+        with self.assertRaises(ValueError):
+            resolve_engine('polars')
+    
+    @patch('builtins.print')
+    def test_arrow_without_pyarrow(self, mock_print):
+        """Test the fallback to pandas when pyarrow is missing"""
+        with patch('arrow_engine.HAS_PYARROW', False):
+            self.assertEqual(resolve_engine('arrow'), 'pandas')
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is required for the arrow engine")
+class TestArrowEngine(unittest.TestCase):
+
+    def setUp(self):
+        """Set up items with a missing order and orders with nullable columns"""
+        self.items = pd.DataFrame({
+            'order_id': ['ord2', 'ord1', 'ord9', 'ord1', None],
+            'price': [20.0, 10.0, 5.0, 30.0, 1.0]
+        })
+        self.orders = pd.DataFrame({
+            'order_id': ['ord1', 'ord2', None],
+            'order_status': pd.Categorical(['delivered', 'shipped', 'canceled']),
+            'purchase_year': np.array([2023, 2022, 2021], dtype=np.int32),
+            'customer_code': pd.array([4, None, 7], dtype='Int32'),
+            'order_purchase_timestamp': pd.to_datetime(['2023-01-05', '2022-03-01', '2021-01-01'])
+        })
+    
+    def test_lookup_join_matches_merge(self):
+        """Test that the hash lookup join equals the pandas left merge"""
+        expected = self.items.merge(self.orders, on='order_id', how='left')
+        
+        pd.testing.assert_frame_equal(lookup_join(self.items, self.orders, 'order_id'), expected)
+        pd.testing.assert_frame_equal(lookup_join(self.items.iloc[:0], self.orders, 'order_id'),
+                                      self.items.iloc[:0].merge(self.orders, on='order_id', how='left'))
+    
+    def test_lookup_join_overlapping_columns(self):
+        """Test that overlapping columns fall back to the suffixed merge"""
+        items = self.items.assign(purchase_year=2020)
+        
+        pd.testing.assert_frame_equal(lookup_join(items, self.orders, 'order_id'),
+                                      items.merge(self.orders, on='order_id', how='left'))
+    
+    def test_group_sum_matches_sum_cells(self):
+        """Test that Arrow cells equal pandas cells, missing dimension values included"""
+        rows = pd.DataFrame({
+            'purchase_year': [2023.0, np.nan, 2023.0, 2022.0, np.nan],
+            'order_status': pd.Categorical(['shipped', 'delivered', 'shipped', None, 'delivered'],
+                                           categories=['shipped', 'delivered', 'canceled']),
+            'revenue': [1.0, 2.0, 3.0, 4.0, np.nan],
+            'items': [1, 1, 1, 1, 1]
+        })
+        dimensions = ['purchase_year', 'order_status']
+        
+        pd.testing.assert_frame_equal(sum_cells(rows, dimensions, engine='arrow'), sum_cells(rows, dimensions))
+    
+    def test_group_sum_distinct(self):
+        """Test counting distinct non-missing values per cell"""
+        rows = pd.DataFrame({'state': ['CA', 'CA', 'TX', 'CA'], 'order': [1.0, 1.0, np.nan, 2.0]})
+        
+        cells = group_sum(rows, ['state'], distinct='order')
+        
+        self.assertEqual(cells['order'].tolist(), [2, 0])
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is required for the arrow engine")
+class TestArrowPipeline(unittest.TestCase):
+    """Arrow engine over the sample data files against the pandas engine"""
+    
+    @patch('builtins.print')
+    def test_pipeline_matches_pandas(self, mock_print):
+        """Test that the sales table, cube and report equal those of the pandas engine"""
+        loader, _ = load_and_process_data('ecommerce_data/')
+        arrow_loader, _ = load_and_process_data('ecommerce_data/')
+        arrow_loader.engine = 'arrow'
+        
+        with patch.object(pd.DataFrame, 'merge', side_effect=AssertionError("pandas merge")):
+            arrow_sales = arrow_loader.build_sales_fact_table()
+        pd.testing.assert_frame_equal(arrow_sales, loader.processed_data['sales'])
+        
+        cube, expected_cube = arrow_loader.get_cube(), loader.get_cube()
+        pd.testing.assert_frame_equal(cube.item_cells, expected_cube.item_cells)
+        pd.testing.assert_frame_equal(cube.order_cells, expected_cube.order_cells)
+        
+        sales_data = loader.create_sales_dataset()
+        report = BusinessMetricsCalculator(sales_data, engine='arrow').generate_comprehensive_report(2023, 2022)
+        expected = BusinessMetricsCalculator(sales_data, engine='pandas').generate_comprehensive_report(2023, 2022)
+        for key, value in expected['revenue_metrics'].items():
+            self.assertAlmostEqual(report['revenue_metrics'][key], value, msg=key)
+        pd.testing.assert_frame_equal(report['geographic_performance'], expected['geographic_performance'])
+
+
+if __name__ == '__main__':
+    unittest.main()
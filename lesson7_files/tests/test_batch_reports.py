@@ -0,0 +1,110 @@
+"""
+Tests for batch_reports.py functionality
+"""
+import unittest
+import multiprocessing
+import threading
+import pandas as pd
+import numpy as np
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from business_metrics import BusinessMetricsCalculator
+import batch_reports
+from batch_reports import generate_report_batch
+
+
+class TestGenerateReportBatch(unittest.TestCase):
+
+    def setUp(self):
+        """Set up two years of sales in two states"""
+        self.sales_data = pd.DataFrame({
+            'order_id': ['ord1', 'ord2', 'ord3', 'ord4', 'ord5', 'ord5', 'ord6'],
+            'price': [100.0, 200.0, 150.0, 300.0, 50.0, 25.0, 80.0],
+            'purchase_year': [2023, 2023, 2022, 2022, 2023, 2023, 2022],
+            'purchase_month': [1, 2, 1, 2, 3, 3, 4],
+            'order_purchase_timestamp': pd.to_datetime(['2023-01-05', '2023-02-10', '2022-01-15', '2022-02-20',
+                                                        '2023-03-01', '2023-03-01', '2022-04-02']),
+            'customer_state': ['CA', 'TX', 'CA', 'TX', 'CA', 'CA', 'NY'],
+            'product_category_name': ['electronics', 'books', 'books', 'electronics', 'books', 'toys', 'toys'],
+            'review_score': [5.0, 4.0, 3.0, np.nan, 5.0, 5.0, 2.0],
+            'delivery_days': [3.0, 9.0, 5.0, np.nan, 2.0, 2.0, 7.0]
+        })
+    
+    def assertReportsEqual(self, report, expected):
+        self.assertEqual(set(report), set(expected))
+        for key, value in expected['revenue_metrics'].items():
+            if pd.isna(value):
+                self.assertTrue(pd.isna(report['revenue_metrics'][key]), key)
+            else:
+                self.assertAlmostEqual(report['revenue_metrics'][key], value, msg=key)
+        pd.testing.assert_frame_equal(report['monthly_trends'], expected['monthly_trends'])
+        pd.testing.assert_frame_equal(report['geographic_performance'], expected['geographic_performance'])
+    
+    def _expected(self, year, segment=None):
+        data = self.sales_data
+        if segment is not None:
+            data = data[data['customer_state'] == segment]
+        return BusinessMetricsCalculator(data).generate_comprehensive_report(year, year - 1)
+    
+    def test_reports_match_single_calls(self):
+        """Test that every (year, segment) report equals a separate calculator call"""
+        for max_workers in (1, 2):
+            reports = generate_report_batch(self.sales_data, [2022, 2023], 'customer_state',
+                                            max_workers=max_workers)
+            
+            self.assertEqual(list(reports), [(2022, None), (2023, None), (2022, 'CA'), (2023, 'CA'),
+                                             (2022, 'NY'), (2023, 'NY'), (2022, 'TX'), (2023, 'TX')])
+            for (year, segment), report in reports.items():
+                self.assertReportsEqual(report, self._expected(year, segment))
+    
+    def test_selected_segments(self):
+        """Test reporting chosen segments only, without the whole-table reports"""
+        reports = generate_report_batch(self.sales_data, [2023], 'customer_state', segments=['TX'],
+                                        include_overall=False, compare_previous=False)
+        
+        self.assertEqual(list(reports), [(2023, 'TX')])
+        self.assertEqual(reports[(2023, 'TX')]['revenue_metrics']['total_revenue'], 200.0)
+        self.assertIsNone(reports[(2023, 'TX')]['comparison_period'])
+    
+    def test_spawned_workers(self):
+        """Test spawned workers, which receive the table once through their initializer"""
+        reports = generate_report_batch(self.sales_data, [2023], 'customer_state', max_workers=2,
+                                        start_method='spawn')
+        
+        self.assertReportsEqual(reports[(2023, 'CA')], self._expected(2023, 'CA'))
+        self.assertEqual(batch_reports._BATCH_STATE, {})
+    
+    def test_default_start_method(self):
+        """Test that workers are forked on Linux only"""
+        with patch('batch_reports.sys.platform', 'darwin'), \
+                patch('batch_reports.multiprocessing.get_context', wraps=multiprocessing.get_context) as context:
+            generate_report_batch(self.sales_data, [2023], 'customer_state', segments=['TX'], max_workers=2)
+        
+        context.assert_called_once_with('spawn')
+    
+    def test_concurrent_batches(self):
+        """Test that batches started from several threads do not mix their state"""
+        results = {}
+        
+        def run(segment):
+            results[segment] = generate_report_batch(self.sales_data, [2023], 'customer_state',
+                                                     segments=[segment], max_workers=2, start_method='fork')
+        
+        threads = [threading.Thread(target=run, args=(segment,)) for segment in ('CA', 'TX')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        for segment in ('CA', 'TX'):
+            self.assertReportsEqual(results[segment][(2023, segment)], self._expected(2023, segment))
+        self.assertEqual(batch_reports._BATCH_STATE, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,11 @@ from unittest.mock import patch, MagicMock
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from business_metrics import BusinessMetricsCalculator, MetricsVisualizer, format_currency, format_percentage
+from sales_cube import SalesCube
+from business_metrics import (
+    BusinessMetricsCalculator, MetricsVisualizer, ReportEngine, aggregate_order_values,
+    average_order_value, format_currency, format_percentage
+)
 
 
 class TestBusinessMetricsCalculator(unittest.TestCase):
@@ -157,6 +161,190 @@ class TestBusinessMetricsCalculator(unittest.TestCase):
         self.assertEqual(report['comparison_period'], 2022)
 
 
+class TestReportEngine(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test data with a multi-item, multi-month order mix"""
+        self.test_sales_data = pd.DataFrame({
+            'order_id': ['ord1', 'ord1', 'ord2', 'ord3', 'ord4', 'ord5', None],
+            'price': [100.0, 50.0, 200.0, 300.0, 150.0, 80.0, 20.0],
+            'purchase_year': [2023, 2023, 2023, 2022, 2022, 2023, 2023],
+            'purchase_month': [1, 1, 2, 1, 2, 2, 2],
+            'product_category_name': ['electronics', 'books', 'electronics', 'books', 'electronics', 'books', 'books'],
+            'customer_state': ['CA', 'CA', 'TX', 'CA', 'TX', np.nan, 'TX'],
+            'review_score': [5, 5, 4, 3, 4, np.nan, 1],
+            'delivery_days': [3, 3, 7, 10, 5, np.nan, 2]
+        })
+    
+    def test_report_matches_individual_methods(self):
+        """Test that the single-pass report equals the per-section methods"""
+        calc = BusinessMetricsCalculator(self.test_sales_data)
+        report = calc.generate_comprehensive_report(current_year=2023, previous_year=2022)
+        
+        self.assertEqual(report['revenue_metrics'], calc.calculate_revenue_metrics(2023, 2022))
+        pd.testing.assert_frame_equal(report['monthly_trends'], calc.calculate_monthly_trends(2023))
+        pd.testing.assert_frame_equal(report['geographic_performance'],
+                                      calc.analyze_geographic_performance(2023))
+        pd.testing.assert_frame_equal(report['product_performance']['all_categories'],
+                                      calc.analyze_product_performance(2023)['all_categories'])
+        self.assertEqual(report['delivery_performance'], calc.analyze_delivery_performance(2023))
+    
+    def test_order_level_aggregates(self):
+        """Test order counts and average order values per dimension"""
+        year_data = self.test_sales_data[self.test_sales_data['purchase_year'] == 2023]
+        engine = ReportEngine(year_data)
+        
+        self.assertEqual(engine.order_count, 3)
+        self.assertAlmostEqual(engine.revenue_metrics()['average_order_value'], (150.0 + 200.0 + 80.0) / 3)
+        
+        monthly = engine.monthly_trends()
+        self.assertEqual(monthly['orders'].tolist(), [1, 2])
+        self.assertEqual(monthly['revenue'].tolist(), [150.0, 300.0])
+        self.assertEqual(monthly['avg_order_value'].tolist(), [150.0, 140.0])
+        
+        states = engine.geographic_performance().set_index('state')
+        self.assertEqual(states.loc['CA', 'orders'], 1)
+        self.assertEqual(states.loc['TX', 'revenue'], 220.0)
+        self.assertEqual(states.loc['TX', 'avg_order_value'], 200.0)
+        
+        books = engine.product_performance()['all_categories'].set_index('product_category_name').loc['books']
+        self.assertEqual(books['unique_orders'], 2)
+    
+    def test_cube_report_matches_rows(self):
+        """Test that a calculator over the sales cube reproduces the row-level report"""
+        # The cube only counts rows with an order id as orders
+        sales_data = self.test_sales_data.dropna(subset=['order_id'])
+        rows = BusinessMetricsCalculator(sales_data)
+        cube = BusinessMetricsCalculator(cube=SalesCube.from_sales(sales_data))
+        
+        expected = rows.generate_comprehensive_report(current_year=2023, previous_year=2022)
+        report = cube.generate_comprehensive_report(current_year=2023, previous_year=2022)
+        
+        for section in ['revenue_metrics', 'customer_satisfaction', 'delivery_performance']:
+            self.assertEqual(report[section].keys(), expected[section].keys())
+            for key, value in expected[section].items():
+                self.assertAlmostEqual(report[section][key], value, msg=f"{section}.{key}")
+        
+        pd.testing.assert_frame_equal(report['monthly_trends'], expected['monthly_trends'], check_dtype=False)
+        pd.testing.assert_frame_equal(report['geographic_performance'], expected['geographic_performance'],
+                                      check_dtype=False)
+        pd.testing.assert_frame_equal(report['product_performance']['all_categories'],
+                                      expected['product_performance']['all_categories'], check_dtype=False)
+    
+    def test_payment_metrics(self):
+        """Test payment mix and installment metrics over order-level payments"""
+        payments = pd.DataFrame({
+            'order_id': ['ord1', 'ord2', 'ord5'],
+            'total_paid': [160.0, 210.0, 90.0],
+            'payment_installments': [1, 4, 2],
+            'payment_type': ['credit_card', 'credit_card', 'voucher'],
+            'payment_methods': [1, 2, 1]
+        })
+        sales_data = self.test_sales_data.merge(payments, on='order_id', how='left')
+        metrics = BusinessMetricsCalculator(sales_data).calculate_payment_metrics(2023)
+        
+        self.assertAlmostEqual(metrics['avg_total_paid'], 460.0 / 3)
+        self.assertAlmostEqual(metrics['avg_installments'], 7 / 3)
+        self.assertAlmostEqual(metrics['installment_order_percentage'], 200 / 3)
+        self.assertAlmostEqual(metrics['multi_method_percentage'], 100 / 3)
+        mix = metrics['payment_mix'].set_index('payment_type')
+        self.assertEqual(mix.loc['credit_card', 'orders'], 2)
+        self.assertEqual(mix.loc['voucher', 'total_paid'], 90.0)
+        
+        self.assertIn('error', BusinessMetricsCalculator(self.test_sales_data).calculate_payment_metrics(2023))
+    
+    def test_calculator_requires_data(self):
+        """Test that either rows or a cube must be given"""
+        with self.assertRaises(ValueError):
+            BusinessMetricsCalculator()
+    
+    def test_missing_timestamp_keeps_year(self):
+        """Test that rows without a purchase timestamp are counted in their year"""
+        sales_data = pd.DataFrame({
+            'order_id': ['ord1', 'ord2', 'ord3'],
+            'price': [100.0, 50.0, 200.0],
+            'order_purchase_timestamp': pd.to_datetime(['2023-05-01', None, '2022-01-01']),
+            'purchase_year': [2023, 2022, 2022],
+            'purchase_month': [5, 1, 1]
+        })
+        
+        calc = BusinessMetricsCalculator(sales_data)
+        
+        self.assertEqual(calc.calculate_revenue_metrics(2022)['total_revenue'], 250.0)
+        self.assertEqual(calc.calculate_revenue_metrics(2023)['total_revenue'], 100.0)
+
+
+class TestAggregateOrderValues(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up item-level rows spanning several orders per dimension"""
+        self.items = pd.DataFrame({
+            'order_id': ['o1', 'o1', 'o2', 'o3', 'o3', 'o4', None],
+            'price': [100.0, 50.0, 200.0, 30.0, np.nan, 80.0, 999.0],
+            'purchase_month': [1, 1, 1, 2, 2, 2, 2],
+            'customer_state': ['CA', 'CA', 'TX', 'TX', 'TX', None, 'CA']
+        })
+    
+    def test_matches_groupby_apply(self):
+        """Test equivalence with the per-group lambda it replaces"""
+        expected = self.items.groupby('purchase_month').apply(
+            lambda x: x.groupby('order_id')['price'].sum().mean()
+        )
+        result = aggregate_order_values(self.items, by=['purchase_month'])
+        
+        pd.testing.assert_series_equal(result['avg_order_value'], expected, check_names=False)
+        self.assertEqual(result['orders'].tolist(), [2, 2])
+    
+    def test_missing_values_are_ignored(self):
+        """Test rows with missing order ids or dimension values are skipped"""
+        result = aggregate_order_values(self.items, by=['customer_state'])
+        
+        self.assertEqual(result.index.tolist(), ['CA', 'TX'])
+        self.assertEqual(result['orders'].tolist(), [1, 2])
+        self.assertEqual(result['avg_order_value'].tolist(), [150.0, 115.0])
+    
+    def test_multiple_dimensions(self):
+        """Test only observed dimension combinations are returned"""
+        result = aggregate_order_values(self.items, by=['purchase_month', 'customer_state'])
+        
+        self.assertEqual(result.index.tolist(), [(1, 'CA'), (1, 'TX'), (2, 'TX')])
+        self.assertEqual(result['avg_order_value'].tolist(), [150.0, 200.0, 30.0])
+    
+    def test_wide_dimensions(self):
+        """Test dimensions whose combinations far outnumber the rows against groupby"""
+        rng = np.random.default_rng(5)
+        items = pd.DataFrame({
+            'order_id': rng.integers(0, 20_000, 50_000).astype(str),
+            'price': rng.uniform(1, 100, 50_000),
+            'city': rng.integers(0, 40_000, 50_000),
+            'category': rng.integers(0, 40_000, 50_000).astype(str),
+            'seller': rng.integers(0, 40_000, 50_000)
+        })
+        by = ['city', 'category', 'seller']
+        
+        result = aggregate_order_values(items, by=by)
+        
+        totals = items.groupby(by + ['order_id'])['price'].sum().groupby(by)
+        expected = pd.DataFrame({'orders': totals.size(), 'avg_order_value': totals.mean()})
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    
+    def test_integer_order_ids(self):
+        """Test encoded integer order ids give the same result as strings"""
+        encoded = self.items.dropna(subset=['order_id']).copy()
+        expected = aggregate_order_values(encoded, by=['purchase_month'])
+        encoded['order_id'] = pd.factorize(encoded['order_id'])[0].astype(np.int32)
+        
+        pd.testing.assert_frame_equal(aggregate_order_values(encoded, by=['purchase_month']), expected)
+    
+    def test_average_order_value(self):
+        """Test the scalar and per-dimension average order value"""
+        self.assertAlmostEqual(average_order_value(self.items), (150.0 + 200.0 + 30.0 + 80.0) / 4)
+        self.assertTrue(np.isnan(average_order_value(self.items.iloc[:0])))
+        
+        by_month = average_order_value(self.items, by=['purchase_month'])
+        self.assertEqual(by_month.to_dict(), {1: 175.0, 2: 55.0})
+
+
 class TestMetricsVisualizer(unittest.TestCase):
     
     def setUp(self):
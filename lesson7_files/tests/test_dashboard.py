@@ -166,6 +166,10 @@ class TestVisualizationFunctions(unittest.TestCase):
             
             # Should be a bar chart
             self.assertEqual(fig.data[0].type, 'bar')
+            self.assertEqual(list(fig.data[0].x), ['1-3 days', '4-7 days', '8+ days'])
+            
+            # The caller's frame is left unchanged
+            self.assertNotIn('delivery_category', self.current_data.columns)
             
         except Exception as e:
             self.fail(f"create_satisfaction_delivery_chart failed: {str(e)}")
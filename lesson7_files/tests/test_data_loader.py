@@ -6,12 +6,23 @@ import pandas as pd
 import numpy as np
 import os
 import sys
+import shutil
+import gc
+import json
+import subprocess
+import tempfile
+from multiprocessing import shared_memory
 from unittest.mock import patch, MagicMock
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from data_loader import EcommerceDataLoader, load_and_process_data, categorize_delivery_speed
+from data_loader import (
+    EcommerceDataLoader, load_and_process_data, categorize_delivery_speed,
+    apply_schema, sort_by_period, bucketize, add_derived_buckets, aggregate_reviews_by_order,
+    merge_many_to_one, aggregate_payments_by_order, read_partitioned, PeriodPartitionIndex,
+    DERIVED_BUCKETS, HAS_PYARROW, SHARED_VERSION, _SharedBlock, _attach_shared_block
+)
 
 
 class TestDataLoader(unittest.TestCase):
@@ -129,12 +140,994 @@ class TestDataLoader(unittest.TestCase):
         self.assertTrue(all(sales_data['purchase_year'] == 2023))
         self.assertTrue(all(sales_data['order_status'] == 'delivered'))
         
+    def _processed_loader(self):
+        """Build a loader over the mock tables with all data processed"""
+        loader = EcommerceDataLoader(self.test_data_path)
+        loader.raw_data = {
+            'orders': self.mock_orders,
+            'order_items': self.mock_order_items,
+            'products': self.mock_products,
+            'customers': self.mock_customers,
+            'reviews': self.mock_reviews
+        }
+        loader.process_all_data()
+        return loader
+    
+    def test_sales_fact_table_materialized(self):
+        """Test that processing builds the joined sales table once"""
+        loader = self._processed_loader()
+        
+        self.assertIn('sales', loader.processed_data)
+        fact = loader.processed_data['sales']
+        self.assertEqual(len(fact), 3)
+        for col in ['product_category_name', 'customer_state', 'review_score', 'delivery_category']:
+            self.assertIn(col, fact.columns)
+        self.assertTrue(fact['delivery_category'].cat.ordered)
+        self.assertNotIn('price_band', fact.columns)
+    
+    def test_opt_in_derived_buckets(self):
+        """Test that extra bucket columns are added only when requested"""
+        loader = self._processed_loader()
+        default = loader.create_sales_dataset()
+        
+        bucketed = loader.create_sales_dataset(derived=['price_band', 'review_tier'])
+        
+        self.assertEqual(list(bucketed.columns), list(default.columns) + ['price_band', 'review_tier'])
+        self.assertEqual(bucketed['price_band'].tolist(), ['$50-100', '$100-250'])
+        self.assertEqual(bucketed['review_tier'].tolist(), ['High (4-5)', 'High (4-5)'])
+        self.assertNotIn('price_band', loader.create_sales_dataset().columns)
+        with self.assertRaises(ValueError):
+            loader.create_sales_dataset(derived=['unknown'])
+    
+    def test_delivery_days_dtype(self):
+        """Test that delivered sales keep whole delivery days as int64, like a per-slice .dt.days"""
+        loader = self._processed_loader()
+        
+        delivered = loader.create_sales_dataset()
+        all_statuses = loader.create_sales_dataset(status_filter=None)
+        
+        self.assertEqual(delivered['delivery_days'].dtype, np.int64)
+        self.assertEqual(delivered['delivery_days'].tolist(), [4, 7])
+        self.assertEqual(all_statuses['delivery_days'].dtype, np.float64)
+        self.assertEqual(loader.create_sales_dataset()['delivery_days'].dtype, np.int64)
+    
+    def test_sales_fact_table_with_repeated_reviews(self):
+        """Test that several reviews per order do not multiply sales rows"""
+        loader = self._processed_loader()
+        loader.raw_data['reviews'] = pd.DataFrame({
+            'order_id': ['ord1', 'ord1', 'ord2'],
+            'review_score': [2, 5, 4],
+            'review_creation_date': ['2023-01-20 10:00:00', '2023-01-18 10:00:00', '2023-02-20 10:00:00']
+        })
+        loader.process_all_data()
+        
+        fact = loader.processed_data['sales'].set_index('order_id')
+        self.assertEqual(len(fact), 3)
+        self.assertEqual(fact['price'].sum(), 600.0)
+        self.assertEqual(fact.loc['ord1', 'review_score'], 2)
+        self.assertEqual(loader.processed_data['order_reviews']['review_count'].tolist(), [2, 1])
+    
+    def test_aggregate_reviews_by_order(self):
+        """Test per-order latest score, mean, count and first response lag"""
+        reviews = pd.DataFrame({
+            'order_id': ['ord1', 'ord2', 'ord1', None],
+            'review_score': [3, 4, 5, 1],
+            'review_creation_date': pd.to_datetime(['2023-01-10', '2023-02-01', '2023-01-05', '2023-03-01']),
+            'review_answer_timestamp': pd.to_datetime(['2023-01-11', None, '2023-01-07', None])
+        })
+        summary = aggregate_reviews_by_order(reviews).set_index('order_id')
+        
+        self.assertEqual(list(summary.index), ['ord1', 'ord2'])
+        self.assertEqual(summary.loc['ord1', 'review_score'], 3)
+        self.assertEqual(summary.loc['ord1', 'review_score_mean'], 4.0)
+        self.assertEqual(summary.loc['ord1', 'review_count'], 2)
+        self.assertEqual(summary.loc['ord1', 'first_response_hours'], 48.0)
+        self.assertTrue(np.isnan(summary.loc['ord2', 'first_response_hours']))
+    
+    def test_latest_review_without_score(self):
+        """Test that an order whose latest review has no score gets a missing score"""
+        reviews = pd.DataFrame({
+            'order_id': ['ord1', 'ord1', 'ord2'],
+            'review_score': [4.0, np.nan, 5.0],
+            'review_creation_date': pd.to_datetime(['2023-01-05', '2023-01-10', '2023-02-01'])
+        })
+        summary = aggregate_reviews_by_order(reviews).set_index('order_id')
+        
+        self.assertTrue(np.isnan(summary.loc['ord1', 'review_score']))
+        self.assertEqual(summary.loc['ord1', 'review_score_mean'], 4.0)
+        self.assertEqual(summary.loc['ord2', 'review_score'], 5.0)
+    
+    def test_aggregate_payments_by_order(self):
+        """Test per-order total, installments, dominant type and method count"""
+        payments = pd.DataFrame({
+            'order_id': ['ord1', 'ord1', 'ord2', 'ord1'],
+            'payment_type': ['voucher', 'credit_card', 'boleto', 'voucher'],
+            'payment_installments': [1, 6, 1, 1],
+            'payment_value': [30.0, 50.0, 200.0, 40.0]
+        })
+        summary = aggregate_payments_by_order(payments).set_index('order_id')
+        
+        self.assertEqual(list(summary.index), ['ord1', 'ord2'])
+        self.assertEqual(summary.loc['ord1', 'total_paid'], 120.0)
+        self.assertEqual(summary.loc['ord1', 'payment_installments'], 6)
+        self.assertEqual(summary.loc['ord1', 'payment_type'], 'voucher')
+        self.assertEqual(summary.loc['ord1', 'payment_methods'], 2)
+        self.assertEqual(summary.loc['ord2', 'payment_methods'], 1)
+    
+    def test_create_sales_dataset_with_payments(self):
+        """Test that payment summaries are joined only when requested"""
+        loader = self._processed_loader()
+        loader.raw_data['payments'] = pd.DataFrame({
+            'order_id': ['ord1', 'ord1', 'ord2', None],
+            'payment_sequential': [1, 2, 1, 1],
+            'payment_type': ['credit_card', 'voucher', 'credit_card', 'voucher'],
+            'payment_installments': [3, 1, np.nan, 1],
+            'payment_value': [80.0, 30.0, 220.0, 10.0]
+        })
+        loader.process_all_data()
+        
+        self.assertEqual(len(loader.processed_data['payments']), 3)
+        self.assertNotIn('total_paid', loader.create_sales_dataset().columns)
+        
+        sales = loader.create_sales_dataset(include_payments=True).set_index('order_id')
+        self.assertEqual(len(sales), 2)
+        self.assertEqual(sales.loc['ord1', 'total_paid'], 110.0)
+        self.assertEqual(sales.loc['ord1', 'payment_methods'], 2)
+        self.assertEqual(sales.loc['ord2', 'payment_installments'], 1)
+    
+    def test_merge_many_to_one_reports_fan_out(self):
+        """Test that duplicate lookup keys are reported and collapsed"""
+        left = pd.DataFrame({'key': ['a', 'b', 'a'], 'value': [1, 2, 3]})
+        right = pd.DataFrame({'key': ['a', 'a', 'b'], 'label': ['old', 'new', 'x']})
+        
+        with patch('builtins.print') as mock_print:
+            merged = merge_many_to_one(left, right, on='key', name='labels')
+        
+        self.assertEqual(len(merged), 3)
+        self.assertEqual(merged['label'].tolist(), ['new', 'x', 'new'])
+        self.assertIn('labels has 1 duplicate', mock_print.call_args[0][0])
+        
+        with patch('builtins.print') as mock_print:
+            merge_many_to_one(left, right.iloc[1:], on='key', name='labels')
+        mock_print.assert_not_called()
+    
+    def test_create_sales_dataset_slices_fact_table(self):
+        """Test filters applied over the materialized sales table"""
+        loader = self._processed_loader()
+        
+        delivered = loader.create_sales_dataset()
+        self.assertEqual(delivered['order_id'].tolist(), ['ord1', 'ord2'])
+        self.assertEqual(list(delivered.index), [0, 1])
+        
+        february = loader.create_sales_dataset(year_filter=2023, month_filter=2)
+        self.assertEqual(february['order_id'].tolist(), ['ord2'])
+        
+        all_statuses = loader.create_sales_dataset(status_filter=None)
+        self.assertEqual(len(all_statuses), 3)
+        
+        # Callers may mutate their slice without touching the fact table
+        all_statuses['price'] = 0.0
+        self.assertEqual(loader.processed_data['sales']['price'].sum(), 600.0)
+    
+    def test_create_sales_dataset_memoized(self):
+        """Test LRU memoization of datasets with hit/miss/eviction counters"""
+        loader = self._processed_loader()
+        loader.dataset_cache_entries = 2
+        
+        first = loader.create_sales_dataset(year_filter=2023)
+        first['price'] = 0.0
+        again = loader.create_sales_dataset(year_filter=2023)
+        self.assertEqual(again['price'].sum(), 300.0)
+        self.assertEqual(loader.get_cache_stats()['hits'], 1)
+        self.assertEqual(loader.get_cache_stats()['misses'], 1)
+        
+        # The least recently used entry is evicted first
+        loader.create_sales_dataset(year_filter=2023, month_filter=1)
+        loader.create_sales_dataset(year_filter=2023)
+        loader.create_sales_dataset(status_filter=None)
+        stats = loader.get_cache_stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 2)
+        self.assertIn((loader.data_version, 2023, None, 'delivered', False, ()), loader._dataset_cache)
+        self.assertGreater(stats['bytes'], 0)
+        
+        # Reprocessing bumps the data version and drops every entry
+        version = stats['data_version']
+        loader.process_all_data()
+        stats = loader.get_cache_stats()
+        self.assertEqual(stats['data_version'], version + 1)
+        self.assertEqual(stats['entries'], 0)
+        self.assertEqual(stats['bytes'], 0)
+    
+    def test_dataset_cache_byte_budget(self):
+        """Test that results over the byte budget are not memoized"""
+        loader = self._processed_loader()
+        loader.dataset_cache_bytes = 1
+        
+        loader.create_sales_dataset()
+        loader.create_sales_dataset()
+        stats = loader.get_cache_stats()
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['entries'], 0)
+    
+    def test_get_cube(self):
+        """Test the sales cube built from the fact table and sliced like the dataset"""
+        loader = self._processed_loader()
+        
+        cube = loader.get_cube()
+        self.assertIs(loader.get_cube(), cube)
+        self.assertEqual(cube.totals()['revenue'], 600.0)
+        
+        delivered = loader.get_cube(year_filter=2023, status_filter='delivered')
+        dataset = loader.create_sales_dataset(year_filter=2023)
+        self.assertEqual(delivered.totals()['revenue'], dataset['price'].sum())
+        self.assertEqual(delivered.totals()['orders'], dataset['order_id'].nunique())
+        
+        february = loader.get_cube(year_filter=2023, month_filter=2)
+        self.assertEqual(february.totals()['revenue'], 200.0)
+        
+        # Rebuilding the fact table invalidates the cube
+        loader.build_sales_fact_table()
+        self.assertIsNone(loader.sales_cube)
+    
+    def test_encode_id_columns(self):
+        """Test shared int32 id codes and decoding"""
+        plain = self._processed_loader()
+        
+        loader = EcommerceDataLoader(self.test_data_path, encode_ids=True)
+        loader.raw_data = plain.raw_data
+        loader.process_all_data()
+        
+        orders = loader.processed_data['orders']
+        items = loader.processed_data['order_items']
+        self.assertEqual(orders['order_id'].dtype, np.int32)
+        self.assertEqual(items['product_id'].dtype, np.int32)
+        self.assertEqual(loader.processed_data['products']['product_id'].dtype, np.int32)
+        
+        # Codes are shared across tables
+        ord2 = loader.encode_id_values('order_id', ['ord2'])[0]
+        self.assertEqual(orders.loc[orders['order_id'] == ord2, 'customer_id'].size, 1)
+        self.assertEqual(items.loc[items['order_id'] == ord2, 'price'].iloc[0], 200.0)
+        self.assertEqual(loader.encode_id_values('order_id', ['missing'])[0], -1)
+        
+        # Decoding restores the unencoded sales dataset
+        encoded_sales = loader.create_sales_dataset()
+        decoded_sales = loader.decode_ids(encoded_sales)
+        pd.testing.assert_frame_equal(decoded_sales, plain.create_sales_dataset(), check_dtype=False)
+        
+        # Raw tables are left untouched
+        self.assertEqual(loader.raw_data['products']['product_id'].iloc[0], 'prod1')
+    
+    def test_encode_id_columns_twice(self):
+        """Test that processing again keeps every id dictionary complete"""
+        self.mock_products.loc[3] = ['prod4', 'toys']
+        self.mock_customers.loc[3] = ['cust4', 'WA', 'Seattle']
+        plain = self._processed_loader()
+        
+        loader = EcommerceDataLoader(self.test_data_path, encode_ids=True)
+        loader.raw_data = plain.raw_data
+        loader.process_all_data()
+        loader.process_all_data()
+        
+        self.assertEqual(len(loader.id_dictionaries['product']), 4)
+        self.assertEqual(len(loader.id_dictionaries['customer']), 4)
+        for name, df in loader.processed_data.items():
+            expected = plain.processed_data.get(name, plain.raw_data.get(name))
+            pd.testing.assert_frame_equal(loader.decode_ids(df), expected, check_dtype=False, obj=name)
+    
+    def test_available_periods(self):
+        """Test year and month listings served by the orders index"""
+        loader = self._processed_loader()
+        
+        self.assertEqual(loader.get_available_years(), [2023])
+        self.assertEqual(loader.get_available_months(2023), [1, 2, 3])
+        self.assertEqual(loader.get_available_months(2022), [])
+    
+    def test_apply_schema(self):
+        """Test declared dtypes for parsed tables"""
+        orders = apply_schema(self.mock_orders.copy(), 'orders')
+        self.assertIsInstance(orders['order_status'].dtype, pd.CategoricalDtype)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(orders['order_purchase_timestamp']))
+        self.assertTrue(orders['order_delivered_customer_date'].isna().iloc[2])
+        
+        reviews = apply_schema(self.mock_reviews.copy(), 'reviews')
+        self.assertEqual(reviews['review_score'].dtype, np.int8)
+        
+        items = apply_schema(self.mock_order_items.copy(), 'order_items')
+        self.assertEqual(items['price'].dtype, np.float64)
+        self.assertEqual(items['order_item_id'].dtype, np.int8)
+    
+    def test_data_summary_reports_memory_saved(self):
+        """Test that the summary compares against inferred dtypes"""
+        loader = EcommerceDataLoader(self.test_data_path)
+        loader.raw_data = {'orders': apply_schema(self.mock_orders.copy(), 'orders')}
+        loader.processed_data = {'orders': loader.clean_orders_data()}
+        
+        summary = loader.get_data_summary()['orders']
+        
+        self.assertIn('memory_saved_mb', summary)
+        self.assertGreater(summary['memory_saved_mb'], 0)
+        self.assertAlmostEqual(summary['inferred_memory_usage_mb'] - summary['memory_usage_mb'],
+                               summary['memory_saved_mb'])
+    
     def test_categorize_delivery_speed(self):
         """Test delivery speed categorization"""
         self.assertEqual(categorize_delivery_speed(2), '1-3 days')
         self.assertEqual(categorize_delivery_speed(5), '4-7 days')
         self.assertEqual(categorize_delivery_speed(10), '8+ days')
         self.assertEqual(categorize_delivery_speed(np.nan), 'Unknown')
+    
+    def test_bucketize(self):
+        """Test vectorized bucketing into ordered categoricals"""
+        days = pd.Series([0, 3, 3.5, 7, 8, np.nan, 30], index=list('abcdefg'))
+        buckets = bucketize(days, DERIVED_BUCKETS['delivery_category'])
+        
+        self.assertTrue(buckets.cat.ordered)
+        self.assertEqual(list(buckets.index), list('abcdefg'))
+        self.assertEqual(buckets.tolist(), [categorize_delivery_speed(day) for day in days])
+        self.assertEqual(list(buckets.cat.categories), ['1-3 days', '4-7 days', '8+ days', 'Unknown'])
+        
+        # Without a missing label, missing values stay missing
+        bands = bucketize(pd.Series([49.99, 50.0, 1500.0, np.nan]), DERIVED_BUCKETS['price_band'])
+        self.assertEqual(bands.iloc[:3].tolist(), ['$0-50', '$0-50', '$1000+'])
+        self.assertTrue(pd.isna(bands.iloc[3]))
+        self.assertLess(bands.iloc[0], bands.iloc[2])
+        
+        with self.assertRaises(ValueError):
+            bucketize(days, {'edges': [1, 2], 'labels': ['low', 'high'], 'missing': None})
+    
+    def test_add_derived_buckets(self):
+        """Test that derived buckets are added only for present source columns"""
+        df = add_derived_buckets(pd.DataFrame({'review_score': [1, 3, 5, np.nan]}))
+        
+        self.assertEqual(df['review_tier'].tolist(), ['Low (1-2)', 'Neutral (3)', 'High (4-5)', 'No review'])
+        self.assertNotIn('delivery_category', df.columns)
+        self.assertNotIn('price_band', df.columns)
+
+
+class TestPeriodPartitionIndex(unittest.TestCase):
+    """Tests for the (year, month) partition index"""
+    
+    def setUp(self):
+        self.df = sort_by_period(pd.DataFrame({
+            'order_id': ['a', 'b', 'c', 'd', 'e', 'f'],
+            'purchase_year': [2023, 2022, 2023, np.nan, 2022, 2023],
+            'purchase_month': [2, 5, 1, np.nan, 5, 2]
+        }))
+        self.index = PeriodPartitionIndex.from_frame(self.df)
+    
+    def test_sort_is_stable_with_missing_last(self):
+        """Test period sort order"""
+        self.assertEqual(self.df['order_id'].tolist(), ['b', 'e', 'c', 'a', 'f', 'd'])
+    
+    def test_row_ranges(self):
+        """Test year and period row ranges"""
+        self.assertEqual(self.index.row_range(2022), (0, 2))
+        self.assertEqual(self.index.row_range(2023), (2, 5))
+        self.assertEqual(self.index.row_range(2023, 2), (3, 5))
+        self.assertEqual(self.index.row_range(2021), (0, 0))
+        
+        self.assertEqual(self.index.slice(self.df, 2023, 2)['order_id'].tolist(), ['a', 'f'])
+        self.assertTrue(self.index.slice(self.df, 2024).empty)
+    
+    def test_month_positions_across_years(self):
+        """Test month lookups spanning several years"""
+        self.assertEqual(self.index.month_positions(5).tolist(), [0, 1])
+        self.assertEqual(len(self.index.month_positions(12)), 0)
+    
+    def test_years_and_months(self):
+        """Test listing indexed periods"""
+        self.assertEqual(self.index.years(), [2022, 2023])
+        self.assertEqual(self.index.months(2023), [1, 2])
+    
+    def test_unsorted_rows_rejected(self):
+        """Test that unsorted input is rejected"""
+        with self.assertRaises(ValueError):
+            PeriodPartitionIndex(np.array([2023, 2022]))
+
+
+def write_sample_csvs(data_dir):
+    """Write small orders and order items CSVs into a data directory"""
+    pd.DataFrame({
+        'order_id': ['ord1', 'ord2'],
+        'customer_id': ['cust1', 'cust2'],
+        'order_status': ['delivered', 'shipped'],
+        'order_purchase_timestamp': ['2023-01-01 10:00:00', '2023-02-01 11:00:00']
+    }).to_csv(os.path.join(data_dir, 'orders_dataset.csv'), index=False)
+    
+    pd.DataFrame({
+        'order_id': ['ord1', 'ord2'],
+        'product_id': ['prod1', 'prod2'],
+        'price': [100.0, 200.0],
+        'freight_value': [10.0, 20.0]
+    }).to_csv(os.path.join(data_dir, 'order_items_dataset.csv'), index=False)
+
+
+class TestParallelLoading(unittest.TestCase):
+    """Tests for concurrent loading of the raw tables"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.data_path = self.data_dir + os.sep
+        write_sample_csvs(self.data_dir)
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def _load(self, **kwargs):
+        loader = EcommerceDataLoader(self.data_path, **kwargs)
+        with patch('builtins.print') as mock_print:
+            raw_data = loader.load_raw_data()
+        return raw_data, [call.args[0] for call in mock_print.call_args_list]
+    
+    def test_thread_pool_matches_sequential(self):
+        """Test that threaded loading returns the same tables and log order"""
+        sequential, sequential_log = self._load()
+        threaded, threaded_log = self._load(max_workers=4)
+        
+        self.assertEqual(list(sequential), list(threaded))
+        self.assertEqual(sequential_log, threaded_log)
+        for key in sequential:
+            pd.testing.assert_frame_equal(sequential[key], threaded[key])
+    
+    def test_process_pool_loading(self):
+        """Test loading with a process pool"""
+        sequential, _ = self._load()
+        parallel, _ = self._load(max_workers=2, executor='process')
+        
+        pd.testing.assert_frame_equal(sequential['orders'], parallel['orders'])
+    
+    def test_missing_files_reported(self):
+        """Test that missing files are skipped with a warning in parallel mode"""
+        raw_data, log = self._load(max_workers=4)
+        
+        self.assertNotIn('payments', raw_data)
+        self.assertIn("Warning: order_payments_dataset.csv not found, skipping...", log)
+    
+    def test_invalid_executor(self):
+        """Test that unsupported executors are rejected"""
+        with self.assertRaises(ValueError):
+            EcommerceDataLoader(self.data_path, executor='gpu')
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is required for the columnar cache")
+class TestDataLoaderCache(unittest.TestCase):
+    """Tests for the columnar cache of parsed CSV files"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.data_path = self.data_dir + os.sep
+        self.cache_dir = os.path.join(self.data_dir, 'cache')
+        write_sample_csvs(self.data_dir)
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def _load(self, cache_format='parquet'):
+        loader = EcommerceDataLoader(self.data_path, cache_dir=self.cache_dir,
+                                     cache_format=cache_format)
+        with patch('builtins.print'):
+            return loader.load_raw_data()
+    
+    def test_cache_written_and_reused(self):
+        """Test that the second load reads from the cache instead of the CSV"""
+        first = self._load()
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, 'orders.parquet')))
+        
+        with patch('data_loader.pd.read_csv', side_effect=AssertionError("CSV re-parsed")):
+            second = self._load()
+        
+        pd.testing.assert_frame_equal(first['orders'], second['orders'])
+        self.assertNotIn('products', second)
+    
+    def test_feather_cache(self):
+        """Test that the feather cache format round-trips"""
+        first = self._load(cache_format='feather')
+        with patch('data_loader.pd.read_csv', side_effect=AssertionError("CSV re-parsed")):
+            second = self._load(cache_format='feather')
+        
+        pd.testing.assert_frame_equal(first['order_items'], second['order_items'])
+    
+    def test_cache_rebuilt_when_source_changes(self):
+        """Test that a modified CSV invalidates its cache entry"""
+        self._load()
+        
+        with open(os.path.join(self.data_dir, 'orders_dataset.csv'), 'a') as f:
+            f.write('ord3,cust3,delivered,2023-03-01 12:00:00\n')
+        
+        reloaded = self._load()
+        self.assertEqual(len(reloaded['orders']), 3)
+    
+    def test_touched_source_keeps_cache(self):
+        """Test that an mtime-only change is resolved by the content hash"""
+        self._load()
+        
+        orders_csv = os.path.join(self.data_dir, 'orders_dataset.csv')
+        stat = os.stat(orders_csv)
+        os.utime(orders_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        
+        with patch('data_loader.pd.read_csv', side_effect=AssertionError("CSV re-parsed")):
+            reloaded = self._load()
+        self.assertEqual(len(reloaded['orders']), 2)
+    
+    def test_invalid_cache_format(self):
+        """Test that unsupported cache formats are rejected"""
+        with self.assertRaises(ValueError):
+            EcommerceDataLoader(self.data_path, cache_dir=self.cache_dir, cache_format='csv')
+
+
+class TestScopedLoading(unittest.TestCase):
+    """Tests for column, table and period pushdown into the load"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.data_path = self.data_dir + os.sep
+        write_sample_csvs(self.data_dir)
+        pd.DataFrame({
+            'customer_id': ['cust1', 'cust2'],
+            'customer_state': ['CA', 'TX'],
+            'customer_city': ['LA', 'Austin']
+        }).to_csv(os.path.join(self.data_dir, 'customers_dataset.csv'), index=False)
+        pd.DataFrame({
+            'product_id': ['prod1', 'prod2'],
+            'product_category_name': ['electronics', 'books']
+        }).to_csv(os.path.join(self.data_dir, 'products_dataset.csv'), index=False)
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def _load(self, cache_dir=None, **kwargs):
+        loader = EcommerceDataLoader(self.data_path, cache_dir=cache_dir)
+        with patch('builtins.print'):
+            loader.load_raw_data(**kwargs)
+        return loader
+    
+    def test_columns_prune_tables_and_columns(self):
+        """Test that only the tables and columns behind the requested columns are read"""
+        raw_data = self._load(columns=['price', 'customer_state']).raw_data
+        
+        self.assertEqual(sorted(raw_data), ['customers', 'order_items', 'orders'])
+        self.assertEqual(list(raw_data['order_items'].columns), ['order_id', 'product_id', 'price'])
+        self.assertNotIn('customer_city', raw_data['customers'].columns)
+    
+    def test_derived_columns_load_their_sources(self):
+        """Test that derived columns pull in the raw columns they are built from"""
+        raw_data = self._load(columns=['total_item_value']).raw_data
+        
+        self.assertIn('freight_value', raw_data['order_items'].columns)
+        self.assertNotIn('products', raw_data)
+    
+    def test_period_filters_rows_while_reading(self):
+        """Test that rows outside the period are dropped from every table"""
+        with patch('data_loader.LOAD_CHUNK_ROWS', 1):
+            raw_data = self._load(year_filter=2023, month_filter=2).raw_data
+        
+        self.assertEqual(raw_data['orders']['order_id'].tolist(), ['ord2'])
+        self.assertEqual(raw_data['order_items']['product_id'].tolist(), ['prod2'])
+        self.assertEqual(raw_data['customers']['customer_id'].tolist(), ['cust2'])
+        self.assertEqual(raw_data['products']['product_id'].tolist(), ['prod2'])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(raw_data['orders']['order_purchase_timestamp']))
+    
+    def test_scoped_sales_match_full_load(self):
+        """Test that a scoped load yields the matching slice of a full load"""
+        with patch('builtins.print'):
+            full, _ = load_and_process_data(self.data_path)
+            scoped, _ = load_and_process_data(self.data_path, columns=['price', 'customer_state'],
+                                              year_filter=2023, month_filter=1)
+        
+        expected = full.create_sales_dataset(2023, 1, status_filter=None)
+        sales = scoped.create_sales_dataset(status_filter=None)
+        self.assertEqual(scoped.load_scope['year_filter'], 2023)
+        pd.testing.assert_frame_equal(sales[['order_id', 'price', 'customer_state']].reset_index(drop=True),
+                                      expected[['order_id', 'price', 'customer_state']].reset_index(drop=True))
+    
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is required for the columnar cache")
+    def test_scoped_load_reads_cache_columns(self):
+        """Test that scoped loads read columns from the cache without rewriting it"""
+        cache_dir = os.path.join(self.data_dir, 'cache')
+        self._load(cache_dir=cache_dir)
+        
+        with patch('data_loader.pd.read_csv', wraps=pd.read_csv) as mock_read_csv:
+            loader = self._load(cache_dir=cache_dir, columns=['price'], year_filter=2023, month_filter=1)
+        
+        self.assertTrue(all(call.kwargs.get('nrows') == 0 for call in mock_read_csv.call_args_list))
+        self.assertEqual(loader.raw_data['order_items']['price'].tolist(), [100.0])
+        self.assertEqual(len(pd.read_parquet(os.path.join(cache_dir, 'orders.parquet'))), 2)
+
+
+class TestIncrementalRefresh(unittest.TestCase):
+    """Tests for ingesting rows appended to the source CSVs"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.data_path = self.data_dir + os.sep
+        write_sample_csvs(self.data_dir)
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def _load(self, **kwargs):
+        with patch('builtins.print'):
+            loader, _ = load_and_process_data(self.data_path, **kwargs)
+        return loader
+    
+    def _append(self, filename, text):
+        with open(os.path.join(self.data_dir, filename), 'a') as f:
+            f.write(text)
+    
+    def _append_order(self):
+        self._append('orders_dataset.csv', 'ord3,cust3,delivered,2023-01-15 09:00:00\n')
+        self._append('order_items_dataset.csv', 'ord3,prod1,50.0,5.0\nord3,prod2,25.0,2.5\n')
+    
+    def test_refresh_matches_full_load(self):
+        """Test that appended orders and items end up as after a full reload"""
+        for encode_ids in (False, True):
+            write_sample_csvs(self.data_dir)
+            loader = self._load(encode_ids=encode_ids)
+            self._append_order()
+            
+            with patch('builtins.print'):
+                counts = loader.refresh()
+            expected = self._load(encode_ids=encode_ids)
+            
+            # New ids are appended to the id dictionaries, so compare decoded ids
+            self.assertEqual(counts, {'orders': 1, 'order_items': 2})
+            pd.testing.assert_frame_equal(loader.decode_ids(loader.processed_data['sales']),
+                                          expected.decode_ids(expected.processed_data['sales']))
+            pd.testing.assert_frame_equal(loader.decode_ids(loader.create_sales_dataset(2023, 1)),
+                                          expected.decode_ids(expected.create_sales_dataset(2023, 1)))
+    
+    def test_refresh_extends_sales_cube(self):
+        """Test that the cube of new orders is added to an existing sales cube"""
+        loader = self._load()
+        loader.get_cube()
+        self._append_order()
+        
+        with patch('builtins.print'):
+            loader.refresh()
+        
+        self.assertIsNotNone(loader.sales_cube)
+        pd.testing.assert_series_equal(loader.get_cube().totals(), self._load().get_cube().totals())
+    
+    def test_refresh_leaves_partial_lines(self):
+        """Test that a line still being written is only read once it is complete"""
+        loader = self._load()
+        self._append('orders_dataset.csv', 'ord3,cust3,deliv')
+        
+        with patch('builtins.print'):
+            self.assertEqual(loader.refresh(), {})
+            self._append('orders_dataset.csv', 'ered,2023-01-15 09:00:00\n')
+            self.assertEqual(loader.refresh(), {'orders': 1})
+        
+        self.assertEqual(loader.processed_data['orders']['order_id'].tolist(), ['ord1', 'ord3', 'ord2'])
+    
+    def test_refresh_rejects_rewritten_files(self):
+        """Test that files that shrank or scoped loaders cannot be refreshed"""
+        loader = self._load()
+        write_sample_csvs(self.data_dir)
+        pd.read_csv(os.path.join(self.data_dir, 'orders_dataset.csv')).head(1).to_csv(
+            os.path.join(self.data_dir, 'orders_dataset.csv'), index=False)
+        with self.assertRaises(ValueError):
+            loader.refresh()
+        
+        with self.assertRaises(ValueError):
+            self._load(year_filter=2023).refresh()
+
+
+class TestOrderUpdates(unittest.TestCase):
+    """Tests for upserting order status and timestamp changes"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        write_sample_csvs(self.data_dir)
+        with patch('builtins.print'):
+            self.loader, _ = load_and_process_data(self.data_dir + os.sep)
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def _apply(self, updates):
+        with patch('builtins.print'):
+            return self.loader.apply_order_updates(pd.DataFrame(updates))
+    
+    def test_status_change_updates_delivered_sales(self):
+        """Test that an order delivered later joins the delivered datasets and cube"""
+        self.assertEqual(len(self.loader.create_sales_dataset(2023)), 1)
+        self.loader.get_cube()
+        
+        counts = self._apply({'order_id': ['ord2'], 'order_status': ['delivered'],
+                              'order_delivered_customer_date': ['2023-02-05 11:00:00']})
+        
+        self.assertEqual(counts, {'updated': 1, 'inserted': 0})
+        delivered = self.loader.create_sales_dataset(2023)
+        self.assertEqual(sorted(delivered['order_id']), ['ord1', 'ord2'])
+        self.assertEqual(delivered.set_index('order_id').loc['ord2', 'delivery_days'], 4)
+        self.assertEqual(self.loader.get_cube(status_filter='delivered').totals()['revenue'], 300.0)
+        self.assertEqual(self.loader.raw_data['orders']['order_status'].tolist(), ['delivered', 'delivered'])
+    
+    def test_later_changes_win_and_unknown_orders_are_inserted(self):
+        """Test upsert semantics of a batch with several changes per order"""
+        counts = self._apply({
+            'order_id': ['ord1', 'ord1', 'ord3'],
+            'order_status': ['shipped', 'canceled', 'created'],
+            'customer_id': [None, None, 'cust3'],
+            'order_purchase_timestamp': [None, None, '2023-03-01 09:00:00']
+        })
+        
+        self.assertEqual(counts, {'updated': 1, 'inserted': 1})
+        orders = self.loader.processed_data['orders'].set_index('order_id')
+        self.assertEqual(orders.loc['ord1', 'order_status'], 'canceled')
+        self.assertEqual(orders.loc['ord1', 'purchase_month'], 1)
+        self.assertEqual(orders.loc['ord3', 'purchase_month'], 3)
+        self.assertEqual(len(self.loader.create_sales_dataset(2023)), 0)
+    
+    def test_rejects_unknown_columns(self):
+        """Test that updates of columns the orders table lacks are rejected"""
+        with self.assertRaises(ValueError):
+            self._apply({'order_id': ['ord1'], 'price': [1.0]})
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is required for snapshots")
+class TestSnapshots(unittest.TestCase):
+    """Tests for saving and restoring the processed loader state"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.data_path = self.data_dir + os.sep
+        self.snapshot_dir = os.path.join(self.data_dir, 'snapshot')
+        write_sample_csvs(self.data_dir)
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def _load(self, **kwargs):
+        with patch('builtins.print') as mock_print:
+            loader, _ = load_and_process_data(self.data_path, **kwargs)
+        return loader, [call.args[0] for call in mock_print.call_args_list]
+    
+    def _restore(self, encode_ids=True):
+        loader = EcommerceDataLoader(self.data_path, encode_ids=encode_ids)
+        with patch('builtins.print'):
+            restored = loader.restore_snapshot(self.snapshot_dir)
+        return loader if restored else None
+    
+    def test_restore_matches_saved_state(self):
+        """Test that tables, id dictionaries, indexes and the cube round-trip"""
+        loader, _ = self._load(encode_ids=True)
+        loader.get_cube()
+        loader.save_snapshot(self.snapshot_dir)
+        
+        restored = self._restore()
+        
+        for name, df in loader.processed_data.items():
+            pd.testing.assert_frame_equal(restored.processed_data[name], df)
+        pd.testing.assert_frame_equal(restored.raw_data['orders'], loader.raw_data['orders'])
+        self.assertTrue(restored.id_dictionaries['order'].equals(loader.id_dictionaries['order']))
+        self.assertEqual(restored.sales_index.period_ranges, loader.sales_index.period_ranges)
+        pd.testing.assert_frame_equal(restored.sales_cube.order_cells, loader.sales_cube.order_cells)
+        pd.testing.assert_frame_equal(restored.create_sales_dataset(2023), loader.create_sales_dataset(2023))
+    
+    def test_changed_sources_invalidate_snapshot(self):
+        """Test that rewritten sources and other settings reject the snapshot"""
+        loader, _ = self._load(encode_ids=True)
+        loader.save_snapshot(self.snapshot_dir)
+        
+        self.assertIsNone(self._restore(encode_ids=False))
+        pd.DataFrame({'order_id': ['ord9'], 'product_id': ['prod9'], 'price': [1.0], 'freight_value': [0.0]}).to_csv(
+            os.path.join(self.data_dir, 'order_items_dataset.csv'), index=False)
+        self.assertIsNone(self._restore())
+    
+    def test_appended_rows_left_for_refresh(self):
+        """Test that a snapshot of grown sources is restored and refreshed"""
+        loader, _ = self._load(encode_ids=True)
+        loader.save_snapshot(self.snapshot_dir)
+        with open(os.path.join(self.data_dir, 'order_items_dataset.csv'), 'a') as f:
+            f.write('ord2,prod1,5.0,1.0\n')
+        
+        restored = self._restore()
+        with patch('builtins.print'):
+            self.assertEqual(restored.refresh(), {'order_items': 1})
+        self.assertEqual(len(restored.processed_data['sales']), 3)
+    
+    def test_load_and_process_data_warm_start(self):
+        """Test that the first load writes the snapshot and the next one restores it"""
+        _, cold_log = self._load(snapshot_dir=self.snapshot_dir)
+        loader, warm_log = self._load(snapshot_dir=self.snapshot_dir)
+        
+        self.assertFalse(any(line.startswith('Restored snapshot') for line in cold_log))
+        self.assertTrue(warm_log[0].startswith('Restored snapshot'))
+        self.assertIsNotNone(loader.sales_cube)
+        self.assertEqual(len(loader.create_sales_dataset()), 1)
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is required for partitioned datasets")
+class TestSharedState(unittest.TestCase):
+    """Tests for publishing the processed loader state in shared memory"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.data_path = self.data_dir + os.sep
+        self.name = f"ecommerce_test_{os.getpid()}"
+        write_sample_csvs(self.data_dir)
+        with patch('builtins.print'):
+            self.loader, _ = load_and_process_data(self.data_path, encode_ids=True)
+        self.loader.get_cube()
+        self.loader.publish_shared(self.name)
+    
+    def tearDown(self):
+        self.loader.unpublish_shared()
+        shutil.rmtree(self.data_dir)
+    
+    def _attach(self):
+        loader = EcommerceDataLoader(self.data_path)
+        self.assertTrue(loader.attach_shared(self.name))
+        return loader
+    
+    def test_attach_matches_published_state(self):
+        """Test that tables, id dictionaries, indexes and the cube are attached"""
+        attached = self._attach()
+        
+        self.assertTrue(attached.encode_ids)
+        for name, df in self.loader.processed_data.items():
+            pd.testing.assert_frame_equal(attached.processed_data[name], df)
+        pd.testing.assert_frame_equal(attached.raw_data['orders'], self.loader.raw_data['orders'])
+        self.assertTrue(attached.id_dictionaries['order'].equals(self.loader.id_dictionaries['order']))
+        self.assertEqual(attached.sales_index.period_ranges, self.loader.sales_index.period_ranges)
+        pd.testing.assert_frame_equal(attached.sales_cube.item_cells, self.loader.sales_cube.item_cells)
+        pd.testing.assert_frame_equal(attached.create_sales_dataset(2023), self.loader.create_sales_dataset(2023))
+    
+    def test_attached_columns_are_shared_views(self):
+        """Test that attached columns are read-only views of the shared blocks"""
+        attached = self._attach()
+        blocks = [np.frombuffer(block.buf, dtype=np.uint8) for block in attached._shared_blocks]
+        sales = attached.processed_data['sales']
+        
+        for values in [sales['price'].to_numpy(), sales['order_purchase_timestamp'].to_numpy(),
+                       sales['order_id'].to_numpy(), sales['order_status'].array.codes]:
+            self.assertTrue(any(np.shares_memory(values, block) for block in blocks))
+            self.assertFalse(values.flags.writeable)
+    
+    def test_object_columns_without_pickle(self):
+        """Test that object, nullable and categorical columns round-trip through a JSON manifest"""
+        extra = pd.DataFrame({
+            'text': pd.Series(['a', np.nan, 'ünï'], dtype=object),
+            'day': pd.Series([pd.Timestamp('2023-01-02').date(), pd.NaT, pd.Timestamp('2023-03-04').date()],
+                             dtype=object),
+            'count': pd.array([1, None, 3], dtype='Int32'),
+            'tier': pd.Categorical([2, 1, None], categories=[1, 2], ordered=True)
+        })
+        self.loader.raw_data['extra'] = extra
+        self.loader.publish_shared(self.name)
+        
+        manifest = _attach_shared_block(self.name)
+        try:
+            length = int.from_bytes(manifest.buf[:8], 'little')
+            self.assertEqual(json.loads(bytes(manifest.buf[8:8 + length]))['version'], SHARED_VERSION)
+        finally:
+            manifest.close()
+        attached = self._attach()
+        pd.testing.assert_frame_equal(attached.raw_data['extra'], extra)
+    
+    def test_attached_tables_outlive_loader(self):
+        """Test that attached tables stay readable after their loader is collected"""
+        sales = self._attach().processed_data['sales']
+        gc.collect()
+        
+        self.assertEqual(sales['price'].sum(), self.loader.processed_data['sales']['price'].sum())
+    
+    def test_failed_attach_closes_blocks(self):
+        """Test that unsupported layouts and missing table blocks close every opened block"""
+        def attach(name):
+            opened = []
+            def record(block_name):
+                opened.append(_attach_shared_block(block_name))
+                return opened[-1]
+            with patch('data_loader._attach_shared_block', side_effect=record):
+                try:
+                    return EcommerceDataLoader().attach_shared(name), opened
+                except FileNotFoundError:
+                    return None, opened
+        
+        manifest = json.dumps({'version': SHARED_VERSION + 1}).encode('utf-8')
+        bogus = shared_memory.SharedMemory(name=f"{self.name}_bogus", create=True, size=8 + len(manifest))
+        try:
+            bogus.buf[:8] = len(manifest).to_bytes(8, 'little')
+            bogus.buf[8:8 + len(manifest)] = manifest
+            with patch('builtins.print'):
+                attached, opened = attach(f"{self.name}_bogus")
+            self.assertFalse(attached)
+            self.assertEqual([block.buf for block in opened], [None])
+        finally:
+            bogus.close()
+            bogus.unlink()
+        
+        # Remove the last table block: every block before it was opened
+        last_table = _attach_shared_block(f"{self.name}_{len(self.loader._shared_blocks) - 2}")
+        last_table.unlink()
+        last_table.close()
+        attached, opened = attach(self.name)
+        self.assertIsNone(attached)
+        self.assertEqual(len(opened), len(self.loader._shared_blocks) - 1)
+        self.assertTrue(all(block.buf is None for block in opened))
+    
+    def test_attach_from_other_process(self):
+        """Test that a separate process attaches and queries the published state"""
+        script = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r}); "
+                  "from data_loader import EcommerceDataLoader; loader = EcommerceDataLoader(); "
+                  f"print(loader.attach_shared({self.name!r}), loader.create_sales_dataset(2023)['price'].sum())")
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=120)
+        
+        self.assertEqual(result.stdout.split(), ['True', str(self.loader.create_sales_dataset(2023)['price'].sum())])
+        self.assertNotIn('Error', result.stderr)
+    
+    def test_unpublish(self):
+        """Test that unpublished state cannot be attached but stays readable where attached"""
+        attached = self._attach()
+        self.loader.unpublish_shared()
+        
+        self.assertFalse(EcommerceDataLoader(self.data_path).attach_shared(self.name))
+        self.assertEqual(len(attached.processed_data['sales']), len(self.loader.processed_data['sales']))
+        with open(os.path.join(self.data_dir, 'order_items_dataset.csv'), 'a') as f:
+            f.write('ord2,prod1,5.0,1.0\n')
+        with patch('builtins.print'):
+            self.assertEqual(attached.refresh(), {'order_items': 1})
+
+
+class TestPartitionedDataset(unittest.TestCase):
+    """Tests for the year=/month= partitioned export of processed tables"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.partition_dir = os.path.join(self.data_dir, 'partitions')
+        write_sample_csvs(self.data_dir)
+        # An item of an order missing from the orders table has no period
+        with open(os.path.join(self.data_dir, 'order_items_dataset.csv'), 'a') as f:
+            f.write('ord9,prod1,5.0,1.0\n')
+        with patch('builtins.print'):
+            self.loader, _ = load_and_process_data(self.data_dir + os.sep)
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def _open(self):
+        loader = EcommerceDataLoader(self.data_dir + os.sep)
+        loader.open_partitioned(self.partition_dir)
+        return loader
+    
+    def test_write_hive_layout(self):
+        """Test one directory per period and a null partition for undated rows"""
+        written = self.loader.write_partitioned(self.partition_dir)
+        
+        self.assertEqual(written, {'orders': 2, 'order_items': 3, 'sales': 3})
+        self.assertTrue(os.path.exists(os.path.join(
+            self.partition_dir, 'sales', 'year=2023', 'month=2', 'part-0.parquet')))
+        undated = read_partitioned(self.partition_dir, 'order_items', None, None).iloc[-1]
+        self.assertEqual(undated['order_id'], 'ord9')
+        self.assertTrue(np.isnan(undated['purchase_year']))
+    
+    def test_views_read_only_their_partitions(self):
+        """Test that years, months and filtered datasets resolve from the partitions"""
+        self.loader.write_partitioned(self.partition_dir)
+        loader = self._open()
+        
+        self.assertEqual(loader.get_available_years(), [2023])
+        self.assertEqual(loader.get_available_months(2023), [1, 2])
+        pd.testing.assert_frame_equal(loader.create_sales_dataset(2023, 2, status_filter=None),
+                                      self.loader.create_sales_dataset(2023, 2, status_filter=None))
+        pd.testing.assert_frame_equal(loader.create_sales_dataset(), self.loader.create_sales_dataset())
+        self.assertEqual(loader.get_cube(2023, status_filter='delivered').totals()['revenue'], 100.0)
+        
+        with patch('data_loader.pd.read_parquet', side_effect=AssertionError("partition read")):
+            self.assertEqual(loader.get_available_years(), [2023])
+    
+    def test_empty_period_keeps_schema(self):
+        """Test that a period without partitions gives an empty table of the same columns"""
+        self.loader.write_partitioned(self.partition_dir)
+        
+        empty = self._open().create_sales_dataset(2030)
+        
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(list(empty.columns), list(self.loader.create_sales_dataset().columns))
 
 
 class TestDataLoaderIntegration(unittest.TestCase):
@@ -177,5 +1170,19 @@ class TestDataLoaderIntegration(unittest.TestCase):
             self.fail(f"Integration test failed: {str(e)}")
 
 
+    @patch('builtins.print')
+    def test_iter_sales_chunks_matches_fact_table(self, mock_print):
+        """Test that streamed sales chunks hold the rows of the sales fact table"""
+        loader, processed_data = load_and_process_data(self.data_path)
+        streaming_loader = EcommerceDataLoader(self.data_path)
+        
+        chunks = list(streaming_loader.iter_sales_chunks(chunksize=5000))
+        self.assertNotIn('order_items', streaming_loader.processed_data)
+        self.assertGreater(len(chunks), 1)
+        
+        streamed = sort_by_period(pd.concat(chunks, ignore_index=True))
+        pd.testing.assert_frame_equal(streamed.reset_index(drop=True),
+                                      processed_data['sales'].reset_index(drop=True))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Tests for sales_cube.py functionality
+"""
+import unittest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sales_cube import SalesCube
+
+
+class TestSalesCube(unittest.TestCase):
+
+    def setUp(self):
+        """Set up sales rows with multi-category orders"""
+        self.sales_data = pd.DataFrame({
+            'order_id': ['ord1', 'ord1', 'ord2', 'ord3', 'ord3', 'ord4'],
+            'price': [100.0, 50.0, 200.0, 30.0, 70.0, 80.0],
+            'freight_value': [10.0, 5.0, 20.0, 3.0, 7.0, 8.0],
+            'purchase_year': [2023, 2023, 2023, 2023, 2023, 2022],
+            'purchase_month': [1, 1, 2, 2, 2, 1],
+            'product_category_name': ['electronics', 'books', 'books', 'books', 'books', 'electronics'],
+            'customer_state': ['CA', 'CA', 'TX', 'TX', 'TX', 'CA'],
+            'order_status': ['delivered', 'delivered', 'delivered', 'shipped', 'shipped', 'delivered'],
+            'review_score': [5.0, 5.0, 4.0, np.nan, np.nan, 2.0],
+            'delivery_days': [3.0, 3.0, 9.0, np.nan, np.nan, 5.0]
+        })
+        self.cube = SalesCube.from_sales(self.sales_data)
+    
+    def test_totals(self):
+        """Test additive measures and derived averages over the whole cube"""
+        totals = self.cube.totals()
+        
+        self.assertEqual(totals['revenue'], 530.0)
+        self.assertEqual(totals['freight'], 53.0)
+        self.assertEqual(totals['items'], 6)
+        self.assertEqual(totals['orders'], 4)
+        self.assertAlmostEqual(totals['avg_order_value'], 530.0 / 4)
+        self.assertAlmostEqual(totals['review_score'], 16.0 / 4)
+        self.assertAlmostEqual(totals['delivery_days'], 20.0 / 4)
+    
+    def test_distinct_orders_across_categories(self):
+        """Test that orders spanning categories are counted once per roll-up"""
+        categories = self.cube.rollup(['product_category_name']).set_index('product_category_name')
+        self.assertEqual(categories.loc['books', 'orders'], 3)
+        self.assertEqual(categories.loc['electronics', 'orders'], 2)
+        
+        states = self.cube.rollup(['customer_state']).set_index('customer_state')
+        self.assertEqual(states.loc['CA', 'orders'], 2)
+        self.assertEqual(states.loc['CA', 'revenue'], 230.0)
+        self.assertEqual(states.loc['TX', 'avg_order_value'], 150.0)
+    
+    def test_slice(self):
+        """Test slicing by single values, lists and None"""
+        delivered = self.cube.slice(purchase_year=2023, order_status='delivered', purchase_month=None)
+        self.assertEqual(delivered.totals()['revenue'], 350.0)
+        self.assertEqual(delivered.totals()['orders'], 2)
+        
+        months = self.cube.slice(purchase_month=[1, 2]).rollup(['purchase_month'])
+        self.assertEqual(months['revenue'].tolist(), [230.0, 300.0])
+        self.assertEqual(months['orders'].tolist(), [2, 2])
+        
+        empty = self.cube.slice(purchase_year=2030).totals()
+        self.assertEqual(empty['revenue'], 0)
+        self.assertTrue(np.isnan(empty['avg_order_value']))
+        
+        with self.assertRaises(ValueError):
+            self.cube.slice(customer_city='Austin')
+    
+    def test_category_slice_drops_order_cells(self):
+        """Test that category slices answer per-category but not cross-category orders"""
+        books = self.cube.slice(product_category_name='books')
+        
+        self.assertIsNone(books.order_cells)
+        self.assertEqual(books.rollup(['product_category_name'])['orders'].tolist(), [3])
+        with self.assertRaises(ValueError):
+            books.totals()
+    
+    def test_order_rollup(self):
+        """Test order-level distributions from the first row of each order"""
+        scores = self.cube.order_rollup(['review_score'], dropna=False)
+        self.assertEqual(scores['orders'].tolist(), [1, 1, 1, 1])
+        self.assertTrue(np.isnan(scores['review_score'].iloc[-1]))
+        
+        days = self.cube.order_rollup(['delivery_days'])
+        self.assertEqual(days['delivery_days'].tolist(), [3.0, 5.0, 9.0])
+        self.assertEqual(days['order_value'].tolist(), [150.0, 80.0, 200.0])
+
+    def test_combine_cubes_of_other_orders(self):
+        """Test that cubes over disjoint orders add up to the cube of all rows"""
+        first = SalesCube.from_sales(self.sales_data.iloc[:3])
+        rest = self.sales_data.iloc[3:].astype({'product_category_name': 'category'})
+        combined = first.combine(SalesCube.from_sales(rest))
+        
+        pd.testing.assert_frame_equal(combined.rollup(['product_category_name']),
+                                      self.cube.rollup(['product_category_name']), check_dtype=False)
+        pd.testing.assert_series_equal(combined.totals(), self.cube.totals())
+        
+        with self.assertRaises(ValueError):
+            first.combine(SalesCube.from_sales(self.sales_data.drop(columns=['customer_state'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Tests for sql_backend.py functionality
+"""
+import unittest
+import pandas as pd
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from data_loader import load_and_process_data
+from business_metrics import BusinessMetricsCalculator
+from sales_cube import SalesCube
+from sql_backend import SQLiteSalesBackend
+
+
+class TestSQLiteSalesBackend(unittest.TestCase):
+    """SQLite queries over the sample data files against the pandas path"""
+    
+    @classmethod
+    def setUpClass(cls):
+        with patch('builtins.print'):
+            cls.loader, _ = load_and_process_data('ecommerce_data/')
+        cls.backend = SQLiteSalesBackend()
+        cls.backend.load(cls.loader)
+    
+    def test_sales_dataset_matches_pandas(self):
+        """Test that every filter combination returns the pandas sales dataset"""
+        for filters in [(None, None, 'delivered'), (2023, None, 'delivered'), (2023, 6, 'delivered'),
+                        (None, 6, None), (2022, None, None), (2030, None, 'delivered')]:
+            with self.subTest(filters=filters):
+                pd.testing.assert_frame_equal(self.backend.sales_dataset(*filters),
+                                              self.loader.create_sales_dataset(*filters))
+    
+    def test_sales_dataset_with_payments(self):
+        """Test that the payment summary is joined like the pandas merge"""
+        pd.testing.assert_frame_equal(self.backend.sales_dataset(2023, include_payments=True),
+                                      self.loader.create_sales_dataset(2023, include_payments=True))
+    
+    def test_cube_matches_pandas(self):
+        """Test that the GROUP BY cells equal the cells of SalesCube.from_sales"""
+        expected = SalesCube.from_sales(self.loader.processed_data['sales'])
+        cube = self.backend.build_cube()
+        
+        self.assertEqual(cube.dimensions, expected.dimensions)
+        pd.testing.assert_frame_equal(cube.item_cells, expected.item_cells, check_exact=False)
+        pd.testing.assert_frame_equal(cube.order_cells, expected.order_cells, check_exact=False)
+    
+    def test_empty_database(self):
+        """Test that queries need loaded tables"""
+        with self.assertRaises(ValueError):
+            SQLiteSalesBackend().sales_dataset()
+
+
+class TestSQLBackendLoader(unittest.TestCase):
+    """Loader queries answered by an attached backend"""
+    
+    def setUp(self):
+        self.db_dir = tempfile.mkdtemp()
+        self.database = os.path.join(self.db_dir, 'sales.db')
+        with patch('builtins.print'):
+            self.loader, _ = load_and_process_data('ecommerce_data/')
+    
+    def tearDown(self):
+        shutil.rmtree(self.db_dir)
+    
+    def test_attached_backend_answers_queries(self):
+        """Test that datasets and reports come from SQL with unchanged results"""
+        expected = self.loader.create_sales_dataset(2023)
+        expected_report = BusinessMetricsCalculator(
+            self.loader.create_sales_dataset()).generate_comprehensive_report(2023, 2022)
+        self.loader.sales_cube = None
+        self.loader.attach_sql_backend(self.database)
+        
+        with patch.object(self.loader, '_filter_sales', side_effect=AssertionError("pandas path")), \
+                patch('data_loader.SalesCube.from_sales', side_effect=AssertionError("pandas path")):
+            pd.testing.assert_frame_equal(self.loader.create_sales_dataset(2023, month_filter=1),
+                                          expected[expected['purchase_month'] == 1].reset_index(drop=True))
+            cube = self.loader.get_cube(status_filter='delivered')
+        
+        report = BusinessMetricsCalculator(cube=cube).generate_comprehensive_report(2023, 2022)
+        for key, value in expected_report['revenue_metrics'].items():
+            self.assertAlmostEqual(report['revenue_metrics'][key], value, msg=key)
+    
+    def test_reopen_database_file(self):
+        """Test that a reopened database queries without the loader"""
+        self.loader.attach_sql_backend(self.database)
+        
+        reopened = SQLiteSalesBackend(self.database)
+        pd.testing.assert_frame_equal(reopened.sales_dataset(2022), self.loader.create_sales_dataset(2022))
+        reopened.close()
+    
+    def test_data_changes_detach_backend(self):
+        """Test that rebuilding the sales table falls back to the pandas path"""
+        self.loader.attach_sql_backend()
+        self.loader.build_sales_fact_table()
+        
+        self.assertIsNone(self.loader.sql_backend)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Tests for streaming.py functionality
+"""
+import unittest
+import pandas as pd
+import numpy as np
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from data_loader import EcommerceDataLoader, load_and_process_data
+from business_metrics import BusinessMetricsCalculator
+from sales_cube import SalesCube
+from streaming import StreamingMetricsAggregator, stream_comprehensive_report, stream_report_states
+
+
+class TestStreamingMetricsAggregator(unittest.TestCase):
+
+    def setUp(self):
+        """Set up sales rows with orders split across chunks"""
+        self.sales_data = pd.DataFrame({
+            'order_id': ['ord1', 'ord2', 'ord1', 'ord3', 'ord2', 'ord4', 'ord9'],
+            'price': [100.0, 200.0, 50.0, 30.0, 70.0, 80.0, 999.0],
+            'freight_value': [10.0, 20.0, 5.0, 3.0, 7.0, 8.0, 9.0],
+            'purchase_year': [2023, 2023, 2023, 2023, 2023, 2022, np.nan],
+            'purchase_month': [1, 2, 1, 2, 2, 1, np.nan],
+            'product_category_name': ['electronics', 'books', 'books', 'books', 'books', 'electronics', 'books'],
+            'customer_state': ['CA', 'TX', 'CA', 'TX', 'TX', 'CA', np.nan],
+            'order_status': ['delivered', 'delivered', 'delivered', 'shipped', 'delivered', 'delivered', np.nan],
+            'review_score': [5.0, 4.0, 5.0, np.nan, 4.0, 2.0, np.nan],
+            'delivery_days': [3.0, 9.0, 3.0, np.nan, 9.0, 5.0, np.nan]
+        })
+        self.order_ids = pd.Series(['ord1', 'ord2', 'ord3', 'ord4'])
+    
+    def _stream(self, chunk_rows, **kwargs):
+        aggregator = StreamingMetricsAggregator(self.order_ids, **kwargs)
+        for start in range(0, len(self.sales_data), chunk_rows):
+            aggregator.update(self.sales_data.iloc[start:start + chunk_rows])
+        return aggregator
+    
+    def test_matches_cube_of_all_rows(self):
+        """Test that chunked aggregation builds the cube of the whole table"""
+        delivered = self.sales_data[self.sales_data['order_status'] == 'delivered']
+        expected = SalesCube.from_sales(delivered)
+        
+        for chunk_rows in (1, 2, 7):
+            cube = self._stream(chunk_rows, compact_rows=3).to_cube()
+            pd.testing.assert_frame_equal(cube.item_cells, expected.item_cells, check_dtype=False)
+            pd.testing.assert_frame_equal(cube.order_cells, expected.order_cells, check_dtype=False)
+    
+    def test_orders_split_across_chunks_count_once(self):
+        """Test distinct order counts and order values of orders spanning chunks"""
+        cube = self._stream(1).to_cube()
+        
+        books = cube.rollup(['product_category_name']).set_index('product_category_name')
+        self.assertEqual(books.loc['books', 'orders'], 2)
+        self.assertEqual(cube.slice(purchase_year=2023).totals()['orders'], 2)
+        self.assertEqual(cube.order_rollup([])['order_value'].iloc[0], 500.0)
+    
+    def test_state_sized_by_orders(self):
+        """Test that order keys are one bit per order and category and compaction backs off"""
+        aggregator = self._stream(1, compact_rows=2)
+        
+        self.assertEqual(aggregator.order_keys.shape, (len(self.order_ids), 1))
+        self.assertEqual(aggregator.item_keys['product_category_name'].tolist(), ['electronics', 'books'])
+        self.assertEqual(aggregator.order_keys[:, 0].tolist(), [3, 2, 0, 1])
+        self.assertGreaterEqual(aggregator._compact_at, 2 * len(aggregator._cells[0]))
+    
+    def test_unknown_orders_skipped(self):
+        """Test that rows of orders missing from the orders table are skipped"""
+        aggregator = self._stream(3, status_filter=None)
+        
+        self.assertEqual(aggregator.stats['skipped_rows'], 1)
+        self.assertEqual(aggregator.stats['rows'], 6)
+        self.assertEqual(aggregator.to_cube().totals()['revenue'], 530.0)
+    
+    def test_empty_aggregator(self):
+        """Test that a cube needs at least one chunk"""
+        with self.assertRaises(ValueError):
+            StreamingMetricsAggregator(self.order_ids).to_cube()
+
+
+class TestStreamingReport(unittest.TestCase):
+    """Streaming report over the sample data files"""
+    
+    def setUp(self):
+        self.data_path = 'ecommerce_data/'
+    
+    @patch('builtins.print')
+    def test_report_matches_in_memory_report(self, mock_print):
+        """Test that the streamed report equals the report over the full sales table"""
+        loader, _ = load_and_process_data(self.data_path)
+        expected = BusinessMetricsCalculator(loader.create_sales_dataset()).generate_comprehensive_report(2023, 2022)
+        
+        report = stream_comprehensive_report(EcommerceDataLoader(self.data_path), 2023, 2022, chunksize=3000)
+        
+        for section in ['revenue_metrics', 'customer_satisfaction', 'delivery_performance']:
+            for key, value in expected[section].items():
+                self.assertAlmostEqual(report[section][key], value, msg=f"{section}.{key}")
+        pd.testing.assert_frame_equal(report['monthly_trends'], expected['monthly_trends'], check_dtype=False)
+        pd.testing.assert_frame_equal(report['geographic_performance'], expected['geographic_performance'],
+                                      check_dtype=False)
+        pd.testing.assert_frame_equal(report['product_performance']['all_categories'],
+                                      expected['product_performance']['all_categories'], check_dtype=False)
+
+
+    @patch('builtins.print')
+    def test_sketch_report_within_tolerance(self, mock_print):
+        """Test the report of streamed mergeable states against the full sales table"""
+        loader, _ = load_and_process_data(self.data_path)
+        expected = BusinessMetricsCalculator(loader.create_sales_dataset()).generate_comprehensive_report(2023, 2022)
+        
+        report = stream_comprehensive_report(EcommerceDataLoader(self.data_path), 2023, 2022,
+                                             chunksize=3000, exact=False)
+        
+        # Order-level sections are exact across chunks, the median is within 1%
+        for section in ['customer_satisfaction', 'delivery_performance']:
+            for key, value in expected[section].items():
+                places = None if key == 'median_delivery_days' else 7
+                delta = 0.01 * value if places is None else None
+                self.assertAlmostEqual(report[section][key], value, places=places, delta=delta,
+                                       msg=f"{section}.{key}")
+        # Revenue is exact, more than 2048 orders a year are counted within 3 standard errors
+        revenue, expected_revenue = report['revenue_metrics'], expected['revenue_metrics']
+        self.assertAlmostEqual(revenue['total_revenue'], expected_revenue['total_revenue'], places=4)
+        self.assertEqual(revenue['total_items_sold'], expected_revenue['total_items_sold'])
+        self.assertAlmostEqual(revenue['total_orders'], expected_revenue['total_orders'],
+                               delta=0.025 * expected_revenue['total_orders'])
+        # Monthly and state order counts stay below 2048 and are exact
+        pd.testing.assert_frame_equal(report['monthly_trends'], expected['monthly_trends'], check_dtype=False)
+        pd.testing.assert_frame_equal(report['geographic_performance'].reset_index(drop=True),
+                                      expected['geographic_performance'].reset_index(drop=True),
+                                      check_dtype=False)
+    
+    @patch('builtins.print')
+    def test_report_states_per_year(self, mock_print):
+        """Test that streamed states cover the years and rows of the delivered sales"""
+        loader, _ = load_and_process_data(self.data_path)
+        sales_data = loader.create_sales_dataset()
+        
+        states = stream_report_states(EcommerceDataLoader(self.data_path), chunksize=5000)
+        
+        self.assertEqual(sorted(states), sorted(sales_data['purchase_year'].unique().tolist()))
+        for year, state in states.items():
+            self.assertEqual(state.items.result(), int((sales_data['purchase_year'] == year).sum()))
+
+
+if __name__ == '__main__':
+    unittest.main()